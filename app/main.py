@@ -1,24 +1,39 @@
+import asyncio
+import base64
+import bisect
 import concurrent.futures
+import collections
+import copy
+import fcntl
+import gzip
 import hashlib
 import http.client
 import ipaddress
 import json
+import multiprocessing
 import os
+import queue
+import random
 import re
+import resource
 import secrets
 import shlex
+import signal
 import socket
 import subprocess
+import sys
 import threading
 import time
 import urllib.error
 import urllib.parse
 import urllib.request
 import uuid
+import wave
+import zlib
 from contextlib import asynccontextmanager
 from datetime import datetime, time as dt_time, timedelta
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, StreamingResponse
@@ -31,9 +46,14 @@ DEVICES_FILE = BASE_DIR / "devices.json"
 BUTTONS_FILE = BASE_DIR / "buttons.json"
 AUDIO_DIR = BASE_DIR / "audio"
 AUDIO_META_FILE = BASE_DIR / "audio.json"
+AUDIO_CACHE_DIR = BASE_DIR / "audio-cache"
 AUTH_FILE = BASE_DIR / "pibells-auth.json"
 BARIX_SCAN_RANGES_FILE = BASE_DIR / "barix-scan-ranges.json"
+BARIX_INVENTORY_FILE = BASE_DIR / "barix-inventory.json"
+BARIX_STREAM_GROUPS_FILE = BASE_DIR / "barix-stream-groups.json"
+NEIGHBOR_TABLE_FILE = Path(os.environ.get("PIBELLS_NEIGHBOR_TABLE", "/proc/net/arp"))
 THREADHALL_CONFIG_FILE = BASE_DIR / "threadhall-pairing.json"
+THREADHALL_OUTBOX_FILE = BASE_DIR / "threadhall-outbox.jsonl"
 STATIC_DIR = BASE_DIR / "static"
 
 SUPPORTED_AUDIO_EXTS = {".mp3", ".wav", ".ogg", ".m4a"}
@@ -43,9 +63,45 @@ BARIX_DISCOVERY_PORT = int(os.environ.get("PIBELLS_BARIX_DISCOVERY_PORT", "30718
 BARIX_STREAM_PORT = int(os.environ.get("PIBELLS_BARIX_STREAM_PORT", "3030"))
 BARIX_HTTP_PORT = int(os.environ.get("PIBELLS_BARIX_HTTP_PORT", "80"))
 BARIX_TCP_PORT = int(os.environ.get("PIBELLS_BARIX_TCP_PORT", "2020"))
-BARIX_SCAN_WORKERS = max(8, int(os.environ.get("PIBELLS_BARIX_SCAN_WORKERS", "96")))
-BARIX_SCAN_MAX_HOSTS = max(254, int(os.environ.get("PIBELLS_BARIX_SCAN_MAX_HOSTS", "4096")))
+BARIX_SCAN_CONCURRENCY = max(
+    8, int(os.environ.get("PIBELLS_BARIX_SCAN_CONCURRENCY", os.environ.get("PIBELLS_BARIX_SCAN_WORKERS", "512")))
+)
+BARIX_SCAN_MAX_HOSTS = max(254, int(os.environ.get("PIBELLS_BARIX_SCAN_MAX_HOSTS", "65536")))
+BARIX_SCAN_TIMEOUT = max(0.05, float(os.environ.get("PIBELLS_BARIX_SCAN_TIMEOUT", "0.35")))
+BARIX_SCAN_EVENT_RATE = max(0.0, float(os.environ.get("PIBELLS_BARIX_SCAN_EVENT_RATE", "5")))
+BARIX_SCAN_PROCESS = os.environ.get("PIBELLS_BARIX_SCAN_PROCESS", "1") != "0"
+BARIX_SCAN_NICE = max(0, min(19, int(os.environ.get("PIBELLS_BARIX_SCAN_NICE", "10"))))
+BARIX_SCAN_IDLE_SECONDS = max(0.0, float(os.environ.get("PIBELLS_BARIX_SCAN_IDLE_SECONDS", "1")))
+BARIX_SCAN_MIN_TIMEOUT = min(BARIX_SCAN_TIMEOUT, float(os.environ.get("PIBELLS_BARIX_SCAN_MIN_TIMEOUT", "0.1")))
 THREADHALL_DEFAULT_POLL_SECONDS = max(10, int(os.environ.get("PIBELLS_THREADHALL_POLL_SECONDS", "20")))
+THREADHALL_PUSH = os.environ.get("PIBELLS_THREADHALL_PUSH", "1") != "0"
+THREADHALL_PUSH_WAIT_SECONDS = max(5, min(120, int(os.environ.get("PIBELLS_THREADHALL_PUSH_WAIT_SECONDS", "25"))))
+THREADHALL_RECONCILE_SECONDS = max(30, int(os.environ.get("PIBELLS_THREADHALL_RECONCILE_SECONDS", "300")))
+THREADHALL_POOL_SIZE = max(1, int(os.environ.get("PIBELLS_THREADHALL_POOL_SIZE", "4")))
+THREADHALL_COMMAND_WORKERS = max(1, int(os.environ.get("PIBELLS_THREADHALL_COMMAND_WORKERS", "4")))
+THREADHALL_GZIP_MIN_BYTES = max(0, int(os.environ.get("PIBELLS_THREADHALL_GZIP_MIN_BYTES", "512")))
+THREADHALL_OUTBOX_MAX_ENTRIES = max(10, int(os.environ.get("PIBELLS_THREADHALL_OUTBOX_MAX_ENTRIES", "1000")))
+THREADHALL_OUTBOX_BATCH = max(1, int(os.environ.get("PIBELLS_THREADHALL_OUTBOX_BATCH", "250")))
+SCHEDULE_RECHECK_SECONDS = max(5, int(os.environ.get("PIBELLS_SCHEDULE_RECHECK_SECONDS", "300")))
+MINUTES_PER_WEEK = 7 * 24 * 60
+BELL_PREARM_SECONDS = max(0.5, float(os.environ.get("PIBELLS_BELL_PREARM_SECONDS", "3")))
+STREAM_MODE = os.environ.get("PIBELLS_STREAM_MODE", "auto").strip().lower()
+STREAM_PACKET_SIZE = 1200
+STREAM_MULTICAST = os.environ.get("PIBELLS_STREAM_MULTICAST", "1") != "0"
+STREAM_MULTICAST_TTL = max(1, min(255, int(os.environ.get("PIBELLS_STREAM_MULTICAST_TTL", "1"))))
+STREAM_MULTICAST_IF = os.environ.get("PIBELLS_STREAM_MULTICAST_IF", "").strip()
+LOCAL_SINK_ENABLED = os.environ.get("PIBELLS_LOCAL_SINK", "1") != "0"
+LOCAL_SINK_FORMAT = (44100, 2, 2)
+LOCAL_SINK_BUFFER_US = max(20_000, int(os.environ.get("PIBELLS_LOCAL_SINK_BUFFER_US", "80000")))
+LOCAL_SINK_CHUNK_BYTES = 4096
+LOCAL_SINK_MAX_RESTARTS = 5
+PLAYBACK_MAX_ENCODERS = max(1, int(os.environ.get("PIBELLS_MAX_ENCODERS", "32")))
+STOP_TARGET_MS = max(1, int(os.environ.get("PIBELLS_STOP_TARGET_MS", "100")))
+DEVICE_HEALTH_INTERVAL_SECONDS = max(2, int(os.environ.get("PIBELLS_DEVICE_HEALTH_SECONDS", "10")))
+DEVICE_HEALTH_WORKERS = max(1, int(os.environ.get("PIBELLS_DEVICE_HEALTH_WORKERS", "16")))
+STREAM_PASSTHROUGH_KBPS = {
+    int(value) for value in re.split(r"[\s,]+", os.environ.get("PIBELLS_STREAM_PASSTHROUGH_KBPS", "128")) if value
+}
 DAY_NAMES = [
     "Monday",
     "Tuesday",
@@ -61,9 +117,29 @@ STATIC_DIR.mkdir(exist_ok=True)
 
 storage_lock = threading.RLock()
 sessions: Dict[str, str] = {}
-loop_processes: List[subprocess.Popen] = []
 daemon_started = False
+schedule_changed = threading.Event()
+bell_timings: "collections.deque[Dict[str, Any]]" = collections.deque(maxlen=50)
+stream_multicast_state: Dict[str, Any] = {"interface": STREAM_MULTICAST_IF, "error": ""}
 threadhall_sync_started = False
+threadhall_sync_state: Dict[str, Any] = {}
+threadhall_sync_stats = {
+    "syncs": 0,
+    "status_sent": 0,
+    "status_unchanged": 0,
+    "schedules_not_modified": 0,
+    "schedule_writes": 0,
+    "schedule_writes_skipped": 0,
+    "bytes_sent": 0,
+}
+device_monitor_started = False
+transcode_worker_started = False
+transcode_queue: "queue.Queue[Optional[str]]" = queue.Queue()
+transcode_stats = {"built": 0, "failed": 0, "pruned": 0}
+transcode_failures: set[str] = set()
+pcm_cache: "collections.OrderedDict[Path, Tuple[Optional[Tuple[int, int, int]], bytes]]" = collections.OrderedDict()
+emergency_lanes: Dict[str, Tuple[Path, Path]] = {}
+audio_hash_cache: Dict[Path, Tuple[Optional[Tuple[int, int, int]], str]] = {}
 
 DEFAULT_AUDIO_KEY_FILES = {
     "start_day": "bell-start-warm-chime.mp3",
@@ -103,6 +179,10 @@ DEFAULT_AUDIO_NAMES = {
 }
 
 EMERGENCY_SOUND_KEYS = {"emergency", "hold", "secure", "lockdown", "evacuate", "shelter", "medical", "all_clear"}
+EMERGENCY_AUDIO_FILES = {DEFAULT_AUDIO_KEY_FILES[key] for key in EMERGENCY_SOUND_KEYS}
+PRIORITY_ROUTINE = 0
+PRIORITY_EMERGENCY = 1
+PRIORITY_NAMES = {PRIORITY_ROUTINE: "routine", PRIORITY_EMERGENCY: "emergency"}
 
 
 def model_to_dict(model: BaseModel) -> Dict[str, Any]:
@@ -128,6 +208,81 @@ def write_json(path: Path, data: Any) -> None:
         json.dump(data, f, indent=2, sort_keys=True)
         f.write("\n")
     temp_path.replace(path)
+    config_cache.invalidate(path)
+
+
+def json_snapshot(data: Any) -> Any:
+    return json.loads(json.dumps(data, sort_keys=True))
+
+
+def content_hash(data: Any) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def file_signature(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class ConfigCache:
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.entries: Dict[Path, Tuple[Optional[Tuple[int, int, int]], Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.stores = 0
+        self.generations: Dict[Path, int] = {}
+
+    def get(self, path: Path, loader: Callable[[], Any]) -> Any:
+        with self.lock:
+            signature = file_signature(path)
+            cached = self.entries.get(path)
+            if cached is not None and cached[0] == signature:
+                self.hits += 1
+                return copy.deepcopy(cached[1])
+            self.misses += 1
+            if cached is not None:
+                self.reloads += 1
+            value = loader()
+            self.entries[path] = (file_signature(path), copy.deepcopy(value))
+            self.generations[path] = self.generations.get(path, 0) + 1
+            return value
+
+    def store(self, path: Path, value: Any) -> None:
+        with self.lock:
+            self.stores += 1
+            self.entries[path] = (file_signature(path), copy.deepcopy(value))
+            self.generations[path] = self.generations.get(path, 0) + 1
+
+    def version(self, path: Path) -> Tuple[int, Optional[Tuple[int, int, int]]]:
+        with self.lock:
+            return (self.generations.get(path, 0), file_signature(path))
+
+    def invalidate(self, path: Optional[Path] = None) -> None:
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(path, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "stores": self.stores,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "files": sorted(path.name for path in self.entries),
+            }
+
+
+config_cache = ConfigCache()
 
 
 def sanitize_filename(filename: str) -> str:
@@ -214,6 +369,17 @@ class Device(BaseModel):
     ip: str
     name: str = ""
     port: int = Field(default=BARIX_STREAM_PORT, ge=1, le=65535)
+    group: Optional[str] = None
+
+
+class StreamGroup(BaseModel):
+    name: str
+    address: str
+    port: int = Field(default=BARIX_STREAM_PORT, ge=1, le=65535)
+
+
+class StreamGroups(BaseModel):
+    groups: List[StreamGroup] = []
 
 
 class DeviceScanRanges(BaseModel):
@@ -314,16 +480,37 @@ def split_device_target(target: str) -> Tuple[str, int]:
     return normalize_device_ip(value), port
 
 
+def normalize_group_name(name: str) -> str:
+    cleaned = re.sub(r"\s+", " ", name or "").strip()
+    if len(cleaned) > 40:
+        raise HTTPException(status_code=400, detail="Stream group name is too long")
+    return cleaned
+
+
+def normalize_multicast_address(address: str) -> str:
+    try:
+        value = ipaddress.ip_address((address or "").strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Enter a valid multicast address")
+    if value.version != 4 or not value.is_multicast or value in ipaddress.ip_network("224.0.0.0/24"):
+        raise HTTPException(status_code=400, detail="Enter an IPv4 multicast address outside 224.0.0.0/24")
+    return str(value)
+
+
 def default_device_name(ip: str) -> str:
     return f"Barix {ip}"
 
 
 def device_to_json(device: Device) -> Dict[str, Any]:
-    return {
+    record = {
         "ip": normalize_device_ip(device.ip),
         "name": normalize_device_name(device.name, default_device_name(device.ip)),
         "port": normalize_device_port(device.port),
     }
+    group = normalize_group_name(device.group or "")
+    if group:
+        record["group"] = group
+    return record
 
 
 def normalize_device_record(item: Any) -> Device:
@@ -339,7 +526,8 @@ def normalize_device_record(item: Any) -> Device:
         else:
             port = normalize_device_port(raw_port if raw_port is not None else parsed_port)
         name = normalize_device_name(str(item.get("name") or ""), default_device_name(ip))
-        return Device(ip=ip, name=name, port=port)
+        group = normalize_group_name(str(item.get("group") or ""))
+        return Device(ip=ip, name=name, port=port, group=group or None)
     raise HTTPException(status_code=400, detail="Invalid device")
 
 
@@ -348,7 +536,12 @@ def device_key(device: Device) -> str:
 
 
 def device_stream_url(device: Device) -> str:
-    return f"udp://{device.ip}:{device.port}?pkt_size=1200"
+    url = f"udp://{device.ip}:{device.port}?pkt_size={STREAM_PACKET_SIZE}"
+    if ipaddress.ip_address(device.ip).is_multicast:
+        url += f"&ttl={STREAM_MULTICAST_TTL}"
+        if STREAM_MULTICAST_IF:
+            url += f"&localaddr={STREAM_MULTICAST_IF}"
+    return url
 
 
 def normalize_scan_range(value: str) -> str:
@@ -415,18 +608,25 @@ def normalize_schedule_data(raw: Any) -> Dict[str, Any]:
     return {"active": active, "schedules": schedules}
 
 
+def read_all_schedules() -> Dict[str, Any]:
+    raw = read_json(SCHEDULE_FILE, default_schedule_data())
+    data = normalize_schedule_data(raw)
+    if raw != data:
+        write_json(SCHEDULE_FILE, data)
+    return data
+
+
 def load_all_schedules() -> Dict[str, Any]:
     with storage_lock:
-        raw = read_json(SCHEDULE_FILE, default_schedule_data())
-        data = normalize_schedule_data(raw)
-        if raw != data:
-            write_json(SCHEDULE_FILE, data)
-        return data
+        return config_cache.get(SCHEDULE_FILE, read_all_schedules)
 
 
 def save_all_schedules(data: Dict[str, Any]) -> None:
     with storage_lock:
-        write_json(SCHEDULE_FILE, normalize_schedule_data(data))
+        data = normalize_schedule_data(data)
+        write_json(SCHEDULE_FILE, data)
+        config_cache.store(SCHEDULE_FILE, json_snapshot(data))
+    schedule_changed.set()
 
 
 def load_schedule() -> List[ScheduleEntry]:
@@ -436,6 +636,61 @@ def load_schedule() -> List[ScheduleEntry]:
     return [ScheduleEntry(**item) for item in entries]
 
 
+def minute_of_week(moment: datetime) -> int:
+    return moment.weekday() * 1440 + moment.hour * 60 + moment.minute
+
+
+class ScheduleIndex:
+    def __init__(self, entries: List[ScheduleEntry], version: Any = None) -> None:
+        self.version = version
+        self.built_at = datetime.now().isoformat(timespec="seconds")
+        self.entries: Dict[str, ScheduleEntry] = {}
+        by_offset: Dict[int, List[str]] = {}
+        for entry in entries:
+            if not entry.enabled:
+                continue
+            offset = entry.day * 1440 + entry.time.hour * 60 + entry.time.minute
+            self.entries[entry.id] = entry
+            by_offset.setdefault(offset, []).append(entry.id)
+        self.offsets: List[int] = sorted(by_offset)
+        self.entry_ids: List[List[str]] = [by_offset[offset] for offset in self.offsets]
+
+    def next_firing(self, after: datetime) -> Optional[Tuple[datetime, List[ScheduleEntry]]]:
+        if not self.offsets:
+            return None
+        base = after.replace(second=0, microsecond=0)
+        minute = minute_of_week(base)
+        position = bisect.bisect_right(self.offsets, minute)
+        if position == len(self.offsets):
+            position = 0
+            delta = self.offsets[0] + MINUTES_PER_WEEK - minute
+        else:
+            delta = self.offsets[position] - minute
+        entries = [self.entries[entry_id] for entry_id in self.entry_ids[position]]
+        return base + timedelta(minutes=delta), entries
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "firing_minutes": len(self.offsets),
+            "built_at": self.built_at,
+        }
+
+
+schedule_index: Optional[ScheduleIndex] = None
+schedule_index_builds = 0
+
+
+def current_schedule_index() -> ScheduleIndex:
+    global schedule_index, schedule_index_builds
+    with storage_lock:
+        if schedule_index is None or schedule_index.version != config_cache.version(SCHEDULE_FILE):
+            entries = load_schedule()
+            schedule_index = ScheduleIndex(entries, config_cache.version(SCHEDULE_FILE))
+            schedule_index_builds += 1
+        return schedule_index
+
+
 def save_schedule(entries: List[ScheduleEntry]) -> None:
     data = load_all_schedules()
     active = data.get("active") or "Default"
@@ -487,30 +742,34 @@ def remove_schedule(name: str) -> Dict[str, Any]:
     return list_schedules()
 
 
+def read_devices() -> List[Device]:
+    raw = read_json(DEVICES_FILE, [])
+    if not isinstance(raw, list):
+        raw = []
+    devices: List[Device] = []
+    keys: set[str] = set()
+    changed = False
+    for item in raw:
+        try:
+            device = normalize_device_record(item)
+        except HTTPException:
+            changed = True
+            continue
+        key = device_key(device)
+        if key not in keys:
+            devices.append(device)
+            keys.add(key)
+        else:
+            changed = True
+    serialized = [device_to_json(device) for device in devices]
+    if changed or raw != serialized:
+        write_json(DEVICES_FILE, serialized)
+    return devices
+
+
 def load_devices() -> List[Device]:
     with storage_lock:
-        raw = read_json(DEVICES_FILE, [])
-        if not isinstance(raw, list):
-            raw = []
-        devices: List[Device] = []
-        keys: set[str] = set()
-        changed = False
-        for item in raw:
-            try:
-                device = normalize_device_record(item)
-            except HTTPException:
-                changed = True
-                continue
-            key = device_key(device)
-            if key not in keys:
-                devices.append(device)
-                keys.add(key)
-            else:
-                changed = True
-        serialized = [device_to_json(device) for device in devices]
-        if changed or raw != serialized:
-            write_json(DEVICES_FILE, serialized)
-        return devices
+        return config_cache.get(DEVICES_FILE, read_devices)
 
 
 def save_devices(devices: List[Device]) -> None:
@@ -524,56 +783,127 @@ def save_devices(devices: List[Device]) -> None:
             keys.add(key)
     with storage_lock:
         write_json(DEVICES_FILE, [device_to_json(device) for device in unique])
+        config_cache.store(DEVICES_FILE, unique)
+    device_monitor.wake()
+
+
+def read_stream_groups() -> List[StreamGroup]:
+    raw = read_json(BARIX_STREAM_GROUPS_FILE, [])
+    groups: List[StreamGroup] = []
+    for item in raw if isinstance(raw, list) else []:
+        try:
+            groups = normalize_stream_groups(groups + [StreamGroup(**item)])
+        except (HTTPException, TypeError, ValueError):
+            continue
+    return groups
+
+
+def normalize_stream_groups(groups: List[StreamGroup]) -> List[StreamGroup]:
+    normalized: List[StreamGroup] = []
+    names: set[str] = set()
+    targets: set[str] = set()
+    for group in groups:
+        name = normalize_group_name(group.name)
+        if not name:
+            raise HTTPException(status_code=400, detail="Stream group name is required")
+        address = normalize_multicast_address(group.address)
+        port = normalize_device_port(group.port)
+        if name in names:
+            raise HTTPException(status_code=400, detail=f"Duplicate stream group: {name}")
+        if f"{address}:{port}" in targets:
+            raise HTTPException(status_code=400, detail=f"Stream group {name} reuses {address}:{port}")
+        names.add(name)
+        targets.add(f"{address}:{port}")
+        normalized.append(StreamGroup(name=name, address=address, port=port))
+    return normalized
+
+
+def load_stream_groups() -> List[StreamGroup]:
+    with storage_lock:
+        return config_cache.get(BARIX_STREAM_GROUPS_FILE, read_stream_groups)
+
+
+def save_stream_groups(groups: List[StreamGroup]) -> List[StreamGroup]:
+    normalized = normalize_stream_groups(groups)
+    with storage_lock:
+        write_json(BARIX_STREAM_GROUPS_FILE, [model_to_dict(group) for group in normalized])
+        config_cache.store(BARIX_STREAM_GROUPS_FILE, normalized)
+    return normalized
+
+
+def stream_targets(devices: List[Device], groups: Optional[List[StreamGroup]] = None) -> List[Device]:
+    if not STREAM_MULTICAST:
+        return devices
+    by_name = {group.name: group for group in (load_stream_groups() if groups is None else groups)}
+    targets: List[Device] = []
+    joined: set[str] = set()
+    for device in devices:
+        group = by_name.get(device.group)
+        if group is None:
+            targets.append(device)
+        elif group.name not in joined:
+            joined.add(group.name)
+            targets.append(Device(ip=group.address, name=group.name, port=group.port, group=group.name))
+    return targets
+
+
+def read_buttons() -> List[QuickButton]:
+    raw = read_json(BUTTONS_FILE, [])
+    if not isinstance(raw, list):
+        raw = []
+    buttons: List[QuickButton] = []
+    changed = False
+    for item in raw:
+        if not isinstance(item, dict):
+            changed = True
+            continue
+        try:
+            button = QuickButton(**item)
+            button.sound_file = sanitize_filename(button.sound_file)
+            button.color = normalize_color(button.color)
+            button.icon = normalize_icon(button.icon)
+            buttons.append(button)
+            changed = changed or item != button_to_json(button)
+        except Exception:
+            changed = True
+    if changed:
+        write_json(BUTTONS_FILE, [button_to_json(button) for button in buttons])
+    return buttons
 
 
 def load_buttons() -> List[QuickButton]:
     with storage_lock:
-        raw = read_json(BUTTONS_FILE, [])
-        if not isinstance(raw, list):
-            raw = []
-        buttons: List[QuickButton] = []
-        changed = False
-        for item in raw:
-            if not isinstance(item, dict):
-                changed = True
-                continue
-            try:
-                button = QuickButton(**item)
-                button.sound_file = sanitize_filename(button.sound_file)
-                button.color = normalize_color(button.color)
-                button.icon = normalize_icon(button.icon)
-                buttons.append(button)
-                changed = changed or item != button_to_json(button)
-            except Exception:
-                changed = True
-        if changed:
-            save_buttons(buttons)
-        return buttons
+        return config_cache.get(BUTTONS_FILE, read_buttons)
 
 
 def save_buttons(buttons: List[QuickButton]) -> None:
     with storage_lock:
         write_json(BUTTONS_FILE, [button_to_json(button) for button in buttons])
+        config_cache.store(BUTTONS_FILE, buttons)
+
+
+def normalize_audio_meta(raw: Any) -> Dict[str, str]:
+    if not isinstance(raw, dict):
+        return {}
+    meta: Dict[str, str] = {}
+    for key, value in raw.items():
+        try:
+            filename = sanitize_filename(str(key))
+        except HTTPException:
+            continue
+        meta[filename] = str(value or Path(filename).stem).strip() or Path(filename).stem
+    return meta
 
 
 def load_audio_meta() -> Dict[str, str]:
     with storage_lock:
-        raw = read_json(AUDIO_META_FILE, {})
-        if not isinstance(raw, dict):
-            return {}
-        meta: Dict[str, str] = {}
-        for key, value in raw.items():
-            try:
-                filename = sanitize_filename(str(key))
-            except HTTPException:
-                continue
-            meta[filename] = str(value or Path(filename).stem).strip() or Path(filename).stem
-        return meta
+        return config_cache.get(AUDIO_META_FILE, lambda: normalize_audio_meta(read_json(AUDIO_META_FILE, {})))
 
 
 def save_audio_meta(meta: Dict[str, str]) -> None:
     with storage_lock:
         write_json(AUDIO_META_FILE, meta)
+        config_cache.store(AUDIO_META_FILE, normalize_audio_meta(json_snapshot(meta)))
 
 
 def list_audio() -> List[AudioFile]:
@@ -608,10 +938,7 @@ def list_audio() -> List[AudioFile]:
 
 
 def audio_display_name(filename: str) -> str:
-    for audio in list_audio():
-        if audio.file == filename:
-            return audio.name
-    return Path(filename).stem
+    return load_audio_meta().get(filename) or DEFAULT_AUDIO_NAMES.get(filename, Path(filename).stem)
 
 
 def normalize_threadhall_base_url(value: str) -> str:
@@ -662,11 +989,204 @@ def safe_threadhall_status() -> Dict[str, Any]:
         "device_uuid": config.get("device_uuid", ""),
         "device_name": config.get("device_name", ""),
         "poll_seconds": config.get("poll_seconds", THREADHALL_DEFAULT_POLL_SECONDS),
-        "last_sync_at": config.get("last_sync_at"),
+        "last_sync_at": threadhall_sync_state.get("last_sync_at") or config.get("last_sync_at"),
         "last_error": config.get("last_error", ""),
+        "push": threadhall_push.stats(),
+        "commands": threadhall_push.latency()["recent"],
+        "outbox": threadhall_outbox.pending(),
     }
 
 
+class ThreadhallError(HTTPException):
+    def __init__(self, detail: str, upstream_status: Optional[int] = None) -> None:
+        super().__init__(status_code=502, detail=detail)
+        self.upstream_status = upstream_status
+
+
+class ThreadhallHTTP:
+    def __init__(self, pool_size: int, gzip_min_bytes: int, history: int = 100) -> None:
+        self.pool_size = pool_size
+        self.gzip_min_bytes = gzip_min_bytes
+        self.lock = threading.Lock()
+        self.idle: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = {}
+        self.plain_hosts: set[str] = set()
+        self.calls: "collections.deque[Dict[str, Any]]" = collections.deque(maxlen=history)
+        self.totals: Dict[str, Dict[str, Any]] = {}
+        self.connections = 0
+
+    @staticmethod
+    def proxy_for(scheme: str, netloc: str) -> Optional[urllib.parse.SplitResult]:
+        proxy = urllib.request.getproxies().get(scheme)
+        host = urllib.parse.urlsplit(f"//{netloc}").hostname or netloc
+        if not proxy or urllib.request.proxy_bypass(host):
+            return None
+        return urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+
+    @staticmethod
+    def proxy_headers(proxy: urllib.parse.SplitResult) -> Dict[str, str]:
+        if not proxy.username:
+            return {}
+        credentials = f"{urllib.parse.unquote(proxy.username)}:{urllib.parse.unquote(proxy.password or '')}"
+        return {"Proxy-Authorization": "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")}
+
+    def acquire(
+        self, scheme: str, netloc: str, timeout: float, proxy: Optional[urllib.parse.SplitResult] = None
+    ) -> Tuple[http.client.HTTPConnection, bool]:
+        with self.lock:
+            idle = self.idle.get((scheme, netloc))
+            conn = idle.pop() if idle else None
+        if conn is not None:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+        with self.lock:
+            self.connections += 1
+        if proxy is not None:
+            proxy_netloc = f"{proxy.hostname}:{proxy.port or 80}"
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(proxy_netloc, timeout=timeout)
+                conn.set_tunnel(netloc, headers=self.proxy_headers(proxy))
+                return conn, False
+            return http.client.HTTPConnection(proxy_netloc, timeout=timeout), False
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=timeout), False
+        return http.client.HTTPConnection(netloc, timeout=timeout), False
+
+    def release(self, scheme: str, netloc: str, conn: http.client.HTTPConnection) -> None:
+        with self.lock:
+            idle = self.idle.setdefault((scheme, netloc), [])
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self.lock:
+            pools, self.idle = self.idle, {}
+        for conns in pools.values():
+            for conn in conns:
+                conn.close()
+
+    def encode(self, netloc: str, data: Optional[bytes], headers: Dict[str, str]) -> Optional[bytes]:
+        with self.lock:
+            plain = netloc in self.plain_hosts
+        if data is None or len(data) < self.gzip_min_bytes or plain:
+            return data
+        headers["Content-Encoding"] = "gzip"
+        return gzip.compress(data, compresslevel=6)
+
+    def send(
+        self, method: str, url: str, data: Optional[bytes], headers: Dict[str, str], timeout: float
+    ) -> Tuple[int, str, bytes]:
+        parsed = urllib.parse.urlsplit(url)
+        proxy = self.proxy_for(parsed.scheme, parsed.netloc)
+        target = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+        headers = {**headers, "Accept-Encoding": "gzip"}
+        if proxy is not None and parsed.scheme == "http":
+            target = urllib.parse.urlunsplit(parsed._replace(fragment=""))
+            headers.update(self.proxy_headers(proxy))
+        body = self.encode(parsed.netloc, data, headers)
+        started = time.monotonic()
+        reused = False
+        try:
+            response, raw, reused = self.exchange(method, parsed, target, body, headers, timeout, proxy)
+            if response.status == 415 and headers.get("Content-Encoding") == "gzip":
+                with self.lock:
+                    self.plain_hosts.add(parsed.netloc)
+                headers.pop("Content-Encoding")
+                body = data
+                response, raw, reused = self.exchange(method, parsed, target, body, headers, timeout, proxy)
+            if response.getheader("Content-Encoding", "").lower() == "gzip":
+                try:
+                    raw = gzip.decompress(raw)
+                except (OSError, EOFError, zlib.error) as exc:
+                    raise urllib.error.URLError(f"invalid gzip response: {exc}")
+        except urllib.error.URLError as exc:
+            self.record(method, parsed.path, started, reused, len(body or b""), 0, None, str(exc.reason))
+            raise
+        self.record(method, parsed.path, started, reused, len(body or b""), len(raw), response.status)
+        return response.status, response.reason, raw
+
+    def exchange(
+        self,
+        method: str,
+        parsed: urllib.parse.SplitResult,
+        target: str,
+        body: Optional[bytes],
+        headers: Dict[str, str],
+        timeout: float,
+        proxy: Optional[urllib.parse.SplitResult],
+    ) -> Tuple[http.client.HTTPResponse, bytes, bool]:
+        for attempt in range(2):
+            conn, reused = self.acquire(parsed.scheme, parsed.netloc, timeout, proxy)
+            try:
+                conn.request(method, target, body=body, headers=headers)
+                response = conn.getresponse()
+                raw = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as exc:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise urllib.error.URLError(exc)
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                raise urllib.error.URLError(exc)
+            if response.will_close:
+                conn.close()
+            else:
+                self.release(parsed.scheme, parsed.netloc, conn)
+            return response, raw, reused
+        raise urllib.error.URLError("Threadhall closed the connection")
+
+    def record(
+        self,
+        method: str,
+        path: str,
+        started: float,
+        reused: bool,
+        sent: int,
+        received: int,
+        status: Optional[int],
+        error: str = "",
+    ) -> None:
+        elapsed_ms = round((time.monotonic() - started) * 1000, 2)
+        name = f"{method} {re.sub(r'/[0-9]+(?=/|$)', '/{id}', path)}"
+        with self.lock:
+            call = {
+                "call": name,
+                "status": status,
+                "ms": elapsed_ms,
+                "reused": reused,
+                "bytes_sent": sent,
+                "bytes_received": received,
+            }
+            if error:
+                call["error"] = error
+            self.calls.append(call)
+            total = self.totals.setdefault(
+                name, {"calls": 0, "failures": 0, "reused": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            total["calls"] += 1
+            total["failures"] += int(status is None)
+            total["reused"] += int(reused)
+            total["total_ms"] = round(total["total_ms"] + elapsed_ms, 2)
+            total["max_ms"] = max(total["max_ms"], elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "connections": self.connections,
+                "idle": sum(len(conns) for conns in self.idle.values()),
+                "plain_hosts": sorted(self.plain_hosts),
+                "calls": {name: dict(total) for name, total in self.totals.items()},
+                "recent": list(self.calls)[-10:],
+            }
+
+
+threadhall_http = ThreadhallHTTP(THREADHALL_POOL_SIZE, THREADHALL_GZIP_MIN_BYTES)
+
+
 def threadhall_request(
     config: Dict[str, Any],
     path: str,
@@ -674,6 +1194,7 @@ def threadhall_request(
     method: str = "GET",
     payload: Optional[Dict[str, Any]] = None,
     token: Optional[str] = None,
+    timeout: float = 12,
 ) -> Dict[str, Any]:
     base_url = normalize_threadhall_base_url(str(config.get("base_url") or ""))
     url = f"{base_url}/{path.lstrip('/')}"
@@ -687,26 +1208,24 @@ def threadhall_request(
     token = token if token is not None else str(config.get("token") or "")
     if token:
         headers["Authorization"] = f"Bearer {token}"
-    request = urllib.request.Request(url, data=data, headers=headers, method=method)
     try:
-        with urllib.request.urlopen(request, timeout=12) as response:
-            body = response.read().decode("utf-8")
-    except urllib.error.HTTPError as exc:
-        body = exc.read().decode("utf-8", errors="ignore")
+        status, reason, raw = threadhall_http.send(method, url, data, headers, timeout)
+    except urllib.error.URLError as exc:
+        raise ThreadhallError(f"Threadhall connection failed: {exc.reason}")
+    body = raw.decode("utf-8", errors="ignore" if status >= 400 else "strict")
+    if status >= 400:
         try:
             parsed = json.loads(body)
             detail = parsed.get("message") or parsed.get("detail") or body
         except Exception:
-            detail = body or exc.reason
-        raise HTTPException(status_code=502, detail=f"Threadhall returned {exc.code}: {detail}")
-    except urllib.error.URLError as exc:
-        raise HTTPException(status_code=502, detail=f"Threadhall connection failed: {exc.reason}")
+            detail = body or reason
+        raise ThreadhallError(f"Threadhall returned {status}: {detail}", status)
     if not body:
         return {}
     try:
         return json.loads(body)
     except json.JSONDecodeError:
-        raise HTTPException(status_code=502, detail="Threadhall returned invalid JSON")
+        raise ThreadhallError("Threadhall returned invalid JSON")
 
 
 def pair_threadhall(body: ThreadhallPairRequest) -> Dict[str, Any]:
@@ -733,6 +1252,8 @@ def pair_threadhall(body: ThreadhallPairRequest) -> Dict[str, Any]:
     token = str(data.get("token") or "")
     if not token:
         raise HTTPException(status_code=502, detail="Threadhall did not return a device token")
+    threadhall_sync_state.clear()
+    threadhall_outbox.clear()
     save_threadhall_config({
         "enabled": True,
         "base_url": config["base_url"],
@@ -757,9 +1278,9 @@ def audio_file_for_key(sound_key: str) -> str:
         raise
 
 
-def apply_threadhall_schedules(schedules: List[Dict[str, Any]]) -> None:
+def apply_threadhall_schedules(schedules: List[Dict[str, Any]]) -> bool:
     if not schedules:
-        return
+        return False
     current = load_all_schedules()
     current_active = str(current.get("active") or "")
     merged = {
@@ -782,8 +1303,9 @@ def apply_threadhall_schedules(schedules: List[Dict[str, Any]]) -> None:
                 continue
             try:
                 sound_file = item.get("sound_file") or audio_file_for_key(str(item.get("sound_key") or "passing"))
+                fallback_id = content_hash([name, item.get("day"), item.get("time"), item.get("label"), sound_file])
                 entry = ScheduleEntry(
-                    id=str(item.get("id") or secrets.token_hex(8)),
+                    id=str(item.get("id") or fallback_id[:16]),
                     day=int(item.get("day")),
                     time=str(item.get("time")),
                     sound_file=sound_file,
@@ -798,21 +1320,84 @@ def apply_threadhall_schedules(schedules: List[Dict[str, Any]]) -> None:
             active_name = name
     if active_name not in merged:
         active_name = next(iter(merged.keys()), "Default")
-    save_all_schedules({"active": active_name, "schedules": merged})
+    updated = normalize_schedule_data({"active": active_name, "schedules": merged})
+    if content_hash(updated) == content_hash(normalize_schedule_data(current)):
+        return False
+    save_all_schedules(updated)
+    return True
+
 
+def threadhall_command_payload(command: Dict[str, Any]) -> Dict[str, Any]:
+    return command.get("payload") if isinstance(command.get("payload"), dict) else {}
 
-def run_threadhall_command(command: Dict[str, Any]) -> str:
-    payload = command.get("payload") if isinstance(command.get("payload"), dict) else {}
+
+def threadhall_command_plays(command: Dict[str, Any]) -> bool:
+    payload = threadhall_command_payload(command)
+    return not (command.get("type") == "activate_schedule" and payload.get("schedule_name"))
+
+
+def threadhall_command_priority(command: Dict[str, Any]) -> int:
+    payload = threadhall_command_payload(command)
+    command_type = str(command.get("type") or "")
+    if not threadhall_command_plays(command):
+        return PRIORITY_ROUTINE
+    sound_key = str(payload.get("sound_key") or command_type or "test")
+    try:
+        return sound_priority(audio_file_for_key(sound_key), sound_key)
+    except HTTPException:
+        return sound_priority("", sound_key)
+
+
+def run_threadhall_command(command: Dict[str, Any]) -> Tuple[str, Optional["PlaybackJob"]]:
+    payload = threadhall_command_payload(command)
     command_type = str(command.get("type") or "")
     sound_key = str(payload.get("sound_key") or command_type or "test")
     if command_type == "activate_schedule":
         schedule_name = str(payload.get("schedule_name") or "")
         if schedule_name:
             activate_schedule(schedule_name)
-            return f"Activated schedule {schedule_name}"
+            return f"Activated schedule {schedule_name}", None
     sound_file = audio_file_for_key(sound_key)
-    trigger_bell(sound_file, loop=bool(payload.get("loop", False)))
-    return f"Played {audio_display_name(sound_file)} for {payload.get('label') or command_type}"
+    job = trigger_bell(sound_file, loop=bool(payload.get("loop", False)))
+    return f"Played {audio_display_name(sound_file)} for {payload.get('label') or command_type}", job
+
+
+def execute_threadhall_command(command: Dict[str, Any], priority: int, received: float) -> Dict[str, Any]:
+    started = time.monotonic()
+    job = None
+    try:
+        summary, job = run_threadhall_command(command)
+        status = "acknowledged"
+    except Exception as exc:
+        summary = str(getattr(exc, "detail", exc))
+        status = "failed"
+    return {
+        "command": command,
+        "job": job,
+        "status": status,
+        "summary": summary,
+        "priority": PRIORITY_NAMES.get(priority, str(priority)),
+        "queued_ms": round((started - received) * 1000, 2),
+        "run_ms": round((time.monotonic() - started) * 1000, 2),
+    }
+
+
+def dispatch_threadhall_commands(commands: List[Dict[str, Any]], received: float) -> List[Dict[str, Any]]:
+    tiers: Dict[int, List[Dict[str, Any]]] = {}
+    for command in commands:
+        tiers.setdefault(threadhall_command_priority(command), []).append(command)
+    results: List[Dict[str, Any]] = []
+    for priority in sorted(tiers, reverse=True):
+        futures: List["concurrent.futures.Future[Dict[str, Any]]"] = []
+        for command in tiers[priority]:
+            if threadhall_command_plays(command):
+                futures.append(threadhall_command_pool.submit(execute_threadhall_command, command, priority, received))
+                continue
+            results.extend(future.result() for future in futures)
+            futures = []
+            results.append(execute_threadhall_command(command, priority, received))
+        results.extend(future.result() for future in futures)
+    return results
 
 
 def acknowledge_threadhall_command(config: Dict[str, Any], command_id: Any, status: str, summary: str) -> None:
@@ -824,53 +1409,496 @@ def acknowledge_threadhall_command(config: Dict[str, Any], command_id: Any, stat
     )
 
 
+def acknowledge_threadhall_commands(config: Dict[str, Any], acks: List[Dict[str, Any]]) -> None:
+    if not acks:
+        return
+    if not threadhall_sync_state.get("ack_batch_unsupported"):
+        try:
+            threadhall_request(config, "api/pibells/v1/commands/ack", method="POST", payload={"acks": acks})
+            return
+        except ThreadhallError as exc:
+            if exc.upstream_status not in {404, 405}:
+                raise
+            threadhall_sync_state["ack_batch_unsupported"] = True
+    for ack in acks:
+        acknowledge_threadhall_command(config, ack["id"], ack["status"], ack["summary"])
+
+
+def handle_threadhall_commands(
+    config: Dict[str, Any], commands: List[Any], channel: str, received: Optional[float] = None
+) -> int:
+    received = received or time.monotonic()
+    claimed: List[Dict[str, Any]] = []
+    resent: List[Dict[str, Any]] = []
+    for command in commands:
+        if not isinstance(command, dict) or "id" not in command:
+            continue
+        if threadhall_push.claim(command["id"]):
+            claimed.append(command)
+            continue
+        ack = threadhall_push.ack_for(command["id"])
+        if ack is not None:
+            resent.append(ack)
+    results = dispatch_threadhall_commands(claimed, received)
+    acks = [
+        {
+            "id": result["command"]["id"],
+            "status": result["status"],
+            "summary": result["summary"],
+            "run_ms": result["run_ms"],
+        }
+        for result in results
+    ]
+    for ack in acks:
+        threadhall_push.remember(ack)
+    try:
+        acknowledge_threadhall_commands(config, resent + acks)
+    except Exception:
+        threadhall_outbox.queue_acks(resent + acks)
+    for result in results:
+        threadhall_push.record(result, channel, received)
+    return len(results)
+
+
+def threadhall_ready(config: Dict[str, Any]) -> bool:
+    return bool(config.get("enabled") and config.get("token") and config.get("base_url"))
+
+
+def threadhall_status_hash(status: Dict[str, Any]) -> str:
+    next_event = status.get("next_event")
+    if isinstance(next_event, dict):
+        status = {**status, "next_event": {key: value for key, value in next_event.items() if key != "in_minutes"}}
+    return content_hash(status)
+
+
+def threadhall_sync_payload(status: Dict[str, Any], status_hash: str, schedule_hash: str) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {"status_hash": status_hash}
+    if threadhall_sync_state.get("status_hash") == status_hash:
+        payload["status_unchanged"] = True
+    else:
+        payload.update(status)
+    if threadhall_sync_state.get("schedules_hash") and threadhall_sync_state.get("schedule_data_hash") == schedule_hash:
+        payload["schedules_hash"] = threadhall_sync_state["schedules_hash"]
+    return payload
+
+
+def post_threadhall_sync(config: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Any]:
+    threadhall_sync_stats["bytes_sent"] += len(json.dumps(payload))
+    threadhall_sync_stats["status_unchanged" if payload.get("status_unchanged") else "status_sent"] += 1
+    response = threadhall_request(config, "api/pibells/v1/sync", method="POST", payload=payload)
+    return response.get("data") if isinstance(response.get("data"), dict) else response
+
+
 def sync_threadhall_once() -> Dict[str, Any]:
     config = load_threadhall_config()
-    if not config.get("enabled") or not config.get("token") or not config.get("base_url"):
+    if not threadhall_ready(config):
         return safe_threadhall_status()
-    response = threadhall_request(config, "api/pibells/v1/sync", method="POST", payload=dashboard())
-    data = response.get("data") if isinstance(response.get("data"), dict) else response
-    apply_threadhall_schedules([item for item in data.get("schedules", []) if isinstance(item, dict)])
-    for command in data.get("commands", []):
-        if not isinstance(command, dict) or "id" not in command:
-            continue
-        try:
-            summary = run_threadhall_command(command)
-            acknowledge_threadhall_command(config, command["id"], "acknowledged", summary)
-        except Exception as exc:
-            try:
-                acknowledge_threadhall_command(config, command["id"], "failed", str(exc))
-            except Exception:
-                pass
-    saved = save_threadhall_config({
-        "enabled": True,
-        "poll_seconds": int(data.get("poll_seconds") or config.get("poll_seconds") or THREADHALL_DEFAULT_POLL_SECONDS),
-        "last_sync_at": datetime.now().isoformat(timespec="seconds"),
-        "last_error": "",
-    })
+    status = dashboard()
+    status_hash = threadhall_status_hash(status)
+    payload = threadhall_sync_payload(status, status_hash, content_hash(load_all_schedules()))
+    data = post_threadhall_sync(config, payload)
+    if data.get("status_required") and payload.get("status_unchanged"):
+        payload = {key: value for key, value in payload.items() if key != "status_unchanged"}
+        data = post_threadhall_sync(config, {**payload, **status})
+    received = time.monotonic()
+    threadhall_sync_stats["syncs"] += 1
+    schedules = [item for item in data.get("schedules", []) if isinstance(item, dict)]
+    if data.get("schedules_not_modified"):
+        threadhall_sync_stats["schedules_not_modified"] += 1
+    else:
+        schedules_hash = str(data.get("schedules_hash") or content_hash(schedules))
+        unchanged = schedules_hash == threadhall_sync_state.get("schedules_hash") and "schedules_hash" in payload
+        if not unchanged and apply_threadhall_schedules(schedules):
+            threadhall_sync_stats["schedule_writes"] += 1
+        else:
+            threadhall_sync_stats["schedule_writes_skipped"] += 1
+        threadhall_sync_state["schedules_hash"] = schedules_hash
+    threadhall_sync_state["status_hash"] = status_hash
+    threadhall_sync_state["schedule_data_hash"] = content_hash(load_all_schedules())
+    threadhall_sync_state["last_sync_at"] = datetime.now().isoformat(timespec="seconds")
+    threadhall_outbox.drain(config, force=True)
+    handle_threadhall_commands(config, data.get("commands", []), "sync", received)
+    poll_seconds = int(data.get("poll_seconds") or config.get("poll_seconds") or THREADHALL_DEFAULT_POLL_SECONDS)
+    if config.get("poll_seconds") != poll_seconds or config.get("last_error") or not config.get("enabled"):
+        config = save_threadhall_config({
+            "enabled": True,
+            "poll_seconds": poll_seconds,
+            "last_sync_at": threadhall_sync_state["last_sync_at"],
+            "last_error": "",
+        })
     return {
         **safe_threadhall_status(),
         "received_commands": len(data.get("commands", [])),
-        "received_schedules": len(data.get("schedules", [])),
-        "poll_seconds": saved.get("poll_seconds"),
+        "received_schedules": len(schedules),
+        "schedules_not_modified": bool(data.get("schedules_not_modified")),
+        "poll_seconds": config.get("poll_seconds"),
     }
 
 
+class ThreadhallPush:
+    def __init__(self, wait_seconds: int, history: int = 50) -> None:
+        self.wait_seconds = wait_seconds
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.connected = False
+        self.supported: Optional[bool] = None
+        self.cursor = ""
+        self.connects = 0
+        self.failures = 0
+        self.last_event_at: Optional[str] = None
+        self.last_error = ""
+        self.seen: "collections.OrderedDict[str, Optional[Dict[str, Any]]]" = collections.OrderedDict()
+        self.commands: "collections.deque[Dict[str, Any]]" = collections.deque(maxlen=history)
+
+    def claim(self, command_id: Any) -> bool:
+        key = str(command_id)
+        with self.lock:
+            if key in self.seen:
+                return False
+            self.seen[key] = None
+            while len(self.seen) > 500:
+                self.seen.popitem(last=False)
+            return True
+
+    def remember(self, ack: Dict[str, Any]) -> None:
+        with self.lock:
+            if str(ack["id"]) in self.seen:
+                self.seen[str(ack["id"])] = ack
+
+    def ack_for(self, command_id: Any) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return self.seen.get(str(command_id))
+
+    def record(self, result: Dict[str, Any], channel: str, received: float) -> None:
+        command = result["command"]
+        with self.lock:
+            self.commands.append({
+                "id": str(command.get("id")),
+                "type": str(command.get("type") or ""),
+                "channel": channel,
+                "priority": result["priority"],
+                "status": result["status"],
+                "queued_ms": result["queued_ms"],
+                "run_ms": result["run_ms"],
+                "received_at": datetime.now().isoformat(timespec="seconds"),
+                "received": received,
+                "job": result["job"],
+            })
+
+    def set_connected(self, connected: bool) -> None:
+        with self.lock:
+            changed = self.connected != connected
+            self.connected = connected
+            if connected and changed:
+                self.connects += 1
+        if changed and not connected:
+            self.wake.set()
+
+    def poll_once(self, config: Dict[str, Any]) -> int:
+        wait = 0 if not self.cursor else self.wait_seconds
+        query = urllib.parse.urlencode({"wait": wait, "cursor": self.cursor})
+        response = threadhall_request(config, f"api/pibells/v1/commands/wait?{query}", timeout=wait + 10)
+        received = time.monotonic()
+        data = response.get("data") if isinstance(response.get("data"), dict) else response
+        self.supported = True
+        self.set_connected(True)
+        self.cursor = str(data.get("cursor") or self.cursor or "0")
+        commands = [item for item in data.get("commands", []) if isinstance(item, dict)]
+        if commands:
+            self.last_event_at = datetime.now().isoformat(timespec="seconds")
+        threadhall_outbox.drain(config)
+        return handle_threadhall_commands(config, commands, "push", received)
+
+    def run(self) -> None:
+        attempt = 0
+        while not self.stopped.is_set():
+            config = load_threadhall_config()
+            if not threadhall_ready(config):
+                self.set_connected(False)
+                self.cursor = ""
+                self.stopped.wait(10)
+                continue
+            try:
+                self.poll_once(config)
+                attempt = 0
+                self.last_error = ""
+                continue
+            except ThreadhallError as exc:
+                self.last_error = str(exc.detail)
+                if exc.upstream_status in {404, 405, 501}:
+                    self.supported = False
+                    self.set_connected(False)
+                    self.stopped.wait(THREADHALL_RECONCILE_SECONDS)
+                    continue
+            except Exception as exc:
+                self.last_error = str(getattr(exc, "detail", exc))
+            self.failures += 1
+            attempt += 1
+            self.set_connected(False)
+            self.stopped.wait(threadhall_backoff(attempt, 1, 60))
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def latency(self) -> Dict[str, Any]:
+        with self.lock:
+            entries = list(self.commands)
+        recent: List[Dict[str, Any]] = []
+        by_channel: Dict[str, List[float]] = {}
+        for entry in entries:
+            job = entry["job"]
+            played_ms = None
+            if isinstance(job, PlaybackJob):
+                played_ms = job.first_audio_ms()
+                if played_ms is None and job.started:
+                    played_ms = (job.started - job.created) * 1000
+                if played_ms is not None:
+                    played_ms = round(played_ms + (job.created - entry["received"]) * 1000, 2)
+            if played_ms is not None:
+                by_channel.setdefault(entry["channel"], []).append(played_ms)
+            recent.append({
+                **{key: value for key, value in entry.items() if key not in {"job", "received"}},
+                "job_id": job.id if isinstance(job, PlaybackJob) else None,
+                "receive_to_play_ms": played_ms,
+            })
+        summary: Dict[str, Any] = {}
+        for channel, values in by_channel.items():
+            values.sort()
+            summary[channel] = {
+                "commands": len(values),
+                "p50_ms": values[len(values) // 2],
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max_ms": values[-1],
+            }
+        return {"channels": summary, "recent": recent[-10:]}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": THREADHALL_PUSH,
+            "connected": self.connected,
+            "supported": self.supported,
+            "connects": self.connects,
+            "failures": self.failures,
+            "last_event_at": self.last_event_at,
+            "last_error": self.last_error,
+            "wait_seconds": self.wait_seconds,
+        }
+
+
+def threadhall_backoff(attempt: int, base: float, cap: float) -> float:
+    delay = min(cap, base * 2 ** max(0, attempt - 1))
+    return random.uniform(delay / 2, delay)
+
+
+class ThreadhallOutbox:
+    def __init__(self, path: Path, max_entries: int, batch_size: int) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.draining = threading.Lock()
+        self.entries: Optional[List[Dict[str, Any]]] = None
+        self.attempts = 0
+        self.next_attempt = 0.0
+        self.counters = {"queued": 0, "uploaded": 0, "uploads": 0, "dropped": 0, "compactions": 0}
+        self.last_error = ""
+
+    def load(self) -> List[Dict[str, Any]]:
+        if self.entries is None:
+            self.entries = []
+            try:
+                lines = self.path.read_text(encoding="utf-8").splitlines()
+            except OSError:
+                lines = []
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(entry, dict) and entry.get("kind") in {"ack", "status"}:
+                    self.entries.append(entry)
+            for entry in self.entries:
+                if entry["kind"] == "ack" and isinstance(entry.get("ack"), dict) and "id" in entry["ack"]:
+                    threadhall_push.claim(entry["ack"]["id"])
+                    threadhall_push.remember(entry["ack"])
+        return self.entries
+
+    def encode(self, entries: List[Dict[str, Any]]) -> str:
+        return "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries)
+
+    def rewrite(self) -> None:
+        entries = self.load()
+        if not entries:
+            self.path.unlink(missing_ok=True)
+            return
+        temp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with temp_path.open("w", encoding="utf-8") as f:
+            f.write(self.encode(entries))
+            f.flush()
+            os.fsync(f.fileno())
+        temp_path.replace(self.path)
+
+    def compact(self) -> None:
+        entries = self.load()
+        acks = sum(1 for entry in entries if entry["kind"] == "ack")
+        latest = next((entry for entry in reversed(entries) if entry["kind"] == "status"), None)
+        if acks >= self.max_entries:
+            latest = None
+        self.entries = [entry for entry in entries if entry["kind"] == "ack" or entry is latest]
+        self.counters["dropped"] += len(entries) - len(self.entries)
+        self.counters["compactions"] += 1
+        self.rewrite()
+
+    def append(self, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        with self.lock:
+            self.load().extend(entries)
+            self.counters["queued"] += len(entries)
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(self.encode(entries))
+                    f.flush()
+                    os.fsync(f.fileno())
+                if len(self.entries) > self.max_entries:
+                    self.compact()
+            except OSError as exc:
+                self.last_error = f"Outbox write failed: {exc}"
+                print(self.last_error)
+
+    def queue_acks(self, acks: List[Dict[str, Any]]) -> None:
+        at = datetime.now().isoformat(timespec="seconds")
+        self.append([{"kind": "ack", "at": at, "ack": ack} for ack in acks])
+
+    def queue_status(self, status: Dict[str, Any]) -> bool:
+        status_hash = threadhall_status_hash(status)
+        with self.lock:
+            last = next((entry for entry in reversed(self.load()) if entry["kind"] == "status"), None)
+        if last and last.get("hash") == status_hash:
+            return False
+        self.append([{
+            "kind": "status",
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "hash": status_hash,
+            "status": status,
+        }])
+        return True
+
+    def pending(self) -> int:
+        with self.lock:
+            return len(self.load())
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries = []
+            self.attempts = 0
+            self.next_attempt = 0.0
+            self.rewrite()
+
+    def upload(self, config: Dict[str, Any], batch: List[Dict[str, Any]]) -> None:
+        acks = [entry["ack"] for entry in batch if entry["kind"] == "ack"]
+        events = [{"at": entry["at"], "status": entry["status"]} for entry in batch if entry["kind"] == "status"]
+        if not threadhall_sync_state.get("outbox_unsupported"):
+            try:
+                threadhall_request(
+                    config, "api/pibells/v1/outbox", method="POST", payload={"acks": acks, "status_events": events}
+                )
+                return
+            except ThreadhallError as exc:
+                if exc.upstream_status not in {404, 405}:
+                    raise
+                threadhall_sync_state["outbox_unsupported"] = True
+        acknowledge_threadhall_commands(config, acks)
+
+    def drain(self, config: Dict[str, Any], force: bool = False) -> int:
+        if not force and time.monotonic() < self.next_attempt:
+            return 0
+        if not self.draining.acquire(blocking=False):
+            return 0
+        sent = 0
+        try:
+            while True:
+                with self.lock:
+                    batch = self.load()[: self.batch_size]
+                if not batch:
+                    break
+                try:
+                    self.upload(config, batch)
+                except Exception as exc:
+                    self.attempts += 1
+                    self.next_attempt = time.monotonic() + threadhall_backoff(self.attempts, 5, 300)
+                    self.last_error = str(getattr(exc, "detail", exc))
+                    break
+                uploaded = {id(entry) for entry in batch}
+                with self.lock:
+                    self.entries = [entry for entry in self.load() if id(entry) not in uploaded]
+                    self.rewrite()
+                self.counters["uploads"] += 1
+                self.counters["uploaded"] += len(batch)
+                self.attempts = 0
+                self.next_attempt = 0.0
+                self.last_error = ""
+                sent += len(batch)
+        finally:
+            self.draining.release()
+        return sent
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            entries = list(self.load())
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            size = 0
+        return {
+            "pending_acks": sum(1 for entry in entries if entry["kind"] == "ack"),
+            "pending_status": sum(1 for entry in entries if entry["kind"] == "status"),
+            "bytes": size,
+            "max_entries": self.max_entries,
+            **self.counters,
+            "attempts": self.attempts,
+            "retry_in": round(max(0.0, self.next_attempt - time.monotonic()), 1),
+            "last_error": self.last_error,
+        }
+
+
+threadhall_push = ThreadhallPush(THREADHALL_PUSH_WAIT_SECONDS)
+threadhall_outbox = ThreadhallOutbox(THREADHALL_OUTBOX_FILE, THREADHALL_OUTBOX_MAX_ENTRIES, THREADHALL_OUTBOX_BATCH)
+threadhall_command_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=THREADHALL_COMMAND_WORKERS, thread_name_prefix="threadhall-command"
+)
+
+
+def threadhall_sync_failed(exc: Exception) -> Dict[str, Any]:
+    config = load_threadhall_config()
+    if config.get("enabled") and config.get("token"):
+        config = save_threadhall_config({
+            "last_error": str(getattr(exc, "detail", exc)),
+            "last_sync_at": threadhall_sync_state.get("last_sync_at") or config.get("last_sync_at"),
+        })
+        threadhall_outbox.queue_status(dashboard())
+    return config
+
+
 def threadhall_sync_loop() -> None:
+    failures = 0
     while True:
         delay = THREADHALL_DEFAULT_POLL_SECONDS
         try:
             status = sync_threadhall_once()
             delay = int(status.get("poll_seconds") or delay)
+            failures = 0
         except Exception as exc:
-            config = load_threadhall_config()
-            if config.get("enabled") and config.get("token"):
-                save_threadhall_config({
-                    "last_error": str(getattr(exc, "detail", exc)),
-                    "last_sync_at": config.get("last_sync_at"),
-                })
-            delay = int(config.get("poll_seconds") or delay)
-        time.sleep(max(10, min(300, delay)))
+            failures += 1
+            config = threadhall_sync_failed(exc)
+            delay = threadhall_backoff(failures, int(config.get("poll_seconds") or delay), 300)
+        delay = max(10, min(300, delay))
+        if threadhall_push.connected:
+            delay = max(delay, THREADHALL_RECONCILE_SECONDS)
+        threadhall_push.wake.wait(delay)
+        threadhall_push.wake.clear()
 
 
 def start_threadhall_sync() -> None:
@@ -879,6 +1907,8 @@ def start_threadhall_sync() -> None:
         return
     threadhall_sync_started = True
     threading.Thread(target=threadhall_sync_loop, daemon=True).start()
+    if THREADHALL_PUSH:
+        threading.Thread(target=threadhall_push.run, daemon=True).start()
 
 
 def find_audio_usages(filename: str) -> Dict[str, List[str]]:
@@ -991,22 +2021,8 @@ def current_session_user(request: Request) -> Optional[str]:
     return sessions.get(token)
 
 
-def stop_loops() -> None:
-    global loop_processes
-    for proc in loop_processes:
-        try:
-            proc.terminate()
-        except Exception:
-            pass
-    for proc in loop_processes:
-        try:
-            proc.wait(timeout=1)
-        except Exception:
-            try:
-                proc.kill()
-            except Exception:
-                pass
-    loop_processes = []
+def stop_loops() -> Dict[str, Any]:
+    return playback_manager.cancel_loops()
 
 
 def get_local_ip() -> str:
@@ -1118,21 +2134,57 @@ def build_scan_networks(ranges: str = "") -> List[ipaddress.IPv4Network]:
     return networks
 
 
-def iter_probe_hosts(networks: List[ipaddress.IPv4Network]) -> Tuple[List[str], List[str]]:
-    hosts: List[str] = []
+class HostRanges:
+    def __init__(self, intervals: List[Tuple[int, int]]) -> None:
+        merged: List[List[int]] = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.intervals = [(start, end) for start, end in merged]
+        self.total = sum(end - start + 1 for start, end in self.intervals)
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __contains__(self, host: str) -> bool:
+        value = int(ipaddress.IPv4Address(host))
+        index = bisect.bisect_right(self.intervals, (value, 1 << 32)) - 1
+        return index >= 0 and self.intervals[index][0] <= value <= self.intervals[index][1]
+
+    def blocks(self) -> List[Tuple[int, int, int]]:
+        blocks: List[Tuple[int, int, int]] = []
+        for start, end in self.intervals:
+            for base in range(start & ~0xFF, end + 1, 256):
+                blocks.append((base, max(start, base) - base, min(end, base + 255) - base))
+        return blocks
+
+    def __iter__(self) -> Iterable[str]:
+        blocks = self.blocks()
+        for offset in range(256):
+            for base, low, high in blocks:
+                if low <= offset <= high:
+                    yield socket.inet_ntoa((base + offset).to_bytes(4, "big"))
+
+
+def network_host_interval(network: ipaddress.IPv4Network) -> Tuple[int, int]:
+    first = int(network.network_address)
+    last = int(network.broadcast_address)
+    if network.prefixlen < 31:
+        return first + 1, last - 1
+    return first, last
+
+
+def iter_probe_hosts(networks: List[ipaddress.IPv4Network]) -> Tuple[HostRanges, List[str]]:
+    intervals: List[Tuple[int, int]] = []
     skipped: List[str] = []
     for network in networks:
-        if network.num_addresses == 1:
-            candidates = [str(network.network_address)]
-        elif network.num_addresses <= BARIX_SCAN_MAX_HOSTS + 2:
-            candidates = [str(host) for host in network.hosts()]
+        if network.num_addresses <= BARIX_SCAN_MAX_HOSTS + 2:
+            intervals.append(network_host_interval(network))
         else:
             skipped.append(str(network))
-            continue
-        for host in candidates:
-            if host not in hosts:
-                hosts.append(host)
-    return hosts, skipped
+    return HostRanges(intervals), skipped
 
 
 def parse_barix_discovery_payload(data: bytes) -> Dict[str, str]:
@@ -1211,6 +2263,21 @@ def discover_barix_binary(networks: List[ipaddress.IPv4Network], timeout: float
     return list(found.values())
 
 
+def parse_barix_http_response(headers: str, body: str) -> Optional[Dict[str, str]]:
+    text = f"{headers}\n{body}".lower()
+    if not any(term in text for term in ("barix", "exstreamer", "instreamer", "annuncicom", "ip audio")):
+        return None
+    meta: Dict[str, str] = {}
+    title = re.search(r"<title[^>]*>(.*?)</title>", body, re.IGNORECASE | re.DOTALL)
+    if title:
+        meta["name"] = re.sub(r"\s+", " ", title.group(1)).strip()
+    for token in ("Exstreamer", "Instreamer", "Annuncicom", "IP Audio", "Barix"):
+        if token.lower() in text:
+            meta["model"] = token
+            break
+    return meta
+
+
 def barix_http_probe(ip: str, timeout: float) -> Optional[Dict[str, str]]:
     conn: Optional[http.client.HTTPConnection] = None
     try:
@@ -1219,18 +2286,7 @@ def barix_http_probe(ip: str, timeout: float) -> Optional[Dict[str, str]]:
         resp = conn.getresponse()
         body = resp.read(4096).decode("latin-1", errors="ignore")
         headers = "\n".join(f"{key}: {value}" for key, value in resp.getheaders())
-        text = f"{headers}\n{body}".lower()
-        if not any(term in text for term in ("barix", "exstreamer", "instreamer", "annuncicom", "ip audio")):
-            return None
-        meta: Dict[str, str] = {}
-        title = re.search(r"<title[^>]*>(.*?)</title>", body, re.IGNORECASE | re.DOTALL)
-        if title:
-            meta["name"] = re.sub(r"\s+", " ", title.group(1)).strip()
-        for token in ("Exstreamer", "Instreamer", "Annuncicom", "IP Audio", "Barix"):
-            if token.lower() in text:
-                meta["model"] = token
-                break
-        return meta
+        return parse_barix_http_response(headers, body)
     except Exception:
         return None
     finally:
@@ -1259,61 +2315,784 @@ def probe_barix_candidate(ip: str, timeout: float = 0.35) -> Optional[Dict[str,
     return None
 
 
-def discover_barix_devices_iter(ranges: str = "") -> Iterable[Dict[str, Any]]:
-    networks = build_scan_networks(ranges)
-    hosts, skipped = iter_probe_hosts(networks)
-    total = max(len(hosts) + 1, 1)
-    candidates: Dict[str, Dict[str, Any]] = {}
+class AdaptiveTimeout:
+    def __init__(self, initial: float, minimum: float, samples: int = 256) -> None:
+        self.initial = initial
+        self.minimum = minimum
+        self.samples: "collections.deque[float]" = collections.deque(maxlen=samples)
 
-    yield {
-        "progress": 0,
-        "total": total,
-        "step": "Broadcast discovery",
-        "ranges": [str(network) for network in networks],
-        "skipped": skipped,
-    }
-    for candidate in discover_barix_binary(networks):
-        added = merge_candidate(candidates, candidate)
-        if added:
-            yield {"progress": 1, "total": total, "device": added, "step": "Broadcast discovery"}
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
 
-    if not hosts:
-        yield {"progress": total, "total": total, "complete": True, "devices": list(candidates.values())}
-        return
+    def current(self) -> float:
+        if len(self.samples) < 8:
+            return self.initial
+        ordered = sorted(self.samples)
+        p90 = ordered[int(len(ordered) * 0.9) - 1]
+        return max(self.minimum, min(self.initial, p90 * 4 + 0.05))
 
-    workers = min(BARIX_SCAN_WORKERS, max(1, len(hosts)))
-    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = {executor.submit(probe_barix_candidate, host): host for host in hosts}
-        for index, future in enumerate(concurrent.futures.as_completed(futures), start=1):
-            data: Dict[str, Any] = {
-                "progress": min(index + 1, total),
-                "total": total,
-                "step": f"Probing {futures[future]}",
-            }
-            try:
-                candidate = future.result()
-            except Exception:
-                candidate = None
-            if candidate:
-                added = merge_candidate(candidates, candidate)
-                if added:
-                    data["device"] = added
-            yield data
 
-    yield {"progress": total, "total": total, "complete": True, "devices": list(candidates.values()), "skipped": skipped}
+async def open_probe_connection(ip: str, port: int, timeout: float, timeouts: AdaptiveTimeout):
+    started = time.monotonic()
+    try:
+        connection = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except ConnectionRefusedError:
+        timeouts.observe(time.monotonic() - started)
+        return None
+    except (asyncio.TimeoutError, OSError):
+        return None
+    timeouts.observe(time.monotonic() - started)
+    return connection
 
 
-def discover_barix_devices(ranges: str = "") -> List[Dict[str, Any]]:
-    devices: Dict[str, Dict[str, Any]] = {}
-    for event in discover_barix_devices_iter(ranges=ranges):
-        if event.get("device"):
-            devices[event["device"]["key"]] = event["device"]
-        for device in event.get("devices", []):
-            devices[device["key"]] = device
-    return list(devices.values())
+async def close_probe_connection(writer: asyncio.StreamWriter) -> None:
+    writer.close()
+    try:
+        await asyncio.wait_for(writer.wait_closed(), 0.2)
+    except Exception:
+        pass
 
 
-def check_device(device: Device, timeout: float = 0.5) -> bool:
+async def barix_http_probe_async(ip: str, timeout: float, timeouts: AdaptiveTimeout) -> Optional[Dict[str, str]]:
+    connection = await open_probe_connection(ip, BARIX_HTTP_PORT, timeout, timeouts)
+    if connection is None:
+        return None
+    reader, writer = connection
+    try:
+        writer.write(f"GET / HTTP/1.0\r\nHost: {ip}\r\nConnection: close\r\n\r\n".encode("ascii"))
+        data = b""
+        deadline = time.monotonic() + max(timeout, 0.5)
+        while len(data) < 8192:
+            chunk = await asyncio.wait_for(reader.read(8192 - len(data)), max(0.01, deadline - time.monotonic()))
+            if not chunk:
+                break
+            data += chunk
+        head, _, body = data.decode("latin-1", errors="ignore").partition("\r\n\r\n")
+        return parse_barix_http_response(head.partition("\r\n")[2], body[:4096])
+    except Exception:
+        return None
+    finally:
+        await close_probe_connection(writer)
+
+
+async def barix_tcp_probe_async(ip: str, timeout: float, timeouts: AdaptiveTimeout) -> bool:
+    connection = await open_probe_connection(ip, BARIX_TCP_PORT, timeout, timeouts)
+    if connection is None:
+        return False
+    await close_probe_connection(connection[1])
+    return True
+
+
+async def probe_barix_candidate_async(
+    ip: str,
+    timeouts: AdaptiveTimeout,
+    seed: Optional[Dict[str, str]] = None,
+) -> Optional[Dict[str, Any]]:
+    timeout = timeouts.current()
+    meta, tcp_open = await asyncio.gather(
+        barix_http_probe_async(ip, timeout, timeouts),
+        barix_tcp_probe_async(ip, timeout, timeouts),
+    )
+    return barix_probe_result(ip, meta, tcp_open, seed)
+
+
+def barix_probe_result(
+    ip: str,
+    meta: Optional[Dict[str, str]],
+    tcp_open: bool,
+    seed: Optional[Dict[str, str]] = None,
+) -> Optional[Dict[str, Any]]:
+    try:
+        if meta is not None:
+            return candidate_payload(ip, "HTTP probe", {**(seed or {}), **meta})
+        if tcp_open:
+            return candidate_payload(ip, f"TCP {BARIX_TCP_PORT}", {"model": "Barix device", **(seed or {})})
+    except HTTPException:
+        pass
+    return None
+
+
+async def sweep_barix_host(ip: str, timeouts: AdaptiveTimeout) -> Optional[Tuple[bool, bool]]:
+    timeout = timeouts.current()
+    http_conn, tcp_conn = await asyncio.gather(
+        open_probe_connection(ip, BARIX_HTTP_PORT, timeout, timeouts),
+        open_probe_connection(ip, BARIX_TCP_PORT, timeout, timeouts),
+    )
+    for connection in (http_conn, tcp_conn):
+        if connection is not None:
+            await close_probe_connection(connection[1])
+    if http_conn is None and tcp_conn is None:
+        return None
+    return http_conn is not None, tcp_conn is not None
+
+
+async def identify_barix_host(ip: str, ports: Tuple[bool, bool], timeouts: AdaptiveTimeout) -> Optional[Dict[str, Any]]:
+    http_open, tcp_open = ports
+    meta = await barix_http_probe_async(ip, timeouts.initial, timeouts) if http_open else None
+    return barix_probe_result(ip, meta, tcp_open)
+
+
+def read_neighbor_table(path: Optional[Path] = None) -> Dict[str, str]:
+    neighbors: Dict[str, str] = {}
+    try:
+        lines = (path or NEIGHBOR_TABLE_FILE).read_text().splitlines()[1:]
+    except OSError:
+        return neighbors
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 4 or fields[2] == "0x0" or fields[3] == "00:00:00:00:00:00":
+            continue
+        neighbors[fields[0]] = fields[3].upper()
+    return neighbors
+
+
+def scan_concurrency(limit: int) -> int:
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return limit
+    return max(1, min(limit, (soft - 64) // 2))
+
+
+async def scan_hosts_async(
+    hosts: Iterable[str],
+    probe: Callable[[str, AdaptiveTimeout], Any],
+    emit: Callable[[str, Any, float], None],
+    stopped: Callable[[], bool],
+    timeouts: AdaptiveTimeout,
+    concurrency: int,
+) -> None:
+    remaining = iter(hosts)
+
+    async def worker() -> None:
+        for host in remaining:
+            if stopped():
+                return
+            started = time.monotonic()
+            try:
+                result = await probe(host, timeouts)
+            except Exception:
+                result = None
+            emit(host, result, round((time.monotonic() - started) * 1000, 2))
+
+    workers = asyncio.gather(*(worker() for _ in range(concurrency)))
+    while not workers.done():
+        await asyncio.wait({workers}, timeout=0.05)
+        if stopped():
+            workers.cancel()
+    try:
+        await workers
+    except asyncio.CancelledError:
+        pass
+
+
+def scan_hosts(
+    hosts: Iterable[str],
+    probe: Optional[Callable[[str, AdaptiveTimeout], Any]] = None,
+    concurrency: Optional[int] = None,
+    timeouts: Optional[AdaptiveTimeout] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Iterable[Tuple[str, Any, float]]:
+    results: "queue.Queue[Optional[Tuple[str, Any, float]]]" = queue.Queue(maxsize=4096)
+    stop = threading.Event()
+    timeouts = timeouts or AdaptiveTimeout(BARIX_SCAN_TIMEOUT, BARIX_SCAN_MIN_TIMEOUT)
+    limit = scan_concurrency(concurrency or BARIX_SCAN_CONCURRENCY)
+
+    def stopped() -> bool:
+        return stop.is_set() or bool(cancel and cancel.is_set())
+
+    def emit(host: str, result: Any, elapsed_ms: float) -> None:
+        while not stopped():
+            try:
+                results.put((host, result, elapsed_ms), timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def run() -> None:
+        try:
+            asyncio.run(scan_hosts_async(hosts, probe or probe_barix_candidate_async, emit, stopped, timeouts, limit))
+        finally:
+            results.put(None)
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = results.get()
+            if item is None:
+                break
+            yield item
+    finally:
+        stop.set()
+        worker.join(timeout=2)
+
+
+class DiscoveryInventory:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.reload()
+
+    def reload(self) -> None:
+        raw = read_json(self.path, {})
+        self.entries = raw if isinstance(raw, dict) else {}
+
+    @staticmethod
+    def key_for(ip: str, mac: str = "") -> str:
+        return mac.upper() if mac else f"ip:{ip}"
+
+    def known_hosts(self, neighbors: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        located = {mac: ip for ip, mac in neighbors.items()}
+        known: Dict[str, Dict[str, Any]] = {}
+        for entry in self.entries.values():
+            ip = located.get(entry.get("mac") or "", entry.get("ip"))
+            if ip:
+                known[ip] = entry
+        return known
+
+    def observe(self, candidate: Dict[str, Any], response_ms: Optional[float] = None) -> Optional[str]:
+        now = datetime.now().isoformat(timespec="seconds")
+        key = self.key_for(candidate["ip"], candidate.get("mac", ""))
+        entry = self.entries.get(key)
+        if entry is None and candidate.get("mac"):
+            entry = self.entries.pop(self.key_for(candidate["ip"]), None)
+        entry = entry or {"first_seen": now, "previous_ips": []}
+        moved_from = entry.get("ip") if entry.get("ip") not in (None, candidate["ip"]) else None
+        if moved_from:
+            previous = [ip for ip in entry.get("previous_ips", []) if ip != moved_from]
+            entry["previous_ips"] = [moved_from, *previous][:5]
+        entry.update({
+            "key": key,
+            "ip": candidate["ip"],
+            "mac": candidate.get("mac", ""),
+            "name": candidate.get("name", ""),
+            "model": candidate.get("model", ""),
+            "method": candidate.get("method", ""),
+            "last_seen": now,
+        })
+        if response_ms is not None:
+            entry["response_ms"] = response_ms
+        self.entries[key] = entry
+        return moved_from
+
+    def save(self) -> None:
+        with storage_lock:
+            write_json(self.path, self.entries)
+
+
+def load_discovery_inventory() -> List[Dict[str, Any]]:
+    entries = DiscoveryInventory(BARIX_INVENTORY_FILE).entries.values()
+    return sorted(entries, key=lambda entry: entry.get("last_seen") or "", reverse=True)
+
+
+def discover_barix_devices_iter(
+    ranges: str = "",
+    quick: bool = False,
+    cancel: Optional[threading.Event] = None,
+    scan_networks: Optional[List[str]] = None,
+) -> Iterable[Dict[str, Any]]:
+    if scan_networks is None:
+        networks = build_scan_networks(ranges)
+    else:
+        networks = [ipaddress.ip_network(item) for item in scan_networks]
+    hosts, skipped = iter_probe_hosts(networks)
+    total = len(hosts) + 2
+    candidates: Dict[str, Dict[str, Any]] = {}
+    response_times: Dict[str, float] = {}
+    stages: Dict[str, float] = {}
+    timeouts = AdaptiveTimeout(BARIX_SCAN_TIMEOUT, BARIX_SCAN_MIN_TIMEOUT)
+    inventory = DiscoveryInventory(BARIX_INVENTORY_FILE)
+    neighbors = read_neighbor_table()
+
+    def found(
+        candidate: Optional[Dict[str, Any]],
+        progress: int,
+        step: str,
+        elapsed_ms: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"progress": progress, "total": total, "step": step}
+        if elapsed_ms is not None:
+            data["host_ms"] = elapsed_ms
+        if not candidate:
+            return data
+        if elapsed_ms is not None:
+            response_times[candidate["ip"]] = elapsed_ms
+        added = merge_candidate(candidates, candidate)
+        if added:
+            data["device"] = added
+        return data
+
+    yield {
+        "progress": 0,
+        "total": total,
+        "step": "Checking known devices" if quick else "Broadcast discovery",
+        "ranges": [str(network) for network in networks],
+        "skipped": skipped,
+    }
+    if quick:
+        started = time.monotonic()
+        known = {ip: entry for ip, entry in inventory.known_hosts(neighbors).items() if ip in hosts}
+        for host, candidate, elapsed_ms in scan_hosts(
+            list(known),
+            lambda ip, timeouts: probe_barix_candidate_async(ip, timeouts, {"mac": known[ip].get("mac", "")}),
+            timeouts=timeouts,
+            cancel=cancel,
+        ):
+            yield found(candidate, 0, f"Checking {host}", elapsed_ms)
+        stages["known"] = round((time.monotonic() - started) * 1000, 2)
+        yield {
+            "progress": 0,
+            "total": total,
+            "step": "Broadcast discovery",
+            "stage": "known",
+            "stage_ms": stages["known"],
+            "known": len(known),
+            "verified": len(candidates),
+        }
+
+    started = time.monotonic()
+    for candidate in discover_barix_binary(networks):
+        data = found(candidate, 0, "Broadcast discovery")
+        if "device" in data:
+            yield data
+    seeds = {ip: mac for ip, mac in neighbors.items() if ip in hosts and f"{ip}:{BARIX_STREAM_PORT}" not in candidates}
+    for host, candidate, elapsed_ms in scan_hosts(
+        list(seeds),
+        lambda ip, timeouts: probe_barix_candidate_async(ip, timeouts, {"mac": seeds[ip]}),
+        timeouts=timeouts,
+        cancel=cancel,
+    ):
+        yield found(candidate, 0, f"Checking neighbor {host}", elapsed_ms)
+    stages["seed"] = round((time.monotonic() - started) * 1000, 2)
+    yield {
+        "progress": 1,
+        "total": total,
+        "step": "Sweeping",
+        "stage": "seed",
+        "stage_ms": stages["seed"],
+        "neighbors": len(neighbors),
+        "seeds": len(seeds),
+    }
+
+    started = time.monotonic()
+    checked = {candidate["ip"] for candidate in candidates.values()} | set(seeds)
+    responsive: Dict[str, Tuple[bool, bool]] = {}
+    for index, (host, ports, elapsed_ms) in enumerate(
+        scan_hosts(
+            (host for host in hosts if host not in checked), sweep_barix_host, timeouts=timeouts, cancel=cancel
+        ),
+        start=1,
+    ):
+        if ports:
+            responsive[host] = ports
+        yield {
+            "progress": min(index + 1, total - 1),
+            "total": total,
+            "step": f"Probing {host}",
+            "host_ms": elapsed_ms,
+        }
+    stages["sweep"] = round((time.monotonic() - started) * 1000, 2)
+    yield {
+        "progress": total - 1,
+        "total": total,
+        "step": "Identifying devices",
+        "stage": "sweep",
+        "stage_ms": stages["sweep"],
+        "responsive": len(responsive),
+    }
+
+    started = time.monotonic()
+    for host, candidate, elapsed_ms in scan_hosts(
+        list(responsive),
+        lambda ip, timeouts: identify_barix_host(ip, responsive[ip], timeouts),
+        timeouts=timeouts,
+        cancel=cancel,
+    ):
+        yield found(candidate, total - 1, f"Identifying {host}", elapsed_ms)
+    stages["identify"] = round((time.monotonic() - started) * 1000, 2)
+
+    neighbors = read_neighbor_table()
+    moves: List[Dict[str, str]] = []
+    with storage_lock:
+        inventory.reload()
+        for candidate in candidates.values():
+            if not candidate.get("mac") and candidate["ip"] in neighbors:
+                candidate["mac"] = neighbors[candidate["ip"]]
+            moved_from = inventory.observe(candidate, response_times.get(candidate["ip"]))
+            if moved_from:
+                candidate["previous_ip"] = moved_from
+                moves.append({"mac": candidate["mac"], "from": moved_from, "to": candidate["ip"]})
+        if candidates:
+            inventory.save()
+
+    yield {
+        "progress": total,
+        "total": total,
+        "complete": True,
+        "devices": list(candidates.values()),
+        "moved": moves,
+        "skipped": skipped,
+        "stages": stages,
+        "timeout_ms": round(timeouts.current() * 1000, 1),
+    }
+
+
+def discover_barix_devices(ranges: str = "") -> List[Dict[str, Any]]:
+    devices: Dict[str, Dict[str, Any]] = {}
+    for event in discover_barix_devices_iter(ranges=ranges):
+        if event.get("device"):
+            devices[event["device"]["key"]] = event["device"]
+        for device in event.get("devices", []):
+            devices[device["key"]] = device
+    return list(devices.values())
+
+
+class ScanEventBatcher:
+    PROGRESS_KEYS = {"progress", "total", "step", "host_ms"}
+
+    def __init__(self, rate: float, emit: Callable[[List[Dict[str, Any]]], None]) -> None:
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.emit = emit
+        self.lock = threading.Lock()
+        self.pending: Optional[Dict[str, Any]] = None
+        self.count = 0
+        self.slowest: Optional[float] = None
+        self.flushed = 0.0
+
+    def add(self, data: Dict[str, Any]) -> None:
+        with self.lock:
+            if not self.interval:
+                self.emit([data])
+                return
+            if not set(data) <= self.PROGRESS_KEYS:
+                self.pending = None
+                self.count = 0
+                self.slowest = None
+                self.emit([data])
+                return
+            self.pending = data
+            self.count += 1
+            if data.get("host_ms") is not None:
+                self.slowest = max(self.slowest or 0.0, data["host_ms"])
+            if time.monotonic() - self.flushed >= self.interval:
+                self.release()
+
+    def release(self) -> None:
+        if self.pending is None:
+            return
+        event = {key: value for key, value in self.pending.items() if key != "host_ms"}
+        event["batch"] = self.count
+        if self.slowest is not None:
+            event["host_ms_max"] = self.slowest
+        self.pending = None
+        self.count = 0
+        self.slowest = None
+        self.flushed = time.monotonic()
+        self.emit([event])
+
+    def flush(self) -> None:
+        with self.lock:
+            self.release()
+
+    def flush_on_deadline(self, stopped: threading.Event) -> None:
+        while self.interval and not stopped.wait(self.interval / 2):
+            with self.lock:
+                if time.monotonic() - self.flushed >= self.interval:
+                    self.release()
+
+
+def run_discovery_job(
+    scanner: Callable[..., Iterable[Dict[str, Any]]],
+    job_id: str,
+    ranges: str,
+    quick: bool,
+    networks: List[str],
+    results: Any,
+    cancel: threading.Event,
+) -> None:
+    try:
+        for data in scanner(ranges=ranges, quick=quick, cancel=cancel, scan_networks=networks):
+            results.put((job_id, data))
+            if cancel.is_set():
+                break
+    except Exception as exc:
+        results.put((job_id, {"error": str(exc)}))
+    finally:
+        results.put((job_id, None))
+
+
+def serve_discovery_worker(commands: Any, results: Any, niceness: int) -> None:
+    try:
+        os.nice(niceness)
+    except OSError:
+        pass
+    results.put((None, os.getpid()))
+    cancels: Dict[str, threading.Event] = {}
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+        action, job_id, *args = command
+        if action == "scan":
+            cancels[job_id] = threading.Event()
+            threading.Thread(
+                target=run_discovery_job, args=(args[0], job_id, *args[1:], results, cancels[job_id]), daemon=True
+            ).start()
+        elif action == "cancel" and job_id in cancels:
+            cancels.pop(job_id).set()
+
+
+class DiscoveryWorker:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.process: Optional[Any] = None
+        self.commands: Optional[Any] = None
+        self.routes: Dict[str, "queue.Queue[Optional[Dict[str, Any]]]"] = {}
+        self.starts = 0
+        self.jobs = 0
+        self.spawned_at: Optional[float] = None
+        self.startup_ms: Optional[float] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process is not None else None
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def ensure_started(self) -> None:
+        with self.lock:
+            if self.alive():
+                return
+            context = multiprocessing.get_context("spawn")
+            self.commands = context.Queue()
+            results = context.Queue()
+            self.spawned_at = time.monotonic()
+            self.startup_ms = None
+            self.process = context.Process(
+                target=serve_discovery_worker, args=(self.commands, results, BARIX_SCAN_NICE), daemon=True
+            )
+            self.process.start()
+            self.starts += 1
+            threading.Thread(target=self.route, args=(self.process, results), daemon=True).start()
+
+    def route(self, process: Any, results: Any) -> None:
+        while True:
+            try:
+                job_id, data = results.get(timeout=0.5)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                return
+            except (EOFError, OSError):
+                return
+            if job_id is None:
+                self.startup_ms = round((time.monotonic() - self.spawned_at) * 1000, 1)
+                continue
+            with self.lock:
+                events = self.routes.get(job_id)
+            if events is not None:
+                events.put(data)
+
+    def submit(
+        self, scanner: Callable[..., Iterable[Dict[str, Any]]], ranges: str, quick: bool, networks: List[str]
+    ) -> Tuple[str, "queue.Queue[Optional[Dict[str, Any]]]"]:
+        self.ensure_started()
+        job_id = secrets.token_hex(6)
+        events: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        with self.lock:
+            self.routes[job_id] = events
+            self.jobs += 1
+            self.commands.put(("scan", job_id, scanner, ranges, quick, networks))
+        return job_id, events
+
+    def release(self, job_id: str, cancel: bool) -> None:
+        with self.lock:
+            self.routes.pop(job_id, None)
+            if cancel and self.alive():
+                self.commands.put(("cancel", job_id))
+
+    def stop(self) -> None:
+        with self.lock:
+            process, self.process = self.process, None
+            if process is not None and process.is_alive():
+                self.commands.put(None)
+                process.join(1)
+                if process.is_alive():
+                    process.terminate()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            active = len(self.routes)
+        return {
+            "pid": self.pid,
+            "alive": self.alive(),
+            "nice": BARIX_SCAN_NICE,
+            "starts": self.starts,
+            "startup_ms": self.startup_ms,
+            "jobs": self.jobs,
+            "active": active,
+        }
+
+
+discovery_worker = DiscoveryWorker()
+
+
+def start_discovery_worker() -> None:
+    if not BARIX_SCAN_PROCESS or os.environ.get("PIBELLS_DISABLE_DISCOVERY_WORKER") == "1":
+        return
+    discovery_worker.ensure_started()
+
+
+class ScanSession:
+    def __init__(self, key: Tuple[str, bool], ranges: str, quick: bool) -> None:
+        self.id = secrets.token_hex(6)
+        self.key = key
+        self.ranges = ranges
+        self.quick = quick
+        self.events: List[Dict[str, Any]] = []
+        self.listeners = 0
+        self.done = False
+        self.cancel = threading.Event()
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.pid: Optional[int] = None
+
+    def scan(self) -> Iterable[Dict[str, Any]]:
+        if not BARIX_SCAN_PROCESS:
+            yield from discover_barix_devices_iter(ranges=self.ranges, quick=self.quick, cancel=self.cancel)
+            return
+        networks = [str(network) for network in build_scan_networks(self.ranges)]
+        job_id, events = discovery_worker.submit(discover_barix_devices_iter, self.ranges, self.quick, networks)
+        self.pid = discovery_worker.pid
+        finished = False
+        try:
+            while not self.cancel.is_set():
+                try:
+                    data = events.get(timeout=0.1)
+                except queue.Empty:
+                    if discovery_worker.alive():
+                        continue
+                    raise RuntimeError("Discovery worker exited unexpectedly")
+                if data is None:
+                    finished = True
+                    break
+                yield data
+        finally:
+            discovery_worker.release(job_id, cancel=not finished)
+
+    def run(self, on_done: Callable[["ScanSession"], None]) -> None:
+        scan = self.scan()
+        batcher = ScanEventBatcher(BARIX_SCAN_EVENT_RATE, self.append)
+        stopped = threading.Event()
+        threading.Thread(target=batcher.flush_on_deadline, args=(stopped,), daemon=True).start()
+        try:
+            for data in scan:
+                if self.cancel.is_set():
+                    break
+                batcher.add(data)
+            batcher.flush()
+        except Exception as exc:
+            batcher.add({"error": str(exc)})
+        finally:
+            stopped.set()
+            scan.close()
+            with self.lock:
+                self.done = True
+                self.finished = time.monotonic()
+            on_done(self)
+
+    def append(self, events: List[Dict[str, Any]]) -> None:
+        with self.lock:
+            self.events.extend(events)
+
+    def events_since(self, index: int) -> Tuple[List[Dict[str, Any]], bool]:
+        with self.lock:
+            return self.events[index:], self.done
+
+    def to_json(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "id": self.id,
+                "ranges": self.key[0],
+                "quick": self.quick,
+                "listeners": self.listeners,
+                "events": len(self.events),
+                "cancelled": self.cancel.is_set(),
+                "pid": self.pid,
+                "seconds": round((self.finished or time.monotonic()) - self.started, 2),
+            }
+
+
+class ScanSessionManager:
+    def __init__(self, idle_seconds: float) -> None:
+        self.idle_seconds = idle_seconds
+        self.sessions: Dict[Tuple[str, bool], ScanSession] = {}
+        self.lock = threading.Lock()
+        self.started = 0
+        self.shared = 0
+        self.cancelled = 0
+
+    @staticmethod
+    def session_key(ranges: str, quick: bool) -> Tuple[str, bool]:
+        try:
+            return ",".join(sorted(parse_scan_ranges(ranges))), quick
+        except HTTPException:
+            return ranges, quick
+
+    def attach(self, ranges: str = "", quick: bool = False) -> ScanSession:
+        key = self.session_key(ranges, quick)
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None or session.cancel.is_set():
+                session = ScanSession(key, ranges, quick)
+                self.sessions[key] = session
+                self.started += 1
+                threading.Thread(target=session.run, args=(self.finish,), daemon=True).start()
+            else:
+                self.shared += 1
+            session.listeners += 1
+            return session
+
+    def detach(self, session: ScanSession) -> None:
+        with self.lock:
+            session.listeners -= 1
+            idle = session.listeners <= 0 and not session.done
+        if idle:
+            timer = threading.Timer(self.idle_seconds, self.cancel_if_idle, args=(session,))
+            timer.daemon = True
+            timer.start()
+
+    def cancel_if_idle(self, session: ScanSession) -> None:
+        with self.lock:
+            if session.listeners > 0 or session.done or session.cancel.is_set():
+                return
+            session.cancel.set()
+            self.cancelled += 1
+            if self.sessions.get(session.key) is session:
+                del self.sessions[session.key]
+
+    def finish(self, session: ScanSession) -> None:
+        with self.lock:
+            if self.sessions.get(session.key) is session:
+                del self.sessions[session.key]
+
+    def busy(self) -> bool:
+        with self.lock:
+            return any(not session.done for session in self.sessions.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            sessions = list(self.sessions.values())
+            counts = {"started": self.started, "shared": self.shared, "cancelled": self.cancelled}
+        return {**counts, "worker": discovery_worker.stats(), "active": [session.to_json() for session in sessions]}
+
+
+scan_sessions = ScanSessionManager(BARIX_SCAN_IDLE_SECONDS)
+
+
+def check_device(device: Device, timeout: float = 0.5) -> bool:
     try:
         target = normalize_device_record(model_to_dict(device) if isinstance(device, BaseModel) else device)
     except HTTPException:
@@ -1323,117 +3102,1380 @@ def check_device(device: Device, timeout: float = 0.5) -> bool:
     return barix_tcp_probe(target.ip, timeout)
 
 
-def trigger_bell(sound_file: str, loop: bool = False) -> None:
-    global loop_processes
-    sound_file = ensure_audio_exists(sound_file)
-    devices = load_devices()
-    path = audio_path(sound_file)
+def probe_device_health(device: Device, timeout: float = 0.5) -> Tuple[bool, float]:
+    started = time.monotonic()
+    online = check_device(device, timeout)
+    return online, round((time.monotonic() - started) * 1000, 2)
 
-    def start_process(cmd: List[str], label: str) -> Optional[subprocess.Popen]:
-        try:
-            return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except FileNotFoundError as exc:
-            print(f"Failed to start {label}: {exc}")
-        except Exception as exc:
+
+class DeviceHealthMonitor:
+    def __init__(self, interval: float, workers: int) -> None:
+        self.interval = interval
+        self.workers = workers
+        self.table: Dict[str, Dict[str, Any]] = {}
+        self.condition = threading.Condition()
+        self.wake_event = threading.Event()
+        self.version = 0
+        self.sweeps = 0
+        self.last_sweep_ms: Optional[float] = None
+
+    def wake(self) -> None:
+        self.wake_event.set()
+
+    def record(self, device: Device, online: bool, rtt_ms: float) -> bool:
+        key = device_key(device)
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.condition:
+            previous = self.table.get(key)
+            entry = dict(previous or {"key": key, "last_seen": None, "failures": 0})
+            entry.update({"name": device.name, "online": online, "last_checked": now})
+            if online:
+                entry.update({"last_seen": now, "rtt_ms": rtt_ms, "failures": 0})
+            else:
+                entry.update({"rtt_ms": None, "failures": entry["failures"] + 1})
+            self.table[key] = entry
+            changed = previous is None or previous["online"] != online
+            if changed:
+                self.version += 1
+                self.condition.notify_all()
+            return changed
+
+    def refresh(self, devices: List[Device]) -> int:
+        started = time.monotonic()
+        changed = 0
+        if devices:
+            workers = min(self.workers, len(devices))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(probe_device_health, device): device for device in devices}
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        online, rtt_ms = future.result()
+                    except Exception:
+                        online, rtt_ms = False, 0.0
+                    changed += self.record(futures[future], online, rtt_ms)
+        keys = {device_key(device) for device in devices}
+        with self.condition:
+            stale = [key for key in self.table if key not in keys]
+            for key in stale:
+                del self.table[key]
+            if stale:
+                self.version += 1
+                self.condition.notify_all()
+            self.sweeps += 1
+            self.last_sweep_ms = round((time.monotonic() - started) * 1000, 2)
+        return changed
+
+    def run(self) -> None:
+        while True:
+            try:
+                self.refresh(load_devices())
+            except Exception as exc:
+                print(f"Device monitor error: {exc}")
+            self.wake_event.wait(self.interval)
+            self.wake_event.clear()
+
+    def ensure_current(self, devices: List[Device]) -> None:
+        with self.condition:
+            missing = [device for device in devices if device_key(device) not in self.table]
+        if missing:
+            self.refresh(devices)
+
+    def statuses(self, devices: List[Device]) -> Dict[str, bool]:
+        self.ensure_current(devices)
+        with self.condition:
+            return {device_key(device): bool(self.table.get(device_key(device), {}).get("online")) for device in devices}
+
+    def details(self, devices: List[Device]) -> List[Dict[str, Any]]:
+        self.ensure_current(devices)
+        with self.condition:
+            return [dict(self.table[device_key(device)]) for device in devices if device_key(device) in self.table]
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    def stats(self) -> Dict[str, Any]:
+        with self.condition:
+            return {
+                "devices": len(self.table),
+                "online": len([entry for entry in self.table.values() if entry["online"]]),
+                "version": self.version,
+                "sweeps": self.sweeps,
+                "last_sweep_ms": self.last_sweep_ms,
+                "interval_seconds": self.interval,
+            }
+
+
+device_monitor = DeviceHealthMonitor(DEVICE_HEALTH_INTERVAL_SECONDS, DEVICE_HEALTH_WORKERS)
+
+
+def start_device_monitor() -> None:
+    global device_monitor_started
+    if device_monitor_started or os.environ.get("PIBELLS_DISABLE_DEVICE_MONITOR") == "1":
+        return
+    device_monitor_started = True
+    threading.Thread(target=device_monitor.run, daemon=True).start()
+
+
+def start_process(cmd: List[str], label: str, **kwargs: Any) -> Optional[subprocess.Popen]:
+    options = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL, **kwargs}
+    try:
+        return subprocess.Popen(cmd, **options)
+    except (PermissionError, ProcessLookupError) as exc:
+        if not options.get("process_group"):
             print(f"Failed to start {label}: {exc}")
-        return None
+            return None
+        return start_process(cmd, label, **{**kwargs, "process_group": 0})
+    except FileNotFoundError as exc:
+        print(f"Failed to start {label}: {exc}")
+    except Exception as exc:
+        print(f"Failed to start {label}: {exc}")
+    return None
+
 
-    def start_local() -> Optional[subprocess.Popen]:
-        quoted_path = shlex.quote(str(path))
+def local_player_commands(source: str, loop: bool = False, pcm: bool = False) -> List[List[str]]:
+    quoted_source = shlex.quote(source)
+    pcm_cmds: List[List[str]] = []
+    if pcm:
+        aplay_source = "-" if source == "pipe:0" else source
         if loop:
-            player_cmds = [
-                ["ffplay", "-nodisp", "-autoexit", "-loop", "0", str(path)],
-                [
-                    "bash",
-                    "-lc",
-                    f"while true; do ffmpeg -hide_banner -loglevel error -i {quoted_path} -f wav - | aplay -q -; done",
-                ],
-            ]
+            pcm_cmds = [["bash", "-lc", f"while true; do aplay -q {shlex.quote(aplay_source)}; done"]]
         else:
-            player_cmds = [
-                ["ffplay", "-nodisp", "-autoexit", str(path)],
-                ["bash", "-lc", f"ffmpeg -hide_banner -loglevel error -i {quoted_path} -f wav - | aplay -q -"],
-            ]
-        for cmd in player_cmds:
-            proc = start_process(cmd, "local playback")
-            if proc:
-                return proc
-        print("No audio player found (ffplay/aplay)")
+            pcm_cmds = [["aplay", "-q", aplay_source]]
+    if loop:
+        return pcm_cmds + [
+            ["ffplay", "-nodisp", "-autoexit", "-loop", "0", source],
+            [
+                "bash",
+                "-lc",
+                f"while true; do ffmpeg -hide_banner -loglevel error -i {quoted_source} -f wav - | aplay -q -; done",
+            ],
+        ]
+    return pcm_cmds + [
+        ["ffplay", "-nodisp", "-autoexit", source],
+        ["bash", "-lc", f"ffmpeg -hide_banner -loglevel error -i {quoted_source} -f wav - | aplay -q -"],
+    ]
+
+
+def encoder_command(source: str, output: str, loop: bool = False) -> List[str]:
+    ffmpeg_cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-re",
+        "-fflags",
+        "+nobuffer",
+        "-flush_packets",
+        "1",
+        "-muxdelay",
+        "0",
+        "-muxpreload",
+        "0",
+    ]
+    if loop:
+        ffmpeg_cmd += ["-stream_loop", "-1"]
+    ffmpeg_cmd += [
+        "-i",
+        source,
+        "-f",
+        "mp3",
+        "-codec:a",
+        "libmp3lame",
+        "-b:a",
+        "128k",
+        output,
+    ]
+    return ffmpeg_cmd
+
+
+def stream_command(source: str, device: Device, loop: bool = False) -> List[str]:
+    return encoder_command(source, device_stream_url(device), loop)
+
+
+MP3_BITRATES = {
+    3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    0: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+mp3_packet_cache: Dict[Path, Tuple[Optional[Tuple[int, int, int]], Optional[List[Tuple[float, bytes]]]]] = {}
+stream_history: "collections.deque[Dict[str, Any]]" = collections.deque(maxlen=50)
+
+
+def parse_mp3_frames(data: bytes) -> List[Tuple[int, int, float, int]]:
+    offset = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = ((data[6] & 0x7F) << 21) | ((data[7] & 0x7F) << 14) | ((data[8] & 0x7F) << 7) | (data[9] & 0x7F)
+        offset = 10 + size + (10 if data[5] & 0x10 else 0)
+    frames: List[Tuple[int, int, float, int]] = []
+    while offset + 4 <= len(data):
+        header = int.from_bytes(data[offset:offset + 4], "big")
+        version = (header >> 19) & 3
+        layer = (header >> 17) & 3
+        bitrate_index = (header >> 12) & 0xF
+        rate_index = (header >> 10) & 3
+        if header >> 21 != 0x7FF or version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            if data[offset:offset + 3] == b"TAG":
+                break
+            offset += 1
+            continue
+        bitrate = MP3_BITRATES[version][bitrate_index] * 1000
+        sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+        samples = 1152 if version == 3 else 576
+        length = samples // 8 * bitrate // sample_rate + ((header >> 9) & 1)
+        if offset + length > len(data):
+            break
+        frames.append((offset, length, samples / sample_rate, bitrate))
+        offset += length
+    return frames
+
+
+def packetize_mp3(data: bytes, frames: List[Tuple[int, int, float, int]]) -> List[Tuple[float, bytes]]:
+    packets: List[Tuple[float, bytes]] = []
+    start = end = frames[0][0]
+    packet_time = elapsed = 0.0
+    for offset, length, duration, _ in frames:
+        if end - start + length > STREAM_PACKET_SIZE and end > start:
+            packets.append((packet_time, data[start:end]))
+            start = offset
+            packet_time = elapsed
+        end = offset + length
+        elapsed += duration
+    packets.append((packet_time, data[start:end]))
+    packets.append((elapsed, b""))
+    return packets
+
+
+def paced_stream_packets(path: Path) -> Optional[List[Tuple[float, bytes]]]:
+    if path.suffix.lower() != ".mp3":
         return None
+    signature = file_signature(path)
+    cached = mp3_packet_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    packets: Optional[List[Tuple[float, bytes]]] = None
+    try:
+        data = path.read_bytes()
+    except OSError:
+        data = b""
+    frames = parse_mp3_frames(data)
+    if frames and {frame[3] // 1000 for frame in frames} <= STREAM_PASSTHROUGH_KBPS:
+        packets = packetize_mp3(data, frames)
+    mp3_packet_cache[path] = (signature, packets)
+    return packets
 
-    def start_stream(device: Device) -> Optional[subprocess.Popen]:
-        ffmpeg_cmd = [
-            "ffmpeg",
-            "-hide_banner",
-            "-loglevel",
-            "error",
-            "-re",
-            "-fflags",
-            "+nobuffer",
-            "-flush_packets",
-            "1",
-            "-muxdelay",
-            "0",
-            "-muxpreload",
-            "0",
-        ]
-        if loop:
-            ffmpeg_cmd += ["-stream_loop", "-1"]
-        ffmpeg_cmd += [
-            "-i",
-            str(path),
+
+def check_stream_multicast_interface(address: str) -> bool:
+    global STREAM_MULTICAST_IF
+    if not address:
+        return True
+    try:
+        interface = str(ipaddress.IPv4Address(address))
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.bind((interface, 0))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+    except (ValueError, OSError) as exc:
+        STREAM_MULTICAST_IF = ""
+        stream_multicast_state["interface"] = ""
+        stream_multicast_state["error"] = (
+            f"PIBELLS_STREAM_MULTICAST_IF={address} is not a local IPv4 address, "
+            f"using the default interface: {exc}"
+        )
+        print(stream_multicast_state["error"])
+        return False
+    stream_multicast_state["interface"] = interface
+    stream_multicast_state["error"] = ""
+    return True
+
+
+class UdpFanout:
+    kind = "udp"
+
+    def __init__(self, devices: List[Device]) -> None:
+        self.targets = [(device.ip, device.port) for device in devices]
+        self.sent: Dict[str, List[int]] = {f"{ip}:{port}": [0, 0] for ip, port in self.targets}
+        self.first_packet = threading.Event()
+        self.first_packet_at: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.send_errors = 0
+
+    def open_socket(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if any(ipaddress.ip_address(ip).is_multicast for ip, _ in self.targets):
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, STREAM_MULTICAST_TTL)
+            if STREAM_MULTICAST_IF:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(STREAM_MULTICAST_IF))
+        return sock
+
+    def send(self, sock: socket.socket, chunk: bytes) -> None:
+        for target in self.targets:
+            try:
+                sock.sendto(chunk, target)
+            except OSError:
+                self.send_errors += 1
+                continue
+            counters = self.sent[f"{target[0]}:{target[1]}"]
+            counters[0] += 1
+            counters[1] += len(chunk)
+        if self.first_packet_at is None:
+            self.first_packet_at = time.monotonic()
+            self.first_packet.set()
+
+    def finish(self) -> None:
+        stream_history.append({
+            **self.stats(),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        first_packet_ms = None
+        if self.first_packet_at is not None and self.started_at is not None:
+            first_packet_ms = round((self.first_packet_at - self.started_at) * 1000, 2)
+        return {
+            "kind": self.kind,
+            "targets": len(self.targets),
+            "multicast": sum(1 for ip, _ in self.targets if ipaddress.ip_address(ip).is_multicast),
+            "first_packet_ms": first_packet_ms,
+            "send_errors": self.send_errors,
+            "devices": {key: {"packets": value[0], "bytes": value[1]} for key, value in self.sent.items()},
+        }
+
+
+class FanoutStream(UdpFanout):
+    kind = "fanout"
+
+    def __init__(self, source: str, devices: List[Device], loop: bool = False) -> None:
+        super().__init__(devices)
+        self.source = source
+        self.loop = loop
+        self.proc: Optional[subprocess.Popen] = None
+        self.relay_thread: Optional[threading.Thread] = None
+
+    @property
+    def stdin(self) -> Any:
+        return self.proc.stdin if self.proc else None
+
+    def start(self, **kwargs: Any) -> Optional["FanoutStream"]:
+        cmd = encoder_command(self.source, "pipe:1", self.loop)
+        self.started_at = time.monotonic()
+        self.proc = start_process(cmd, f"fan-out stream to {len(self.targets)} devices", stdout=subprocess.PIPE, **kwargs)
+        if not self.proc:
+            return None
+        self.relay_thread = threading.Thread(target=self.relay, daemon=True)
+        self.relay_thread.start()
+        return self
+
+    def relay(self) -> None:
+        try:
+            with self.open_socket() as sock:
+                while True:
+                    chunk = self.proc.stdout.read1(STREAM_PACKET_SIZE)
+                    if not chunk:
+                        break
+                    self.send(sock, chunk)
+        except (OSError, ValueError):
+            pass
+        self.finish()
+
+    def terminate(self) -> None:
+        if self.proc:
+            self.proc.terminate()
+
+    def kill(self) -> None:
+        if self.proc:
+            self.proc.kill()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[int]:
+        code = self.proc.wait(timeout=timeout) if self.proc else None
+        if self.relay_thread:
+            self.relay_thread.join(timeout=timeout)
+        return code
+
+    def poll(self) -> Optional[int]:
+        code = self.proc.poll() if self.proc else 0
+        if code is None or (self.relay_thread and self.relay_thread.is_alive()):
+            return None
+        return code
+
+
+class PacedStreamer(UdpFanout):
+    kind = "paced"
+
+    def __init__(self, packets: List[Tuple[float, bytes]], devices: List[Device], loop: bool = False) -> None:
+        super().__init__(devices)
+        self.packets = packets
+        self.loop = loop
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> "PacedStreamer":
+        self.started_at = time.monotonic()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self) -> None:
+        duration = self.packets[-1][0]
+        packets = self.packets[:-1]
+        base = self.started_at or time.monotonic()
+        index = 0
+        try:
+            with self.open_socket() as sock:
+                while not self.stop_event.is_set():
+                    if index == len(packets):
+                        if not self.loop or duration <= 0:
+                            break
+                        index = 0
+                        base += duration
+                    delay = base + packets[index][0] - time.monotonic()
+                    if delay > 0 and self.stop_event.wait(delay):
+                        break
+                    now = time.monotonic()
+                    while index < len(packets) and base + packets[index][0] <= now:
+                        self.send(sock, packets[index][1])
+                        index += 1
+        except OSError:
+            pass
+        self.finish()
+
+    def terminate(self) -> None:
+        self.stop_event.set()
+
+    def kill(self) -> None:
+        self.stop_event.set()
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if self.thread:
+            self.thread.join(timeout=timeout)
+        return 0
+
+    def poll(self) -> Optional[int]:
+        if self.thread is None or self.stop_event.is_set() or not self.thread.is_alive():
+            return 0
+        return None
+
+
+def use_fanout(devices: List[Device]) -> bool:
+    if STREAM_MODE == "fanout":
+        return bool(devices)
+    if STREAM_MODE == "per-device":
+        return False
+    return len(devices) > 1
+
+
+def process_group_kwargs(leader: Optional[int] = None) -> Dict[str, Any]:
+    if sys.version_info >= (3, 11):
+        return {"process_group": leader or 0}
+    return {"start_new_session": True}
+
+
+def output_pid(proc: Any) -> Optional[int]:
+    if isinstance(proc, FanoutStream):
+        proc = proc.proc
+    if proc is None or isinstance(proc, (PacedStreamer, LocalPlayback)):
+        return None
+    pid = getattr(proc, "pid", None)
+    return pid if isinstance(pid, int) else None
+
+
+def start_streams(source: str, devices: List[Device], loop: bool = False, **kwargs: Any) -> List[Tuple[str, Any]]:
+    packets = paced_stream_packets(Path(source)) if devices and "stdin" not in kwargs else None
+    if packets:
+        return [("paced", PacedStreamer(packets, devices, loop).start())]
+    if use_fanout(devices):
+        stream = FanoutStream(source, devices, loop).start(**kwargs)
+        return [("fanout", stream)] if stream else []
+    streams: List[Tuple[str, Any]] = []
+    for device in devices:
+        proc = start_process(stream_command(source, device, loop), f"stream to {device.ip}", **kwargs)
+        if proc:
+            streams.append((device_key(device), proc))
+            if kwargs.get("process_group") == 0 and output_pid(proc):
+                kwargs = {**kwargs, "process_group": output_pid(proc)}
+    return streams
+
+
+def start_local(source: str, loop: bool = False, pcm: bool = False, **kwargs: Any) -> Optional[subprocess.Popen]:
+    for cmd in local_player_commands(source, loop, pcm):
+        proc = start_process(cmd, "local playback", **kwargs)
+        if proc:
+            return proc
+    print("No audio player found (ffplay/aplay)")
+    return None
+
+
+def load_pcm(path: Path) -> Optional[bytes]:
+    signature = file_signature(path)
+    cached = pcm_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        pcm_cache.move_to_end(path)
+        return cached[1]
+    try:
+        with wave.open(str(path), "rb") as wav:
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != LOCAL_SINK_FORMAT:
+                return None
+            pcm = wav.readframes(wav.getnframes())
+    except (OSError, EOFError, wave.Error):
+        return None
+    pcm_cache[path] = (signature, pcm)
+    while len(pcm_cache) > 16:
+        pcm_cache.popitem(last=False)
+    return pcm
+
+
+class LocalPlayback:
+    def __init__(self, sink: "LocalAudioSink", pcm: bytes, loop: bool = False) -> None:
+        self.sink = sink
+        self.pcm = pcm
+        self.loop = loop
+        self.position = 0
+        self.requested_at: Optional[float] = None
+        self.first_write_ms: Optional[float] = None
+        self.first_packet = threading.Event()
+        self.first_packet_at: Optional[float] = None
+        self.restarts = 0
+        self.done = threading.Event()
+
+    def start(self) -> "LocalPlayback":
+        self.sink.enqueue(self)
+        return self
+
+    def next_chunk(self, size: int) -> Optional[bytes]:
+        if self.position >= len(self.pcm):
+            if not self.loop or not self.pcm:
+                return None
+            self.position = 0
+        chunk = self.pcm[self.position:self.position + size]
+        self.position += len(chunk)
+        return chunk
+
+    def terminate(self) -> None:
+        self.done.set()
+        self.sink.wake()
+
+    def kill(self) -> None:
+        self.terminate()
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        self.done.wait(timeout)
+        return 0
+
+    def poll(self) -> Optional[int]:
+        return 0 if self.done.is_set() else None
+
+
+class LocalAudioSink:
+    def __init__(self) -> None:
+        self.condition = threading.Condition()
+        self.proc: Optional[subprocess.Popen] = None
+        self.playbacks: List[LocalPlayback] = []
+        self.thread: Optional[threading.Thread] = None
+        self.plays = 0
+        self.restarts = 0
+        self.failures = 0
+        self.last_error = ""
+        self.last_start_ms: Optional[float] = None
+
+    def command(self) -> List[str]:
+        rate, channels, width = LOCAL_SINK_FORMAT
+        return [
+            "aplay",
+            "-q",
+            "-t",
+            "raw",
             "-f",
-            "mp3",
-            "-codec:a",
-            "libmp3lame",
-            "-b:a",
-            "128k",
-            device_stream_url(device),
+            f"S{width * 8}_LE",
+            "-r",
+            str(rate),
+            "-c",
+            str(channels),
+            f"--buffer-time={LOCAL_SINK_BUFFER_US}",
+            "-",
         ]
-        return start_process(ffmpeg_cmd, f"stream to {device.ip}")
 
-    def reap_processes(procs: List[subprocess.Popen]) -> None:
-        for proc in procs:
+    def ensure_started(self) -> bool:
+        with self.condition:
+            if self.proc is not None and self.proc.poll() is None:
+                return True
+            if self.proc is not None:
+                self.restarts += 1
+            self.proc = start_process(self.command(), "local audio sink", stdin=subprocess.PIPE)
+            if self.proc is None:
+                return False
+            try:
+                fcntl.fcntl(self.proc.stdin.fileno(), getattr(fcntl, "F_SETPIPE_SZ", 1031), LOCAL_SINK_CHUNK_BYTES)
+            except (OSError, ValueError, AttributeError):
+                pass
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            return True
+
+    def prepare(self, pcm: bytes, loop: bool = False) -> Optional[LocalPlayback]:
+        if not LOCAL_SINK_ENABLED or not self.ensure_started():
+            return None
+        return LocalPlayback(self, pcm, loop)
+
+    def play(self, pcm: bytes, loop: bool = False) -> Optional[LocalPlayback]:
+        playback = self.prepare(pcm, loop)
+        return playback.start() if playback else None
+
+    def enqueue(self, playback: LocalPlayback) -> None:
+        with self.condition:
+            playback.requested_at = time.monotonic()
+            self.playbacks.append(playback)
+            self.plays += 1
+            self.condition.notify_all()
+
+    def wake(self) -> None:
+        with self.condition:
+            self.condition.notify_all()
+
+    def current(self) -> Optional[LocalPlayback]:
+        self.playbacks = [playback for playback in self.playbacks if not playback.done.is_set()]
+        return self.playbacks[-1] if self.playbacks else None
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                playback = self.current()
+                while playback is None:
+                    self.condition.wait()
+                    playback = self.current()
+                proc = self.proc
+            chunk = playback.next_chunk(LOCAL_SINK_CHUNK_BYTES)
+            if chunk is None:
+                playback.done.set()
+                continue
             try:
-                proc.wait()
+                proc.stdin.write(chunk)
+                proc.stdin.flush()
+            except (BrokenPipeError, OSError, ValueError, AttributeError) as exc:
+                playback.position -= len(chunk)
+                playback.restarts += 1
+                if playback.restarts > LOCAL_SINK_MAX_RESTARTS:
+                    self.fail(playback, f"Local audio player kept exiting: {exc!r}")
+                elif not playback.done.wait(min(1.0, 0.05 * 2 ** (playback.restarts - 1))):
+                    if not self.ensure_started():
+                        self.fail(playback, "Local audio player could not be started")
+                continue
+            if playback.first_write_ms is None and playback.requested_at is not None:
+                playback.first_packet_at = time.monotonic()
+                playback.first_write_ms = round((playback.first_packet_at - playback.requested_at) * 1000, 2)
+                playback.first_packet.set()
+                self.last_start_ms = playback.first_write_ms
+
+    def fail(self, playback: LocalPlayback, error: str) -> None:
+        with self.condition:
+            self.failures += 1
+            self.last_error = error
+            playback.done.set()
+        print(error)
+
+    def interrupt(self, playbacks: List[LocalPlayback]) -> bool:
+        with self.condition:
+            audible = self.current() in playbacks
+            for playback in playbacks:
+                playback.done.set()
+            if not audible or self.proc is None:
+                self.condition.notify_all()
+                return False
+            try:
+                self.proc.kill()
+                self.proc.wait(timeout=1)
             except Exception:
                 pass
+            self.condition.notify_all()
+        threading.Thread(target=self.ensure_started, daemon=True).start()
+        return True
 
-    if loop:
-        stop_loops()
-        procs = [start_stream(device) for device in devices]
-        local_proc = start_local()
-        loop_processes = [proc for proc in procs if proc]
-        if local_proc:
-            loop_processes.append(local_proc)
+    def close(self) -> None:
+        with self.condition:
+            for playback in self.playbacks:
+                playback.done.set()
+            self.playbacks = []
+            if self.proc is not None:
+                try:
+                    self.proc.stdin.close()
+                    self.proc.terminate()
+                except Exception:
+                    pass
+                self.proc = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self.condition:
+            return {
+                "enabled": LOCAL_SINK_ENABLED,
+                "running": self.proc is not None and self.proc.poll() is None,
+                "active": len([playback for playback in self.playbacks if not playback.done.is_set()]),
+                "plays": self.plays,
+                "restarts": self.restarts,
+                "failures": self.failures,
+                "last_error": self.last_error,
+                "last_start_ms": self.last_start_ms,
+            }
+
+
+local_sink = LocalAudioSink()
+
+
+def play_local(source: Path, loop: bool = False, **kwargs: Any) -> Optional[Any]:
+    if source.suffix == ".wav" and LOCAL_SINK_ENABLED:
+        pcm = load_pcm(source)
+        playback = local_sink.play(pcm, loop) if pcm is not None else None
+        if playback:
+            return playback
+    return start_local(str(source), loop, source.suffix == ".wav", **kwargs)
+
+
+def audio_content_hash(path: Path) -> Optional[str]:
+    signature = file_signature(path)
+    if signature is None:
+        return None
+    cached = audio_hash_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    digest = hashlib.sha256()
+    try:
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    audio_hash_cache[path] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def transcode_artifact_path(content_hash: str, kind: str) -> Path:
+    return AUDIO_CACHE_DIR / f"{content_hash}.{kind}"
+
+
+def transcode_commands(source: Path, output: Path, kind: str) -> List[str]:
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", str(source), "-vn", "-map_metadata", "-1"]
+    if kind == "mp3":
+        cmd += ["-codec:a", "libmp3lame", "-b:a", "128k", "-ar", "44100", "-write_xing", "0", "-id3v2_version", "0"]
+    else:
+        cmd += ["-codec:a", "pcm_s16le", "-ar", "44100", "-ac", "2"]
+    return cmd + ["-f", kind, str(output)]
+
+
+def build_transcode(path: Path) -> Dict[str, Optional[Path]]:
+    content_hash = audio_content_hash(path)
+    artifacts: Dict[str, Optional[Path]] = {"mp3": None, "wav": None}
+    if not content_hash:
+        return artifacts
+    AUDIO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    for kind in artifacts:
+        if kind == "mp3" and paced_stream_packets(path):
+            continue
+        output = transcode_artifact_path(content_hash, kind)
+        if output.name in transcode_failures:
+            continue
+        if not output.exists():
+            temp_path = output.with_suffix(output.suffix + ".tmp")
+            try:
+                result = subprocess.run(
+                    transcode_commands(path, temp_path, kind),
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=300,
+                    check=False,
+                )
+            except (OSError, subprocess.SubprocessError) as exc:
+                print(f"Failed to transcode {path.name}: {exc}")
+                transcode_failures.add(output.name)
+                transcode_stats["failed"] += 1
+                continue
+            if result.returncode != 0 or not temp_path.exists():
+                temp_path.unlink(missing_ok=True)
+                transcode_failures.add(output.name)
+                transcode_stats["failed"] += 1
+                continue
+            temp_path.replace(output)
+            transcode_stats["built"] += 1
+        artifacts[kind] = output
+    return artifacts
+
+
+def prune_transcode_cache() -> None:
+    valid = set()
+    for path in AUDIO_DIR.iterdir():
+        if path.is_file() and path.suffix.lower() in SUPPORTED_AUDIO_EXTS:
+            content_hash = audio_content_hash(path)
+            if content_hash:
+                valid.add(content_hash)
+    if not AUDIO_CACHE_DIR.exists():
+        return
+    for artifact in AUDIO_CACHE_DIR.iterdir():
+        if artifact.name.split(".", 1)[0] not in valid:
+            artifact.unlink(missing_ok=True)
+            transcode_stats["pruned"] += 1
+
+
+def transcode_worker() -> None:
+    while True:
+        filename = transcode_queue.get()
+        try:
+            if filename is None:
+                for path in sorted(AUDIO_DIR.iterdir()):
+                    if path.is_file() and path.suffix.lower() in SUPPORTED_AUDIO_EXTS:
+                        build_transcode(path)
+                prune_transcode_cache()
+                prime_emergency_lanes()
+            else:
+                build_transcode(audio_path(filename))
+                emergency_lanes.pop(filename, None)
+        except Exception as exc:
+            print(f"Transcode worker error: {exc}")
+        finally:
+            transcode_queue.task_done()
+
+
+def queue_audio_transcode(filename: Optional[str] = None) -> None:
+    if transcode_worker_started:
+        transcode_queue.put(filename)
+
+
+def start_transcode_worker() -> None:
+    global transcode_worker_started
+    if transcode_worker_started or os.environ.get("PIBELLS_DISABLE_TRANSCODE") == "1":
         return
+    transcode_worker_started = True
+    threading.Thread(target=transcode_worker, daemon=True).start()
+    queue_audio_transcode()
 
-    procs = [proc for proc in [start_stream(device) for device in devices] if proc]
-    local_proc = start_local()
-    if local_proc:
-        procs.append(local_proc)
-    if procs:
-        threading.Thread(target=reap_processes, args=(procs,), daemon=True).start()
+
+def playback_sources(sound_file: str) -> Tuple[Path, Path]:
+    path = audio_path(sound_file)
+    content_hash = audio_content_hash(path)
+    stream_source = local_source = path
+    if content_hash:
+        cached_mp3 = transcode_artifact_path(content_hash, "mp3")
+        cached_wav = transcode_artifact_path(content_hash, "wav")
+        if cached_mp3.exists():
+            stream_source = cached_mp3
+        if cached_wav.exists():
+            local_source = cached_wav
+        missing = [
+            artifact
+            for artifact, source in ((cached_mp3, stream_source), (cached_wav, local_source))
+            if source == path and artifact.name not in transcode_failures
+        ]
+        if missing and not (missing == [cached_mp3] and paced_stream_packets(path)):
+            queue_audio_transcode(sound_file)
+    return stream_source, local_source
+
+
+def output_running(proc: Any) -> bool:
+    poll = getattr(proc, "poll", None)
+    if poll is None:
+        return False
+    try:
+        return poll() is None
+    except Exception:
+        return False
+
+
+def output_is_encoder(proc: Any) -> bool:
+    return not isinstance(proc, (PacedStreamer, LocalPlayback))
+
+
+def estimated_encoders(stream_source: Path, devices: List[Device], local_source: Path) -> int:
+    count = 0
+    if devices and not paced_stream_packets(stream_source):
+        count += 1 if use_fanout(devices) else len(devices)
+    if not (LOCAL_SINK_ENABLED and local_source.suffix == ".wav"):
+        count += 1
+    return count
+
+
+class PlaybackJob:
+    def __init__(
+        self,
+        sound_file: str,
+        loop: bool,
+        origin: str,
+        encoders: int,
+        priority: int = PRIORITY_ROUTINE,
+        requested: Optional[float] = None,
+    ) -> None:
+        self.id = secrets.token_hex(6)
+        self.sound_file = sound_file
+        self.loop = loop
+        self.origin = origin
+        self.priority = priority
+        self.estimated_encoders = encoders
+        self.status = "starting"
+        self.created_at = datetime.now()
+        self.created = requested or time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cancelled: Optional[float] = None
+        self.outputs: List[Tuple[str, Any]] = []
+        self.preempts: List["PlaybackJob"] = []
+
+    def attach(self, outputs: List[Tuple[str, Any]], status: str = "running") -> None:
+        self.outputs.extend((label, proc) for label, proc in outputs if proc)
+        self.status = status
+        if status == "running":
+            self.started = time.monotonic()
+
+    def encoders(self) -> int:
+        if self.cancelled is not None:
+            return 0
+        if self.status in {"starting", "armed"} and not self.outputs:
+            return self.estimated_encoders
+        return len([proc for _, proc in self.outputs if output_is_encoder(proc) and output_running(proc)])
+
+    def signal(self, method: str) -> None:
+        for _, proc in self.outputs:
+            try:
+                getattr(proc, method)()
+            except Exception:
+                pass
+
+    def halt(self) -> None:
+        own_group = os.getpgrp()
+        groups: set[int] = set()
+        local_playbacks: List[LocalPlayback] = []
+        for _, proc in self.outputs:
+            pid = output_pid(proc)
+            group = None
+            if pid:
+                try:
+                    group = os.getpgid(pid)
+                except OSError:
+                    group = None
+            if group and group != own_group:
+                groups.add(group)
+                if isinstance(proc, FanoutStream):
+                    proc.kill()
+            elif isinstance(proc, LocalPlayback):
+                local_playbacks.append(proc)
+            else:
+                try:
+                    proc.kill()
+                except Exception:
+                    pass
+        for group in groups:
+            try:
+                os.killpg(group, signal.SIGKILL)
+            except OSError:
+                pass
+        if local_playbacks:
+            local_sink.interrupt(local_playbacks)
+
+    def first_audio_ms(self) -> Optional[float]:
+        first = [
+            proc.first_packet_at
+            for _, proc in self.outputs
+            if getattr(proc, "first_packet_at", None) is not None
+        ]
+        return round((min(first) - self.created) * 1000, 2) if first else None
+
+    def to_json(self) -> Dict[str, Any]:
+        end = self.finished or time.monotonic()
+        return {
+            "id": self.id,
+            "sound_file": self.sound_file,
+            "loop": self.loop,
+            "origin": self.origin,
+            "priority": PRIORITY_NAMES.get(self.priority, str(self.priority)),
+            "status": self.status,
+            "start_ms": round((self.started - self.created) * 1000, 2) if self.started else None,
+            "first_audio_ms": self.first_audio_ms(),
+            "created_at": self.created_at.isoformat(timespec="seconds"),
+            "elapsed_ms": round((end - (self.started or self.created)) * 1000, 1),
+            "encoders": self.encoders(),
+            "outputs": [{"label": label, "running": output_running(proc)} for label, proc in self.outputs],
+        }
+
+
+class PlaybackManager:
+    def __init__(self, max_encoders: int) -> None:
+        self.max_encoders = max_encoders
+        self.condition = threading.Condition(threading.RLock())
+        self.jobs: Dict[str, PlaybackJob] = {}
+        self.history: "collections.deque[Dict[str, Any]]" = collections.deque(maxlen=50)
+        self.monitor_thread: Optional[threading.Thread] = None
+        self.evicted = 0
+        self.rejected = 0
+        self.preempted = 0
+        self.suppressed = 0
+        self.stop_timings: "collections.deque[Dict[str, Any]]" = collections.deque(maxlen=20)
+
+    def admit(
+        self,
+        sound_file: str,
+        loop: bool,
+        origin: str,
+        encoders: int,
+        priority: int = PRIORITY_ROUTINE,
+        requested: Optional[float] = None,
+    ) -> PlaybackJob:
+        with self.condition:
+            active = [job for job in self.jobs.values() if job.cancelled is None]
+            if any(job.priority > priority for job in active):
+                self.suppressed += 1
+                self.history.append({
+                    **PlaybackJob(sound_file, loop, origin, 0, priority, requested).to_json(),
+                    "status": "suppressed",
+                })
+                raise HTTPException(status_code=409, detail="Emergency playback in progress")
+            preempted = [job for job in active if job.priority < priority]
+            replaced = [job for job in active if loop and job.loop and job not in preempted]
+            active = [job for job in active if job not in preempted and job not in replaced]
+            running = sum(job.encoders() for job in active)
+            evictable = sorted(
+                (
+                    job
+                    for job in active
+                    if not job.loop and job.status == "running" and (job.origin != "schedule" or origin == "schedule")
+                ),
+                key=lambda job: job.created,
+            )
+            evicted: List[PlaybackJob] = []
+            while running + encoders > self.max_encoders and evictable:
+                job = evictable.pop(0)
+                running -= job.encoders()
+                evicted.append(job)
+            if priority < PRIORITY_EMERGENCY and running and running + encoders > self.max_encoders:
+                self.rejected += 1
+                raise HTTPException(status_code=429, detail="Too many playbacks are running; stop one and try again")
+            self.evicted += len(evicted)
+            self.preempted += len(preempted)
+            for victim in preempted:
+                victim.cancelled = time.monotonic()
+                victim.status = "preempted"
+            job = PlaybackJob(sound_file, loop, origin, encoders, priority, requested)
+            job.preempts = preempted
+            self.jobs[job.id] = job
+            self.ensure_monitor()
+            self.condition.notify_all()
+        if replaced:
+            self.stop(replaced)
+        for victim in evicted:
+            self.cancel(victim.id)
+        return job
+
+    def cancel(self, job_id: str) -> PlaybackJob:
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail="Playback not found")
+            if job.cancelled is None:
+                job.cancelled = time.monotonic()
+                job.status = "cancelled"
+                job.signal("terminate")
+            self.condition.notify_all()
+            return job
+
+    def stop(self, jobs: List[PlaybackJob], status: str = "cancelled") -> Dict[str, Any]:
+        started = time.monotonic()
+        with self.condition:
+            for job in jobs:
+                if job.cancelled is None:
+                    job.cancelled = started
+                    job.status = status
+                job.halt()
+            self.condition.notify_all()
+        pending = [proc for job in jobs for _, proc in job.outputs]
+        deadline = started + 1
+        while pending and time.monotonic() < deadline:
+            pending = [proc for proc in pending if output_running(proc)]
+            if pending:
+                time.sleep(0.002)
+        outputs = sum(len(job.outputs) for job in jobs)
+        stop_ms = round((time.monotonic() - started) * 1000, 2)
+        report = {
+            "jobs": len(jobs),
+            "outputs": outputs,
+            "still_running": len(pending),
+            "stop_ms": stop_ms,
+            "target_ms": STOP_TARGET_MS,
+            "within_target": not pending and stop_ms <= STOP_TARGET_MS,
+        }
+        if jobs:
+            self.stop_timings.append({**report, "at": datetime.now().isoformat(timespec="seconds")})
+        return report
+
+    def cancel_loops(self) -> Dict[str, Any]:
+        with self.condition:
+            jobs = [job for job in self.jobs.values() if job.loop]
+        return self.stop(jobs)
+
+    def finish(self, job: PlaybackJob, status: str) -> None:
+        job.finished = time.monotonic()
+        if job.cancelled is None:
+            job.status = status
+        self.jobs.pop(job.id, None)
+        self.history.append(job.to_json())
+
+    def fail(self, job: PlaybackJob, outputs: List[Tuple[str, Any]]) -> None:
+        with self.condition:
+            job.attach(outputs, job.status)
+            job.halt()
+            self.finish(job, "failed")
+            self.condition.notify_all()
+        self.stop_preempted(job)
+
+    def stop_preempted(self, job: PlaybackJob) -> None:
+        preempted, job.preempts = job.preempts, []
+        if preempted:
+            self.stop(preempted, "preempted")
+
+    def ensure_monitor(self) -> None:
+        if self.monitor_thread is None or not self.monitor_thread.is_alive():
+            self.monitor_thread = threading.Thread(target=self.monitor, daemon=True)
+            self.monitor_thread.start()
+
+    def monitor(self) -> None:
+        while True:
+            with self.condition:
+                while not self.jobs:
+                    self.condition.wait()
+                now = time.monotonic()
+                for job in list(self.jobs.values()):
+                    if job.status in {"starting", "armed"} and job.cancelled is None:
+                        continue
+                    if any(output_running(proc) for _, proc in job.outputs):
+                        if job.cancelled is not None and now - job.cancelled > 1:
+                            job.signal("kill")
+                        continue
+                    for _, proc in job.outputs:
+                        try:
+                            proc.wait(timeout=0)
+                        except Exception:
+                            pass
+                    self.finish(job, "finished" if job.outputs else "failed")
+                self.condition.wait(0.25)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.condition:
+            jobs = [job.to_json() for job in sorted(self.jobs.values(), key=lambda job: job.created)]
+            emergency = [job for job in list(self.history) + jobs if job.get("priority") == "emergency"]
+            return {
+                "jobs": jobs,
+                "encoders": sum(job["encoders"] for job in jobs),
+                "max_encoders": self.max_encoders,
+                "evicted": self.evicted,
+                "rejected": self.rejected,
+                "recent": list(self.history)[-10:],
+                "stop_timings": list(self.stop_timings),
+                "emergency": {
+                    "preempted": self.preempted,
+                    "suppressed": self.suppressed,
+                    "recent": emergency[-10:],
+                },
+            }
+
+
+playback_manager = PlaybackManager(PLAYBACK_MAX_ENCODERS)
+
+
+def audio_is_emergency(filename: str) -> bool:
+    if filename in EMERGENCY_AUDIO_FILES or Path(filename).stem.lower().startswith("emergency"):
+        return True
+    return load_audio_meta().get(filename, "").lower().startswith("emergency")
+
+
+def sound_priority(sound_file: str, sound_key: str = "") -> int:
+    if sound_key in EMERGENCY_SOUND_KEYS or audio_is_emergency(sound_file):
+        return PRIORITY_EMERGENCY
+    return PRIORITY_ROUTINE
+
+
+def emergency_lane(sound_file: str) -> Tuple[List[Device], Path, Path]:
+    devices = load_devices()
+    groups = load_stream_groups()
+    lane = emergency_lanes.get(sound_file)
+    if lane is None:
+        lane = playback_sources(ensure_audio_exists(sound_file))
+        emergency_lanes[sound_file] = lane
+    return stream_targets(devices, groups), lane[0], lane[1]
+
+
+def prime_emergency_lanes() -> None:
+    emergency_lanes.clear()
+    for filename in sorted(audio.file for audio in list_audio() if audio_is_emergency(audio.file)):
+        try:
+            _, stream_source, local_source = emergency_lane(filename)
+        except HTTPException:
+            continue
+        paced_stream_packets(stream_source)
+        if local_source.suffix == ".wav":
+            load_pcm(local_source)
+
+
+def trigger_bell(sound_file: str, loop: bool = False) -> PlaybackJob:
+    requested = time.monotonic()
+    priority = sound_priority(sound_file)
+    if priority >= PRIORITY_EMERGENCY:
+        devices, stream_source, local_source = emergency_lane(sound_file)
+    else:
+        sound_file = ensure_audio_exists(sound_file)
+        devices = stream_targets(load_devices())
+        stream_source, local_source = playback_sources(sound_file)
+    encoders = estimated_encoders(stream_source, devices, local_source)
+    job = playback_manager.admit(sound_file, loop, "manual", encoders, priority, requested)
+    outputs: List[Tuple[str, Any]] = []
+    try:
+        group = process_group_kwargs() if loop else {}
+        outputs = start_streams(str(stream_source), devices, loop, **group)
+        leader = next((output_pid(proc) for _, proc in outputs if output_pid(proc)), None)
+        if leader and "process_group" in group:
+            group = process_group_kwargs(leader)
+        outputs.append(("local", play_local(local_source, loop, **group)))
+    except Exception:
+        playback_manager.fail(job, outputs)
+        raise
+    job.attach(outputs)
+    playback_manager.stop_preempted(job)
+    return job
+
+
+class PreparedBell:
+    def __init__(self, sound_file: str, target: datetime) -> None:
+        self.sound_file = ensure_audio_exists(sound_file)
+        self.target = target
+        self.devices = stream_targets(load_devices())
+        self.stream_source, self.local_source = playback_sources(self.sound_file)
+        self.data = self.stream_source.read_bytes()
+        self.local_data = self.data if self.local_source == self.stream_source else self.local_source.read_bytes()
+        self.outputs: List[Tuple[str, subprocess.Popen]] = []
+        self.feeders: List[threading.Thread] = []
+        self.armed_at: Optional[float] = None
+        self.job: Optional[PlaybackJob] = None
+
+    def arm(self) -> "PreparedBell":
+        encoders = estimated_encoders(self.stream_source, self.devices, self.local_source)
+        self.job = playback_manager.admit(self.sound_file, False, "schedule", encoders, sound_priority(self.sound_file))
+        try:
+            packets = paced_stream_packets(self.stream_source) if self.devices else None
+            if packets:
+                self.outputs.append(("paced", PacedStreamer(packets, self.devices)))
+            else:
+                self.outputs.extend(start_streams("pipe:0", self.devices, stdin=subprocess.PIPE))
+            pcm = load_pcm(self.local_source) if self.local_source.suffix == ".wav" and LOCAL_SINK_ENABLED else None
+            local_proc = local_sink.prepare(pcm) if pcm is not None else None
+            if local_proc is None:
+                local_proc = start_local("pipe:0", pcm=self.local_source.suffix == ".wav", stdin=subprocess.PIPE)
+            if local_proc:
+                self.outputs.append(("local", local_proc))
+        except Exception:
+            playback_manager.fail(self.job, self.outputs)
+            raise
+        self.job.attach(self.outputs, "armed")
+        self.armed_at = time.monotonic()
+        return self
+
+    def release(self) -> Dict[str, Any]:
+        released_at = datetime.now()
+        started = time.monotonic()
+        if self.job and self.job.cancelled is not None:
+            timing = {
+                "sound_file": self.sound_file,
+                "target": self.target.isoformat(timespec="seconds"),
+                "status": self.job.status,
+                "job_id": self.job.id,
+            }
+            bell_timings.append(timing)
+            return timing
+        timing: Dict[str, Any] = {
+            "sound_file": self.sound_file,
+            "target": self.target.isoformat(timespec="seconds"),
+            "armed_ms_before": round((started - self.armed_at) * 1000, 1) if self.armed_at else None,
+            "release_late_ms": round((released_at - self.target).total_seconds() * 1000, 1),
+            "scan_active": scan_sessions.busy(),
+            "outputs": len(self.outputs),
+            "first_write_ms": {},
+            "first_packet_ms": {},
+        }
+        self.feeders = [
+            threading.Thread(target=self.feed, args=(label, proc, started, timing), daemon=True)
+            for label, proc in self.outputs
+        ]
+        for thread in self.feeders:
+            thread.start()
+        if self.job:
+            self.job.status = "running"
+            self.job.started = started
+            timing["job_id"] = self.job.id
+            if self.job.preempts:
+                threading.Thread(target=playback_manager.stop_preempted, args=(self.job,), daemon=True).start()
+        bell_timings.append(timing)
+        return timing
+
+    def feed(self, label: str, proc: Any, started: float, timing: Dict[str, Any]) -> None:
+        if isinstance(proc, (PacedStreamer, LocalPlayback)):
+            proc.start()
+            self.record_first_packet(label, proc, started, timing)
+            return
+        data = self.local_data if label == "local" else self.data
+        try:
+            for offset in range(0, len(data), 65536):
+                proc.stdin.write(data[offset:offset + 65536])
+                if offset == 0:
+                    proc.stdin.flush()
+                    timing["first_write_ms"][label] = round((time.monotonic() - started) * 1000, 2)
+                    self.record_first_packet(label, proc, started, timing)
+            proc.stdin.close()
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+
+    def record_first_packet(self, label: str, proc: Any, started: float, timing: Dict[str, Any]) -> None:
+        first_packet = getattr(proc, "first_packet", None)
+        if first_packet is not None and first_packet.wait(2):
+            timing["first_packet_ms"][label] = round((proc.first_packet_at - started) * 1000, 2)
+
+    def cancel(self) -> None:
+        if self.job:
+            playback_manager.cancel(self.job.id)
+        self.outputs = []
+
+
+def prepare_bells(entries: List[ScheduleEntry], target: datetime) -> List[PreparedBell]:
+    prepared: List[PreparedBell] = []
+    for entry in entries:
+        try:
+            prepared.append(PreparedBell(entry.sound_file, target).arm())
+        except Exception as exc:
+            print(f"Bell daemon error: {exc}")
+    return prepared
 
 
 def bell_daemon() -> None:
+    fired_through = datetime.now().replace(second=0, microsecond=0) - timedelta(minutes=1)
     while True:
+        delay: float = SCHEDULE_RECHECK_SECONDS
         try:
-            now = datetime.now().replace(second=0, microsecond=0)
-            weekday = now.weekday()
-            for event in load_schedule():
-                if (
-                    event.enabled
-                    and event.day == weekday
-                    and event.time.hour == now.hour
-                    and event.time.minute == now.minute
-                ):
-                    trigger_bell(event.sound_file)
+            now = datetime.now()
+            current_minute = now.replace(second=0, microsecond=0)
+            if not current_minute - timedelta(minutes=1) <= fired_through <= current_minute:
+                fired_through = current_minute - timedelta(minutes=1)
+            firing = current_schedule_index().next_firing(fired_through)
+            if firing:
+                remaining = (firing[0] - now).total_seconds()
+                if remaining <= BELL_PREARM_SECONDS:
+                    prepared = prepare_bells(firing[1], firing[0])
+                    remaining = (firing[0] - datetime.now()).total_seconds()
+                    if schedule_changed.wait(max(remaining, 0)):
+                        schedule_changed.clear()
+                        for bell in prepared:
+                            bell.cancel()
+                        continue
+                    fired_through = firing[0]
+                    for bell in prepared:
+                        bell.release()
+                    continue
+                delay = min(delay, remaining - BELL_PREARM_SECONDS)
         except Exception as exc:
             print(f"Bell daemon error: {exc}")
-        now = datetime.now()
-        delay = 60 - now.second - now.microsecond / 1_000_000
-        time.sleep(max(delay, 1))
+            delay = 1
+        if schedule_changed.wait(max(delay, 0.01)):
+            schedule_changed.clear()
 
 
 def start_daemon() -> None:
@@ -1446,10 +4488,16 @@ def start_daemon() -> None:
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
+    check_stream_multicast_interface(STREAM_MULTICAST_IF)
     start_daemon()
     start_threadhall_sync()
+    start_transcode_worker()
+    start_device_monitor()
+    start_discovery_worker()
     yield
     stop_loops()
+    local_sink.close()
+    discovery_worker.stop()
 
 
 app = FastAPI(title="PiBells", lifespan=lifespan)
@@ -1536,6 +4584,8 @@ def pair_threadhall_device(body: ThreadhallPairRequest):
 @app.post("/api/threadhall/unpair")
 def unpair_threadhall_device():
     config = load_threadhall_config()
+    threadhall_sync_state.clear()
+    threadhall_outbox.clear()
     save_threadhall_config({
         "enabled": False,
         "base_url": config.get("base_url", ""),
@@ -1610,14 +4660,16 @@ def delete_schedule_name(name: str):
     return remove_schedule(name)
 
 
-@app.get("/api/devices", response_model=List[Device])
+@app.get("/api/devices", response_model=List[Device], response_model_exclude_none=True)
 def get_devices():
     return load_devices()
 
 
-@app.post("/api/devices", response_model=List[Device])
+@app.post("/api/devices", response_model=List[Device], response_model_exclude_none=True)
 def add_device(device: Device):
     next_device = normalize_device_record(model_to_dict(device))
+    if next_device.group and next_device.group not in {group.name for group in load_stream_groups()}:
+        raise HTTPException(status_code=400, detail=f"Unknown stream group: {next_device.group}")
     devices = load_devices()
     for index, existing in enumerate(devices):
         if device_key(existing) == device_key(next_device):
@@ -1642,7 +4694,17 @@ def put_device_scan_ranges(body: DeviceScanRanges):
     return {"ranges": save_scan_ranges(body.ranges), "automatic": get_local_ipv4_networks()}
 
 
-@app.delete("/api/devices/{index}", response_model=List[Device])
+@app.get("/api/devices/groups")
+def get_stream_groups():
+    return {"groups": load_stream_groups(), "multicast": STREAM_MULTICAST}
+
+
+@app.put("/api/devices/groups")
+def put_stream_groups(body: StreamGroups):
+    return {"groups": save_stream_groups(body.groups), "multicast": STREAM_MULTICAST}
+
+
+@app.delete("/api/devices/{index}", response_model=List[Device], response_model_exclude_none=True)
 def delete_device(index: int):
     devices = load_devices()
     if index < 0 or index >= len(devices):
@@ -1654,7 +4716,33 @@ def delete_device(index: int):
 
 @app.get("/api/devices/status", response_model=Dict[str, bool])
 def devices_status():
-    return {device_key(device): check_device(device) for device in load_devices()}
+    return device_monitor.statuses(load_devices())
+
+
+@app.get("/api/devices/health")
+def devices_health():
+    return {**device_monitor.stats(), "devices": device_monitor.details(load_devices())}
+
+
+@app.get("/api/devices/status_stream")
+def devices_status_stream():
+    async def event_gen():
+        version = -1
+        keepalive = time.monotonic() + 15
+        while True:
+            current = device_monitor.version
+            if current == version:
+                if time.monotonic() >= keepalive:
+                    keepalive = time.monotonic() + 15
+                    yield ": keepalive\n\n"
+                await asyncio.sleep(0.25)
+                continue
+            version = current
+            keepalive = time.monotonic() + 15
+            statuses = await asyncio.to_thread(lambda: device_monitor.statuses(load_devices()))
+            yield f"data:{json.dumps(statuses)}\n\n"
+
+    return StreamingResponse(event_gen(), media_type="text/event-stream")
 
 
 @app.get("/api/devices/scan")
@@ -1662,18 +4750,72 @@ def scan_devices(ranges: str = ""):
     return discover_barix_devices(ranges=ranges)
 
 
+@app.get("/api/devices/inventory")
+def devices_inventory():
+    return load_discovery_inventory()
+
+
 @app.get("/api/devices/scan_stream")
-def scan_devices_stream(ranges: str = ""):
-    def event_gen():
+def scan_devices_stream(ranges: str = "", quick: bool = False):
+    async def event_gen():
+        session = scan_sessions.attach(ranges, quick)
+        index = 0
         try:
-            for data in discover_barix_devices_iter(ranges=ranges):
-                yield f"data:{json.dumps(data)}\n\n"
-        except Exception as exc:
-            yield f"data:{json.dumps({'error': str(exc)})}\n\n"
+            while True:
+                events, done = session.events_since(index)
+                index += len(events)
+                for data in events:
+                    yield f"data:{json.dumps(data)}\n\n"
+                if done and not events:
+                    break
+                if not events:
+                    await asyncio.sleep(0.05)
+        finally:
+            scan_sessions.detach(session)
 
     return StreamingResponse(event_gen(), media_type="text/event-stream")
 
 
+def bell_jitter_stats() -> Dict[str, Any]:
+    groups: Dict[str, List[float]] = {"idle": [], "scanning": []}
+    for timing in list(bell_timings):
+        if timing.get("release_late_ms") is not None:
+            groups["scanning" if timing.get("scan_active") else "idle"].append(timing["release_late_ms"])
+    stats: Dict[str, Any] = {}
+    for name, values in groups.items():
+        values.sort()
+        stats[name] = {
+            "bells": len(values),
+            "p50_ms": values[len(values) // 2] if values else None,
+            "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))] if values else None,
+            "max_ms": values[-1] if values else None,
+        }
+    return stats
+
+
+@app.get("/api/diagnostics")
+def diagnostics():
+    return {
+        "config_cache": config_cache.stats(),
+        "schedule_index": {**current_schedule_index().stats(), "builds": schedule_index_builds},
+        "bell_timings": list(bell_timings),
+        "bell_jitter": bell_jitter_stats(),
+        "threadhall": {
+            **threadhall_push.stats(),
+            "latency": threadhall_push.latency(),
+            "sync": {**threadhall_sync_stats, "state": dict(threadhall_sync_state)},
+            "http": threadhall_http.stats(),
+            "outbox": threadhall_outbox.stats(),
+        },
+        "streams": list(stream_history),
+        "stream_multicast": dict(stream_multicast_state),
+        "transcode_cache": {**transcode_stats, "pending": transcode_queue.qsize()},
+        "local_sink": local_sink.stats(),
+        "device_health": device_monitor.stats(),
+        "scan_sessions": scan_sessions.stats(),
+    }
+
+
 @app.get("/api/network")
 def network_info():
     return {"ip": get_local_ip(), "hostname": socket.gethostname()}
@@ -1716,6 +4858,7 @@ async def upload_audio(name: str = Form(...), file: UploadFile = File(...)):
     meta = load_audio_meta()
     meta[filename] = (name or Path(filename).stem).strip() or Path(filename).stem
     save_audio_meta(meta)
+    queue_audio_transcode(filename)
     return list_audio()
 
 
@@ -1743,6 +4886,8 @@ def delete_audio(filename: str, force: bool = False):
     save_audio_meta(meta)
     if force:
         remove_audio_references(filename)
+    emergency_lanes.pop(filename, None)
+    queue_audio_transcode()
     return list_audio()
 
 
@@ -1790,14 +4935,23 @@ def delete_button(button_id: str):
 
 @app.post("/api/test")
 def test_sound(req: TestRequest):
-    trigger_bell(req.sound_file, loop=bool(req.loop))
-    return {"status": "ok"}
+    job = trigger_bell(req.sound_file, loop=bool(req.loop))
+    return {"status": "ok", "job": job.id if job else None}
+
+
+@app.get("/api/playback")
+def get_playback():
+    return playback_manager.snapshot()
+
+
+@app.delete("/api/playback/{job_id}")
+def cancel_playback(job_id: str):
+    return playback_manager.cancel(job_id).to_json()
 
 
 @app.post("/api/stop")
 def stop_sound():
-    stop_loops()
-    return {"status": "stopped"}
+    return {"status": "stopped", **stop_loops()}
 
 
 def next_event_payload(entries: List[ScheduleEntry]) -> Optional[Dict[str, Any]]:
@@ -1824,6 +4978,7 @@ def next_event_payload(entries: List[ScheduleEntry]) -> Optional[Dict[str, Any]]
         "time": entry.time.strftime("%H:%M"),
         "sound_file": entry.sound_file,
         "sound_name": audio_names.get(entry.sound_file, Path(entry.sound_file).stem),
+        "at": candidate.isoformat(timespec="minutes"),
         "in_minutes": max(0, int((candidate - now).total_seconds() // 60)),
     }
 
@@ -1833,7 +4988,7 @@ def dashboard():
     entries = load_schedule()
     schedules = load_all_schedules()
     devices = load_devices()
-    statuses = {device_key(device): check_device(device, timeout=0.25) for device in devices}
+    statuses = device_monitor.statuses(devices)
     return {
         "active_schedule": schedules.get("active"),
         "schedule_options": list(schedules.get("schedules", {}).keys()),
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""Emulate a fleet of Barix Exstreamers on loopback addresses.
+
+Each emulated device binds its own 127.x address and answers the protocols
+PiBells uses: UDP discovery replies on the discovery port, the HTTP status page
+that barix_http_probe fingerprints, a TCP listener on the control port, and a
+UDP stream receiver that records packet arrival times. Latency, jitter and
+packet loss are configurable, and "silent" addresses drop TCP connection
+attempts so probes wait out their timeout as on a real LAN.
+
+FakeFleet runs the emulator in a child process for benchmarks; run this file
+directly to keep a fleet up while pointing a development server at it with
+PIBELLS_BARIX_HTTP_PORT, PIBELLS_BARIX_TCP_PORT and PIBELLS_BARIX_DISCOVERY_PORT.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import ipaddress
+import multiprocessing
+import random
+import resource
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+DISCOVERY_PORT = 30718
+HTTP_PORT = 18080
+TCP_PORT = 12020
+STREAM_PORT = 3030
+
+
+@dataclass
+class FleetConfig:
+    addresses: List[str]
+    silent: List[str] = field(default_factory=list)
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    loss: float = 0.0
+    http_port: int = HTTP_PORT
+    tcp_port: int = TCP_PORT
+    stream_port: int = STREAM_PORT
+    discovery_port: int = DISCOVERY_PORT
+    network: str = ""
+    seed: int = 7
+
+
+def device_mac(address: str) -> str:
+    tail = int(ipaddress.IPv4Address(address)) & 0xFFFFFF
+    return "00:08:E1:" + ":".join(f"{(tail >> shift) & 0xFF:02X}" for shift in (16, 8, 0))
+
+
+def fleet_addresses(network: str, devices: int, silent: int = 0, seed: int = 7):
+    hosts = list(ipaddress.ip_network(network).hosts())
+    picked = [str(host) for host in random.Random(seed).sample(hosts, devices + silent)]
+    return picked[:devices], picked[devices:]
+
+
+def raise_fd_limit() -> None:
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+class Emulator:
+    def __init__(self, config: FleetConfig) -> None:
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.streams: Dict[str, Dict[str, float]] = {}
+        self.counters = {"discovery_requests": 0, "discovery_replies": 0, "http_requests": 0, "tcp_connects": 0}
+        self.discovery: Dict[str, asyncio.DatagramTransport] = {}
+        self.held: List[socket.socket] = []
+
+    def delay(self) -> float:
+        jitter = self.random.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+        return max(0.0, self.config.latency_ms + jitter) / 1000
+
+    def lost(self) -> bool:
+        return self.config.loss > 0 and self.random.random() < self.config.loss
+
+    async def http_device(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.counters["http_requests"] += 1
+        address = writer.get_extra_info("sockname")[0]
+        try:
+            await reader.read(1024)
+            await asyncio.sleep(self.delay())
+            body = f"<html><title>Exstreamer {address}</title><body>Barix Exstreamer 100</body></html>".encode()
+            writer.write(
+                b"HTTP/1.0 200 OK\r\nServer: Barix Embedded Web Server\r\nContent-Type: text/html\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def tcp_device(self, _: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.counters["tcp_connects"] += 1
+        writer.close()
+
+    def stream_protocol(self, address: str) -> asyncio.DatagramProtocol:
+        emulator = self
+
+        class StreamReceiver(asyncio.DatagramProtocol):
+            def datagram_received(self, data: bytes, _: object) -> None:
+                now = time.monotonic()
+                stats = emulator.streams.setdefault(address, {"packets": 0, "bytes": 0, "dropped": 0})
+                if emulator.lost():
+                    stats["dropped"] += 1
+                    return
+                arrival = now + emulator.delay()
+                stats.setdefault("first", arrival)
+                stats["last"] = arrival
+                stats["packets"] += 1
+                stats["bytes"] += len(data)
+
+        return StreamReceiver()
+
+    def discovery_protocol(self) -> asyncio.DatagramProtocol:
+        emulator = self
+
+        class DiscoveryListener(asyncio.DatagramProtocol):
+            def datagram_received(self, data: bytes, requester: object) -> None:
+                emulator.counters["discovery_requests"] += 1
+                loop = asyncio.get_running_loop()
+                for address, transport in emulator.discovery.items():
+                    if emulator.lost():
+                        continue
+                    payload = f"Barix Exstreamer {device_mac(address)}".encode()
+                    loop.call_later(emulator.delay(), emulator.reply, transport, payload, requester)
+
+        return DiscoveryListener()
+
+    def reply(self, transport: asyncio.DatagramTransport, payload: bytes, requester: object) -> None:
+        self.counters["discovery_replies"] += 1
+        transport.sendto(payload, requester)
+
+    def silence(self, address: str, port: int) -> None:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind((address, port))
+        listener.listen(0)
+        self.held += [listener, socket.create_connection((address, port))]
+
+    async def start(self) -> List[object]:
+        loop = asyncio.get_running_loop()
+        config = self.config
+        servers: List[object] = []
+        for address in config.addresses:
+            servers.append(await asyncio.start_server(self.http_device, address, config.http_port))
+            servers.append(await asyncio.start_server(self.tcp_device, address, config.tcp_port))
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda address=address: self.stream_protocol(address), local_addr=(address, config.stream_port)
+            )
+            servers.append(transport)
+            transport, _ = await loop.create_datagram_endpoint(
+                asyncio.DatagramProtocol, local_addr=(address, config.discovery_port)
+            )
+            self.discovery[address] = transport
+            servers.append(transport)
+        networks = [config.network] if config.network else [f"{address}/24" for address in config.addresses]
+        broadcasts = {str(ipaddress.ip_network(network, strict=False).broadcast_address) for network in networks}
+        for broadcast in broadcasts - set(config.addresses):
+            transport, _ = await loop.create_datagram_endpoint(
+                self.discovery_protocol, local_addr=(broadcast, config.discovery_port)
+            )
+            servers.append(transport)
+        for address in config.silent:
+            for port in (config.http_port, config.tcp_port):
+                self.silence(address, port)
+        return servers
+
+    def snapshot(self) -> Dict[str, object]:
+        return {"streams": {address: dict(stats) for address, stats in self.streams.items()}, **self.counters}
+
+    def reset(self) -> None:
+        self.streams.clear()
+        for key in self.counters:
+            self.counters[key] = 0
+
+
+def serve_fleet(config: FleetConfig, control) -> None:
+    raise_fd_limit()
+    emulator = Emulator(config)
+
+    async def main() -> None:
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+        servers = await emulator.start()
+
+        def commands() -> None:
+            while True:
+                try:
+                    command = control.recv()
+                except EOFError:
+                    command = "stop"
+                if command == "stats":
+                    control.send(emulator.snapshot())
+                elif command == "reset":
+                    emulator.reset()
+                    control.send("ok")
+                else:
+                    loop.call_soon_threadsafe(stopped.set_result, None)
+                    return
+
+        threading.Thread(target=commands, daemon=True).start()
+        control.send("ready")
+        await stopped
+        for server in servers:
+            server.close()
+        for sock in emulator.held:
+            sock.close()
+
+    try:
+        asyncio.run(main())
+    except OSError as exc:
+        control.send(f"error: {exc}")
+
+
+class FakeFleet:
+    def __init__(self, addresses: Sequence[str], silent: Sequence[str] = (), **options) -> None:
+        self.config = FleetConfig(addresses=list(addresses), silent=list(silent), **options)
+        self.control = None
+        self.process: Optional[multiprocessing.Process] = None
+
+    def start(self) -> "FakeFleet":
+        self.control, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=serve_fleet, args=(self.config, child), daemon=True)
+        self.process.start()
+        while not self.control.poll(0.2):
+            if not self.process.is_alive():
+                raise RuntimeError("fake fleet exited during startup")
+        status = self.control.recv()
+        if status != "ready":
+            self.process.join(1)
+            raise RuntimeError(f"fake fleet failed to start ({status}); is another fleet holding its ports?")
+        return self
+
+    def request(self, command: str):
+        self.control.send(command)
+        return self.control.recv()
+
+    def stats(self) -> Dict[str, object]:
+        return self.request("stats")
+
+    def reset(self) -> None:
+        self.request("reset")
+
+    def stop(self) -> None:
+        if self.process and self.process.is_alive():
+            self.control.send("stop")
+            self.process.join(2)
+        self.process = None
+
+    def __enter__(self) -> "FakeFleet":
+        return self.start()
+
+    def __exit__(self, *_: object) -> None:
+        self.stop()
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--network", default="127.2.0.0/24")
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--silent", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--loss", type=float, default=0)
+    parser.add_argument("--http-port", type=int, default=HTTP_PORT)
+    parser.add_argument("--tcp-port", type=int, default=TCP_PORT)
+    parser.add_argument("--stream-port", type=int, default=STREAM_PORT)
+    parser.add_argument("--discovery-port", type=int, default=DISCOVERY_PORT)
+    args = parser.parse_args()
+
+    addresses, silent = fleet_addresses(args.network, args.devices, args.silent)
+    fleet = FakeFleet(
+        addresses,
+        silent,
+        network=args.network,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        loss=args.loss,
+        http_port=args.http_port,
+        tcp_port=args.tcp_port,
+        stream_port=args.stream_port,
+        discovery_port=args.discovery_port,
+    )
+    with fleet:
+        print(f"{len(addresses)} devices and {len(silent)} silent hosts on {args.network}")
+        print(
+            f"PIBELLS_BARIX_HTTP_PORT={args.http_port} PIBELLS_BARIX_TCP_PORT={args.tcp_port} "
+            f"PIBELLS_BARIX_DISCOVERY_PORT={args.discovery_port} PIBELLS_BARIX_STREAM_PORT={args.stream_port}"
+        )
+        try:
+            while True:
+                time.sleep(5)
+                stats = fleet.stats()
+                packets = sum(stream["packets"] for stream in stats["streams"].values())
+                print(
+                    f"discovery {stats['discovery_requests']}/{stats['discovery_replies']}  "
+                    f"http {stats['http_requests']}  tcp {stats['tcp_connects']}  stream packets {packets}"
+                )
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main_cli()
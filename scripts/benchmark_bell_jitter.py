@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Measure bell timer jitter while Barix scans run in-process or in the worker.
+
+A timer thread wakes on a fixed period the way the bell daemon waits for a
+scheduled bell and records how late each wake-up is. The measurement runs
+three times: with no scan, with back-to-back scans inside this process, and
+with the same scans in the lower-priority discovery worker process. The scans
+target a loopback fake fleet from barix_emulator.py. The worker is started and
+waited for before its run, and its one-off startup cost is reported separately.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("PIBELLS_DISABLE_DAEMON", "1")
+os.environ.setdefault("PIBELLS_DISABLE_THREADHALL_SYNC", "1")
+os.environ.setdefault("PIBELLS_BASE_DIR", tempfile.mkdtemp(prefix="pibells-bench-"))
+
+from barix_emulator import HTTP_PORT, TCP_PORT, FakeFleet, fleet_addresses  # noqa: E402
+
+os.environ["PIBELLS_BARIX_HTTP_PORT"] = str(HTTP_PORT)
+os.environ["PIBELLS_BARIX_TCP_PORT"] = str(TCP_PORT)
+
+from app import main  # noqa: E402
+
+
+def measure(seconds: float, period: float) -> list:
+    lateness = []
+    wake = threading.Event()
+    deadline = time.monotonic() + period
+    end = time.monotonic() + seconds
+    while deadline < end:
+        wake.wait(max(0.0, deadline - time.monotonic()))
+        lateness.append((time.monotonic() - deadline) * 1000)
+        deadline += period
+    return lateness
+
+
+def cancel_on(stop: threading.Event, cancel: threading.Event) -> None:
+    stop.wait()
+    cancel.set()
+
+
+def keep_scanning(network: str, stop: threading.Event, counts: list) -> None:
+    while not stop.is_set():
+        session = main.ScanSession((network, False), network, False)
+        threading.Thread(target=cancel_on, args=(stop, session.cancel), daemon=True).start()
+        session.run(lambda _: None)
+        counts.append(len(session.events))
+
+
+def run(mode: str, network: str, seconds: float, period: float) -> dict:
+    stop = threading.Event()
+    counts: list = []
+    scanner = None
+    if mode == "process":
+        main.discovery_worker.ensure_started()
+        while main.discovery_worker.startup_ms is None:
+            time.sleep(0.05)
+    if mode != "idle":
+        main.BARIX_SCAN_PROCESS = mode == "process"
+        scanner = threading.Thread(target=keep_scanning, args=(network, stop, counts), daemon=True)
+        scanner.start()
+        time.sleep(0.5)
+    lateness = sorted(measure(seconds, period))
+    stop.set()
+    if scanner:
+        scanner.join(5)
+    return {
+        "mode": mode,
+        "wakeups": len(lateness),
+        "p50_ms": round(lateness[len(lateness) // 2], 2),
+        "p99_ms": round(lateness[int(len(lateness) * 0.99) - 1], 2),
+        "max_ms": round(lateness[-1], 2),
+        "scans": len(counts),
+    }
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--network", default="127.1.0.0/20")
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--silent", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--period-ms", type=float, default=20)
+    parser.add_argument("--modes", nargs="+", default=["idle", "thread", "process"])
+    args = parser.parse_args()
+
+    addresses, silent = fleet_addresses(args.network, args.devices, args.silent)
+    main.get_local_ipv4_networks = lambda: []
+
+    with FakeFleet(addresses, silent, network=args.network):
+        print(f"{'mode':<8} {'wakeups':>8} {'p50_ms':>8} {'p99_ms':>8} {'max_ms':>8} {'scans':>6}")
+        for mode in args.modes:
+            row = run(mode, args.network, args.seconds, args.period_ms / 1000)
+            print(
+                f"{row['mode']:<8} {row['wakeups']:>8} {row['p50_ms']:>8} {row['p99_ms']:>8} "
+                f"{row['max_ms']:>8} {row['scans']:>6}"
+            )
+        worker = main.discovery_worker.stats()
+        if worker["starts"]:
+            print(f"\ndiscovery worker: startup {worker['startup_ms']} ms once, then {worker['jobs']} scans on pid {worker['pid']}")
+        main.discovery_worker.stop()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Compare the threaded, asyncio and staged Barix scanners against a local fake fleet.
+
+barix_emulator.FakeFleet binds fake Barix devices on addresses spread through a
+127.x loopback range, then each engine scans the whole range. Addresses without
+a device refuse connections at once on loopback, so the numbers measure scanner
+overhead rather than timeouts; --silent turns that many addresses into hosts
+that drop connection attempts, and --delay-ms gives the fake devices a response
+latency. --sse also runs the full discovery pipeline through a scan session
+with and without progress batching and reports the events and bytes each would
+send to a browser.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import ipaddress
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("PIBELLS_DISABLE_DAEMON", "1")
+os.environ.setdefault("PIBELLS_DISABLE_THREADHALL_SYNC", "1")
+os.environ.setdefault("PIBELLS_BASE_DIR", tempfile.mkdtemp(prefix="pibells-bench-"))
+
+from app import main  # noqa: E402
+from barix_emulator import HTTP_PORT, TCP_PORT, FakeFleet, fleet_addresses  # noqa: E402
+
+
+def scan_threads(hosts, workers: int):
+    found = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for candidate in executor.map(main.probe_barix_candidate, hosts):
+            if candidate:
+                found.append(candidate["ip"])
+    return found
+
+
+def scan_async(hosts, concurrency: int):
+    return [candidate["ip"] for _, candidate, _ in main.scan_hosts(hosts, concurrency=concurrency) if candidate]
+
+
+def scan_staged(hosts, concurrency: int):
+    responsive = {
+        host: ports for host, ports, _ in main.scan_hosts(hosts, main.sweep_barix_host, concurrency=concurrency) if ports
+    }
+    identified = main.scan_hosts(
+        list(responsive),
+        lambda ip, timeouts: main.identify_barix_host(ip, responsive[ip], timeouts),
+        concurrency=concurrency,
+    )
+    return [candidate["ip"] for _, candidate, _ in identified if candidate]
+
+
+def run(engine: str, network: ipaddress.IPv4Network, workers: int) -> dict:
+    hosts, _ = main.iter_probe_hosts([network])
+    threads_before = threading.active_count()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.monotonic()
+    if engine == "threads":
+        found = scan_threads(hosts, workers)
+    elif engine == "staged":
+        found = scan_staged(hosts, workers)
+    else:
+        found = scan_async(hosts, workers)
+    elapsed = time.monotonic() - started
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "engine": engine,
+        "hosts": len(hosts),
+        "found": len(found),
+        "seconds": round(elapsed, 2),
+        "hosts_per_s": round(len(hosts) / elapsed) if elapsed else None,
+        "cpu_s": round(
+            (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime), 2
+        ),
+        "threads": threading.active_count() - threads_before,
+    }
+
+
+def run_sse(network: ipaddress.IPv4Network, rate: float) -> dict:
+    main.BARIX_SCAN_EVENT_RATE = rate
+    main.get_local_ipv4_networks = lambda: []
+    session = main.ScanSession((str(network), False), str(network), False)
+    cpu_before = time.process_time()
+    session.run(lambda _: None)
+    payloads = [f"data:{json.dumps(event)}\n\n" for event in session.events]
+    return {
+        "rate": rate or "off",
+        "events": len(payloads),
+        "kbytes": round(sum(len(payload) for payload in payloads) / 1024, 1),
+        "cpu_s": round(time.process_time() - cpu_before, 2),
+        "devices": len(session.events[-1].get("devices", [])),
+    }
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--network", default="127.1.0.0/20")
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--silent", type=int, default=0)
+    parser.add_argument("--delay-ms", type=float, default=0)
+    parser.add_argument("--engines", nargs="+", default=["threads", "async", "staged"])
+    parser.add_argument("--thread-workers", type=int, default=96)
+    parser.add_argument("--concurrency", type=int, default=main.BARIX_SCAN_CONCURRENCY)
+    parser.add_argument("--sse", action="store_true")
+    args = parser.parse_args()
+
+    network = ipaddress.ip_network(args.network)
+    addresses, silent = fleet_addresses(args.network, args.devices, args.silent)
+    main.BARIX_HTTP_PORT = HTTP_PORT
+    main.BARIX_TCP_PORT = TCP_PORT
+
+    with FakeFleet(addresses, silent, network=args.network, latency_ms=args.delay_ms):
+        print(f"{'engine':<8} {'hosts':>7} {'found':>6} {'seconds':>8} {'hosts/s':>8} {'cpu_s':>6} {'threads':>7}")
+        for engine in args.engines:
+            workers = args.thread_workers if engine == "threads" else args.concurrency
+            row = run(engine, network, workers)
+            print(
+                f"{row['engine']:<8} {row['hosts']:>7} {row['found']:>6} {row['seconds']:>8} "
+                f"{row['hosts_per_s']!s:>8} {row['cpu_s']:>6} {row['threads']:>7}"
+            )
+        if args.sse:
+            print(f"\n{'batching':<8} {'events':>7} {'kbytes':>8} {'cpu_s':>6} {'devices':>7}")
+            for rate in (0, main.BARIX_SCAN_EVENT_RATE or 5):
+                row = run_sse(network, rate)
+                print(f"{row['rate']!s:<8} {row['events']:>7} {row['kbytes']:>8} {row['cpu_s']:>6} {row['devices']:>7}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Run discovery, status polling and streaming against an emulated Barix fleet.
+
+barix_emulator.FakeFleet brings up the requested number of fake devices (and
+optionally silent hosts) on a 127.x range with the given latency, jitter and
+packet loss, and each scenario is repeated and reported as a median:
+
+  scan    full discovery (broadcast, sweep, identify) over the range
+  status  one health monitor sweep over every device
+  stream  the paced streamer sending the test tone to every device, with the
+          spread of first-packet arrival times and the packets lost
+
+Nothing here needs hardware, so it can run before and after a change to show
+the effect on all three paths at fleet sizes a bench rarely has.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("PIBELLS_DISABLE_DAEMON", "1")
+os.environ.setdefault("PIBELLS_DISABLE_THREADHALL_SYNC", "1")
+os.environ.setdefault("PIBELLS_BASE_DIR", tempfile.mkdtemp(prefix="pibells-bench-"))
+
+from app import main  # noqa: E402
+from barix_emulator import FakeFleet, fleet_addresses  # noqa: E402
+
+DEFAULT_SOURCE = ROOT / "audio" / "bell-test-tone.mp3"
+
+
+def scenario_scan(fleet: FakeFleet, network: str) -> dict:
+    started = time.monotonic()
+    final = {}
+    for event in main.discover_barix_devices_iter(scan_networks=[network]):
+        final = event
+    return {"seconds": time.monotonic() - started, "found": len(final.get("devices", []))}
+
+
+def scenario_status(fleet: FakeFleet, network: str) -> dict:
+    devices = [main.Device(ip=address, port=fleet.config.stream_port) for address in fleet.config.addresses]
+    monitor = main.DeviceHealthMonitor(interval=60, workers=main.DEVICE_HEALTH_WORKERS)
+    started = time.monotonic()
+    monitor.refresh(devices)
+    online = sum(1 for entry in monitor.table.values() if entry["online"])
+    return {"seconds": time.monotonic() - started, "online": online}
+
+
+def scenario_stream(fleet: FakeFleet, network: str, source: Path = DEFAULT_SOURCE) -> dict:
+    devices = [main.Device(ip=address, port=fleet.config.stream_port) for address in fleet.config.addresses]
+    data = source.read_bytes()
+    packets = main.packetize_mp3(data, main.parse_mp3_frames(data))
+    fleet.reset()
+    started = time.monotonic()
+    streamer = main.PacedStreamer(packets, devices).start()
+    streamer.wait()
+    elapsed = time.monotonic() - started
+    time.sleep(0.2 + fleet.config.latency_ms / 1000 + fleet.config.jitter_ms / 1000)
+    streams = fleet.stats()["streams"]
+    firsts = [stream["first"] for stream in streams.values() if "first" in stream]
+    received = sum(stream["packets"] for stream in streams.values())
+    sent = sum(counters[0] for counters in streamer.sent.values())
+    return {
+        "seconds": elapsed,
+        "skew_ms": (max(firsts) - min(firsts)) * 1000 if firsts else None,
+        "missing": len(devices) - len(firsts),
+        "lost_pct": 100 * (1 - received / sent) if sent else 0,
+    }
+
+
+SCENARIOS = {"scan": scenario_scan, "status": scenario_status, "stream": scenario_stream}
+
+
+def summarize(rows: list) -> dict:
+    summary = {}
+    for key in rows[0]:
+        values = [row[key] for row in rows if row[key] is not None]
+        summary[key] = round(statistics.median(values), 2) if values else None
+    return summary
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--network", default="127.2.0.0/22")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--silent", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=2)
+    parser.add_argument("--jitter-ms", type=float, default=1)
+    parser.add_argument("--loss", type=float, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=["scan", "status", "stream"])
+    args = parser.parse_args()
+
+    addresses, silent = fleet_addresses(args.network, args.devices, args.silent)
+    fleet = FakeFleet(
+        addresses,
+        silent,
+        network=args.network,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        loss=args.loss,
+    )
+    main.BARIX_HTTP_PORT = fleet.config.http_port
+    main.BARIX_TCP_PORT = fleet.config.tcp_port
+    main.BARIX_DISCOVERY_PORT = fleet.config.discovery_port
+    main.get_local_ipv4_networks = lambda: []
+
+    with fleet:
+        print(f"{len(addresses)} devices, {len(silent)} silent hosts on {args.network}, median of {args.repeat}")
+        for name in args.scenarios:
+            rows = [SCENARIOS[name](fleet, args.network) for _ in range(args.repeat)]
+            summary = summarize(rows)
+            print(f"{name:<7} " + "  ".join(f"{key}={value}" for key, value in summary.items()))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Compare per-device, fan-out and paced Barix streaming against loopback receivers.
+
+Each run binds N UDP receivers on 127.0.0.1 in a separate process, streams one
+bell file to all of them, and reports encoder CPU time and the spread of
+first-packet arrival times. The ffmpeg modes require ffmpeg on PATH; the paced
+mode sends the MP3 frames in-process whatever the source bitrate.
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import resource
+import selectors
+import shutil
+import socket
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("PIBELLS_DISABLE_DAEMON", "1")
+os.environ.setdefault("PIBELLS_DISABLE_THREADHALL_SYNC", "1")
+
+from app import main  # noqa: E402
+
+DEFAULT_SOURCE = ROOT / "audio" / "bell-test-tone.mp3"
+DEFAULT_COUNTS = [1, 10, 50, 200]
+
+
+def receive(count: int, ports, ready, results, idle_seconds: float) -> None:
+    selector = selectors.DefaultSelector()
+    sockets = []
+    for _ in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ, len(sockets))
+        sockets.append(sock)
+    ports.extend([sock.getsockname()[1] for sock in sockets])
+    ready.set()
+    first = [0.0] * count
+    packets = [0] * count
+    last_packet = None
+    while True:
+        events = selector.select(timeout=0.1)
+        now = time.monotonic()
+        for key, _ in events:
+            index = key.data
+            while True:
+                try:
+                    key.fileobj.recv(4096)
+                except BlockingIOError:
+                    break
+                packets[index] += 1
+                if not first[index]:
+                    first[index] = now
+                last_packet = now
+        if last_packet and now - last_packet > idle_seconds:
+            break
+    results.extend(list(zip(first, packets)))
+    for sock in sockets:
+        sock.close()
+
+
+def run(mode: str, count: int, source: Path) -> dict:
+    manager = multiprocessing.Manager()
+    ports = manager.list()
+    results = manager.list()
+    ready = manager.Event()
+    receiver = multiprocessing.Process(target=receive, args=(count, ports, ready, results, 1.5))
+    receiver.start()
+    ready.wait()
+    devices = [main.Device(ip="127.0.0.1", port=port) for port in ports]
+
+    main.STREAM_MODE = mode
+    main.STREAM_PASSTHROUGH_KBPS = set()
+    main.mp3_packet_cache.clear()
+    data = source.read_bytes()
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_before = time.process_time()
+    started = time.monotonic()
+    if mode == "paced":
+        packets = main.packetize_mp3(data, main.parse_mp3_frames(data))
+        streams = [("paced", main.PacedStreamer(packets, devices).start())]
+    else:
+        streams = main.start_streams(str(source), devices)
+    for _, stream in streams:
+        stream.wait()
+    cpu_self = time.process_time() - cpu_before
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    receiver.join()
+
+    cpu_children = (children_after.ru_utime - children_before.ru_utime) + (
+        children_after.ru_stime - children_before.ru_stime
+    )
+    arrivals = sorted((first - started) * 1000 for first, _ in results if first)
+    packets = [count for _, count in results]
+    manager.shutdown()
+    return {
+        "mode": mode,
+        "devices": count,
+        "cpu_s": round(cpu_children + cpu_self, 3),
+        "first_ms": round(arrivals[0], 1) if arrivals else None,
+        "last_ms": round(arrivals[-1], 1) if arrivals else None,
+        "missing": count - len(arrivals),
+        "packets_min": min(packets) if packets else 0,
+    }
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--source", type=Path, default=DEFAULT_SOURCE)
+    parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS)
+    parser.add_argument("--modes", nargs="+", default=["per-device", "fanout", "paced"])
+    args = parser.parse_args()
+    if set(args.modes) - {"paced"} and not shutil.which("ffmpeg"):
+        raise SystemExit("ffmpeg is required for the per-device and fanout modes")
+
+    print(f"{'mode':<11} {'devices':>7} {'cpu_s':>7} {'first_ms':>9} {'last_ms':>8} {'missing':>7} {'packets':>7}")
+    for count in args.counts:
+        for mode in args.modes:
+            row = run(mode, count, args.source)
+            print(
+                f"{row['mode']:<11} {row['devices']:>7} {row['cpu_s']:>7} {row['first_ms']!s:>9} "
+                f"{row['last_ms']!s:>8} {row['missing']:>7} {row['packets_min']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Stand in for Threadhall's PiBells API on a local port.
+
+The server implements the endpoints a paired controller calls: pairing,
+full sync, command acknowledgements, and the long-poll command channel
+(GET api/pibells/v1/commands/wait?wait=&cursor=). A request with an empty
+cursor returns at once with the current cursor and any undelivered commands;
+later requests block for up to `wait` seconds until a command is issued.
+Each command is delivered once, over whichever channel asks first. Sync
+honours the content hashes PiBells sends: a status sent as a bare hash is
+accepted if it matches the last full status (otherwise the reply asks for
+the full status), and schedules come back as "not modified" when the
+controller already has them. Connections are kept alive, gzip request and
+response bodies are accepted, and acknowledgements can be posted one at a
+time or as a batch to api/pibells/v1/commands/ack. api/pibells/v1/outbox takes
+the acknowledgements and status events a controller queued while Threadhall
+was unreachable; setting `available` to False answers 503 to everything so an
+outage can be simulated.
+
+Run it directly, point a controller at it with THREADHALL_BASE_URL and
+THREADHALL_PIBELLS_TOKEN, then type a sound key (lockdown, test, ...) to issue
+a command and see how long the controller took to acknowledge it. --no-push
+answers 404 on the long-poll endpoint so the polling fallback can be tried.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import itertools
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+DEFAULT_TOKEN = "pb_standin_token"
+
+
+class StandInThreadhall:
+    def __init__(
+        self, token: str = DEFAULT_TOKEN, push: bool = True, poll_seconds: int = 20, host: str = "127.0.0.1"
+    ) -> None:
+        self.token = token
+        self.push = push
+        self.poll_seconds = poll_seconds
+        self.host = host
+        self.ids = itertools.count(1)
+        self.condition = threading.Condition()
+        self.pending: List[Dict[str, Any]] = []
+        self.issued: Dict[str, float] = {}
+        self.acks: List[Dict[str, Any]] = []
+        self.requests: List[str] = []
+        self.schedules: List[Dict[str, Any]] = []
+        self.status: Dict[str, Any] = {}
+        self.status_events: List[Dict[str, Any]] = []
+        self.available = True
+        self.sync_bytes: List[int] = []
+        self.connections = 0
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, port: int = 0) -> "StandInThreadhall":
+        self.server = ThreadingHTTPServer((self.host, port), self.handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        with self.condition:
+            self.push = False
+            self.condition.notify_all()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def __enter__(self) -> "StandInThreadhall":
+        return self.start()
+
+    def __exit__(self, *_: object) -> None:
+        self.stop()
+
+    def issue(self, command_type: str, **payload: Any) -> Dict[str, Any]:
+        command = {"id": next(self.ids), "type": command_type, "payload": payload}
+        command["issued_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with self.condition:
+            self.issued[str(command["id"])] = time.monotonic()
+            self.pending.append(command)
+            self.condition.notify_all()
+        return command
+
+    def cursor(self) -> str:
+        return str(max((int(command_id) for command_id in self.issued), default=0))
+
+    def take(self) -> List[Dict[str, Any]]:
+        commands, self.pending = self.pending, []
+        return commands
+
+    def wait_for_commands(self, cursor: str, wait: float) -> Dict[str, Any]:
+        deadline = time.monotonic() + wait
+        with self.condition:
+            while cursor and not self.pending and self.push:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            return {"cursor": self.cursor(), "commands": self.take()}
+
+    def schedules_hash(self) -> str:
+        encoded = json.dumps(self.schedules, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def sync(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self.condition:
+            if body.get("status_unchanged"):
+                if body.get("status_hash") != self.status.get("status_hash"):
+                    return {"status_required": True}
+            else:
+                self.status = body
+            data: Dict[str, Any] = {
+                "poll_seconds": self.poll_seconds,
+                "commands": self.take(),
+                "schedules_hash": self.schedules_hash(),
+            }
+            if body.get("schedules_hash") == data["schedules_hash"]:
+                data["schedules_not_modified"] = True
+            else:
+                data["schedules"] = self.schedules
+            return data
+
+    def acknowledge(self, command_id: str, body: Dict[str, Any]) -> None:
+        with self.condition:
+            issued = self.issued.get(command_id)
+            self.acks.append({
+                "id": command_id,
+                "status": body.get("status"),
+                "summary": body.get("summary"),
+                "ack_ms": round((time.monotonic() - issued) * 1000, 2) if issued else None,
+            })
+            self.condition.notify_all()
+
+    def wait_for_ack(self, command_id: Any, timeout: float = 5) -> Optional[Dict[str, Any]]:
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                ack = next((item for item in self.acks if item["id"] == str(command_id)), None)
+                remaining = deadline - time.monotonic()
+                if ack or remaining <= 0:
+                    return ack
+                self.condition.wait(remaining)
+
+    def handler(self) -> type:
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                standin.connections += 1
+
+            def log_message(self, *_: Any) -> None:
+                pass
+
+            def reply(self, status: int, payload: Dict[str, Any]) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if "gzip" in self.headers.get("Accept-Encoding", "") and len(body) > 256:
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def body(self) -> Dict[str, Any]:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                if self.headers.get("Content-Encoding") == "gzip":
+                    raw = gzip.decompress(raw)
+                if self.path.endswith("/sync"):
+                    standin.sync_bytes.append(len(raw))
+                return json.loads(raw or b"{}")
+
+            def authorized(self) -> bool:
+                if self.headers.get("Authorization") == f"Bearer {standin.token}":
+                    return True
+                self.reply(401, {"message": "Invalid device token"})
+                return False
+
+            def do_GET(self) -> None:
+                parsed = urllib.parse.urlparse(self.path)
+                standin.requests.append(f"GET {parsed.path}")
+                if not standin.available:
+                    self.reply(503, {"message": "Unavailable"})
+                    return
+                if parsed.path != "/api/pibells/v1/commands/wait" or not standin.push:
+                    self.reply(404, {"message": "Not found"})
+                    return
+                if not self.authorized():
+                    return
+                query = urllib.parse.parse_qs(parsed.query)
+                wait = min(120.0, float((query.get("wait") or ["25"])[0]))
+                self.reply(200, {"data": standin.wait_for_commands((query.get("cursor") or [""])[0], wait)})
+
+            def do_POST(self) -> None:
+                path = urllib.parse.urlparse(self.path).path
+                standin.requests.append(f"POST {path}")
+                body = self.body()
+                if not standin.available:
+                    self.reply(503, {"message": "Unavailable"})
+                    return
+                if path == "/api/pibells/v1/pair":
+                    self.reply(200, {"data": {"token": standin.token, "poll_seconds": standin.poll_seconds}})
+                    return
+                if not self.authorized():
+                    return
+                if path == "/api/pibells/v1/sync":
+                    self.reply(200, {"data": standin.sync(body)})
+                elif path == "/api/pibells/v1/commands/ack":
+                    for ack in body.get("acks", []):
+                        standin.acknowledge(str(ack.get("id")), ack)
+                    self.reply(200, {"data": {"acknowledged": len(body.get("acks", []))}})
+                elif path == "/api/pibells/v1/outbox":
+                    for ack in body.get("acks", []):
+                        standin.acknowledge(str(ack.get("id")), ack)
+                    standin.status_events.extend(body.get("status_events", []))
+                    self.reply(200, {"data": {"acknowledged": len(body.get("acks", []))}})
+                elif path.startswith("/api/pibells/v1/commands/") and path.endswith("/ack"):
+                    standin.acknowledge(path.split("/")[-2], body)
+                    self.reply(200, {"data": {"status": body.get("status")}})
+                else:
+                    self.reply(404, {"message": "Not found"})
+
+        return Handler
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token", default=DEFAULT_TOKEN)
+    parser.add_argument("--poll-seconds", type=int, default=20)
+    parser.add_argument("--no-push", action="store_true")
+    args = parser.parse_args()
+
+    standin = StandInThreadhall(args.token, not args.no_push, args.poll_seconds, args.host).start(args.port)
+    print(f"THREADHALL_BASE_URL={standin.url} THREADHALL_PIBELLS_TOKEN={args.token}")
+    print("Type a sound key to issue a command, or an empty line to quit.")
+    try:
+        while True:
+            sound_key = input("> ").strip()
+            if not sound_key:
+                break
+            command = standin.issue(sound_key, sound_key=sound_key, label=f"Stand-in {sound_key}")
+            ack = standin.wait_for_ack(command["id"], timeout=max(30, args.poll_seconds * 2))
+            print(f"command {command['id']}: {ack or 'no acknowledgement'}")
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -27,6 +27,17 @@ function renderAddress(device) {
   return port === 3030 ? device.ip : `${device.ip}:${port}`;
 }
 
+async function loadStreamGroups() {
+  try {
+    const data = await api("/api/devices/groups");
+    qs("#stream-groups").innerHTML = (data.groups || [])
+      .map((group) => `<option value="${escapeHtml(group.name)}">${escapeHtml(group.address)}:${group.port}</option>`)
+      .join("");
+  } catch (error) {
+    qs("#stream-groups").innerHTML = "";
+  }
+}
+
 async function loadDevices() {
   const devices = await api("/api/devices");
   const tbody = qs("#devices tbody");
@@ -42,7 +53,7 @@ async function loadDevices() {
       <td>
         <strong>${escapeHtml(deviceLabel(device))}</strong>
       </td>
-      <td><code>${escapeHtml(renderAddress(device))}</code></td>
+      <td><code>${escapeHtml(renderAddress(device))}</code>${device.group ? ` <span class="subtle-pill">${escapeHtml(device.group)}</span>` : ""}</td>
       <td><span class="status-pill pending" data-device-key="${escapeHtml(key)}">Checking</span></td>
       <td class="table-actions">
         <button class="icon-btn danger" title="Delete" data-index="${index}">${icon("fa-trash")}</button>
@@ -54,14 +65,26 @@ async function loadDevices() {
   updateDeviceStatuses();
 }
 
+function renderDeviceStatuses(statuses) {
+  qsa("[data-device-key]").forEach((status) => {
+    const online = Boolean(statuses[status.dataset.deviceKey]);
+    status.className = `status-pill ${online ? "online" : "offline"}`;
+    status.textContent = online ? "Online" : "Offline";
+  });
+}
+
+function watchDeviceStatuses() {
+  if (!window.EventSource) {
+    window.setInterval(updateDeviceStatuses, 6000);
+    return;
+  }
+  const events = new EventSource("/api/devices/status_stream");
+  events.onmessage = (event) => renderDeviceStatuses(JSON.parse(event.data));
+}
+
 async function updateDeviceStatuses() {
   try {
-    const statuses = await api("/api/devices/status");
-    qsa("[data-device-key]").forEach((status) => {
-      const online = Boolean(statuses[status.dataset.deviceKey]);
-      status.className = `status-pill ${online ? "online" : "offline"}`;
-      status.textContent = online ? "Online" : "Offline";
-    });
+    renderDeviceStatuses(await api("/api/devices/status"));
   } catch {
     qsa("[data-device-key]").forEach((status) => {
       status.className = "status-pill offline";
@@ -259,8 +282,9 @@ function initDeviceForms() {
     event.preventDefault();
     const ip = qs("#device-ip").value.trim();
     const name = qs("#device-name").value.trim();
+    const group = qs("#device-group").value.trim();
     try {
-      await api("/api/devices", { method: "POST", body: { ip, name } });
+      await api("/api/devices", { method: "POST", body: { ip, name, group } });
       event.target.reset();
       await loadDevices();
       notify("Device saved", "success");
@@ -270,6 +294,7 @@ function initDeviceForms() {
   });
 
   qs("#scan-btn").addEventListener("click", openScanDialog);
+  loadStreamGroups();
 }
 
 function resetScanDialog() {
@@ -360,8 +385,8 @@ async function startScan() {
   startButton.disabled = true;
   stopButton.hidden = false;
 
-  const query = ranges ? `?ranges=${encodeURIComponent(ranges)}` : "";
-  scanEvents = new EventSource(`/api/devices/scan_stream${query}`);
+  const query = ranges ? `&ranges=${encodeURIComponent(ranges)}` : "";
+  scanEvents = new EventSource(`/api/devices/scan_stream?quick=1${query}`);
   scanEvents.onmessage = (event) => {
     const data = JSON.parse(event.data);
     if ("total" in data) progress.max = Math.max(Number(data.total) || 1, 1);
@@ -504,7 +529,7 @@ async function init() {
   initPowerActions();
   initAccountForm();
   await Promise.all([loadDevices(), loadAudio(), loadAccount(), loadThreadhallStatus()]);
-  window.setInterval(updateDeviceStatuses, 6000);
+  watchDeviceStatuses();
 }
 
 document.addEventListener("DOMContentLoaded", () => {
@@ -16,6 +16,9 @@ def load_app(tmp_path, monkeypatch):
     monkeypatch.setenv("PIBELLS_BASE_DIR", str(tmp_path))
     monkeypatch.setenv("PIBELLS_DISABLE_DAEMON", "1")
     monkeypatch.setenv("PIBELLS_DISABLE_THREADHALL_SYNC", "1")
+    monkeypatch.setenv("PIBELLS_DISABLE_TRANSCODE", "1")
+    monkeypatch.setenv("PIBELLS_DISABLE_DEVICE_MONITOR", "1")
+    monkeypatch.setenv("PIBELLS_DISABLE_DISCOVERY_WORKER", "1")
     sys.modules.pop("app.main", None)
     module = importlib.import_module("app.main")
     return module
@@ -188,9 +191,9 @@ def test_threadhall_sync_applies_schedules_and_commands(module, monkeypatch):
                     ],
                 }
             }
-        if path == "api/pibells/v1/commands/7/ack":
-            acknowledgements.append(payload)
-            return {"data": {"status": "acknowledged"}}
+        if path == "api/pibells/v1/commands/ack":
+            acknowledgements.extend(payload["acks"])
+            return {"data": {"acknowledged": len(payload["acks"])}}
         raise AssertionError(path)
 
     monkeypatch.setattr(module, "trigger_bell", fake_trigger)
@@ -202,6 +205,7 @@ def test_threadhall_sync_applies_schedules_and_commands(module, monkeypatch):
     assert module.load_all_schedules()["active"] == "Threadhall - High School"
     assert module.load_schedule()[0].label == "Period 1"
     assert played == [("bell-passing-classic.mp3", False)]
+    assert acknowledgements[0]["id"] == 7
     assert acknowledgements[0]["status"] == "acknowledged"
 
 
@@ -281,6 +285,264 @@ def test_threadhall_sync_preserves_active_local_alternate_schedule(module, monke
     assert "Threadhall - High School" in schedules["schedules"]
 
 
+def test_threadhall_redelivered_command_is_acked_again_without_rerunning(module, monkeypatch):
+    from scripts.threadhall_standin import StandInThreadhall
+
+    (module.AUDIO_DIR / "bell-test-tone.mp3").write_bytes(b"fake mp3")
+    triggered = []
+    monkeypatch.setattr(module, "trigger_bell", lambda sound_file, loop=False: triggered.append(sound_file))
+
+    with StandInThreadhall(push=False) as standin:
+        module.save_threadhall_config({"enabled": True, "base_url": standin.url, "token": standin.token})
+        command = standin.issue("test_bell", sound_key="test")
+        module.sync_threadhall_once()
+        standin.pending.append(command)
+        module.sync_threadhall_once()
+
+    assert triggered == ["bell-test-tone.mp3"]
+    assert [ack["id"] for ack in standin.acks] == [str(command["id"])] * 2
+    assert [ack["status"] for ack in standin.acks] == ["acknowledged"] * 2
+
+
+def test_threadhall_push_channel_delivers_commands_between_syncs(module, monkeypatch):
+    import threading
+    import time
+
+    from scripts.threadhall_standin import StandInThreadhall
+
+    (module.AUDIO_DIR / "emergency-lockdown.mp3").write_bytes(b"fake mp3")
+    monkeypatch.setattr(module, "start_local", lambda *args, **kwargs: None)
+    push = module.threadhall_push
+
+    with StandInThreadhall(push=False) as standin:
+        module.save_threadhall_config({"enabled": True, "base_url": standin.url, "token": standin.token})
+        with pytest.raises(module.ThreadhallError) as unsupported:
+            push.poll_once(module.load_threadhall_config())
+        assert unsupported.value.upstream_status == 404
+
+    with StandInThreadhall() as standin:
+        module.save_threadhall_config({"base_url": standin.url})
+        worker = threading.Thread(target=push.run, daemon=True)
+        worker.start()
+        deadline = time.monotonic() + 5
+        while not push.connected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        command = standin.issue("lockdown", sound_key="lockdown", label="Lockdown")
+        ack = standin.wait_for_ack(command["id"])
+        push.stop()
+
+    worker.join(5)
+    latency = push.latency()
+    assert ack["status"] == "acknowledged"
+    assert ack["ack_ms"] < 1000
+    assert not any(request.endswith("/sync") for request in standin.requests)
+    assert latency["channels"]["push"]["commands"] == 1
+    assert latency["recent"][-1]["receive_to_play_ms"] is not None
+    assert module.safe_threadhall_status()["push"]["connects"] == 1
+    assert module.handle_threadhall_commands(module.load_threadhall_config(), [command], "sync") == 0
+
+
+def test_threadhall_sync_sends_hashes_and_skips_unchanged_schedules(module, monkeypatch):
+    import itertools
+
+    from scripts.threadhall_standin import StandInThreadhall
+
+    (module.AUDIO_DIR / "bell-passing-classic.mp3").write_bytes(b"fake mp3")
+    entry = {"day": 0, "time": "08:10", "sound_key": "passing", "label": "Period 1"}
+    stats = module.threadhall_sync_stats
+    next_event = module.next_event_payload
+    minutes = itertools.count(600, -1)
+
+    def ticking_next_event(entries):
+        payload = next_event(entries)
+        return payload and {**payload, "in_minutes": next(minutes)}
+
+    monkeypatch.setattr(module, "next_event_payload", ticking_next_event)
+
+    with StandInThreadhall(push=False) as standin:
+        standin.schedules = [{"name": "Threadhall - High School", "entries": [entry]}]
+        module.save_threadhall_config({"enabled": True, "base_url": standin.url, "token": standin.token})
+        first = module.sync_threadhall_once()
+        written = module.SCHEDULE_FILE.stat().st_mtime_ns
+        module.sync_threadhall_once()
+        third = module.sync_threadhall_once()
+        unchanged = module.SCHEDULE_FILE.stat().st_mtime_ns == written
+        standin.status = {}
+        module.sync_threadhall_once()
+        standin.schedules = [{"name": "Threadhall - High School", "entries": [{**entry, "time": "08:15"}]}]
+        module.sync_threadhall_once()
+
+    assert first["received_schedules"] == 1
+    assert third["schedules_not_modified"] is True
+    assert unchanged
+    assert standin.sync_bytes[2] < standin.sync_bytes[1] / 2
+    assert standin.status["schedule_options"] == ["Default", "Threadhall - High School"]
+    assert module.load_schedule()[0].time.strftime("%H:%M") == "08:15"
+    assert stats["schedule_writes"] == 2
+    assert stats["schedules_not_modified"] == 3
+    assert stats["status_unchanged"] == 3
+    assert stats["status_sent"] == 3
+    assert module.apply_threadhall_schedules(standin.schedules) is False
+
+
+def test_threadhall_client_reuses_connections_compresses_and_batches_acks(module, monkeypatch):
+    import json
+
+    from scripts.threadhall_standin import StandInThreadhall
+
+    (module.AUDIO_DIR / "bell-test-tone.mp3").write_bytes(b"fake mp3")
+    monkeypatch.setattr(module, "start_local", lambda *args, **kwargs: None)
+    monkeypatch.setattr(module.threadhall_http, "gzip_min_bytes", 64)
+
+    with StandInThreadhall(push=False) as standin:
+        module.save_threadhall_config({"enabled": True, "base_url": standin.url, "token": standin.token})
+        for _ in range(3):
+            standin.issue("test_bell", sound_key="test")
+        module.sync_threadhall_once()
+        module.sync_threadhall_once()
+
+    http = module.threadhall_http.stats()
+    assert standin.connections == 1
+    acks = [request for request in standin.requests if request.endswith("/ack")]
+    assert acks == ["POST /api/pibells/v1/commands/ack"]
+    assert [ack["status"] for ack in standin.acks] == ["acknowledged"] * 3
+    assert http["calls"]["POST /api/pibells/v1/sync"]["calls"] == 2
+    assert http["calls"]["POST /api/pibells/v1/sync"]["reused"] == 1
+    assert http["recent"][0]["bytes_sent"] < len(json.dumps(standin.status))
+
+
+def test_threadhall_client_uses_the_environment_proxy_and_records_failures(module, monkeypatch):
+    import socket
+
+    from scripts.threadhall_standin import StandInThreadhall
+
+    monkeypatch.setenv("NO_PROXY", "")
+    monkeypatch.setenv("no_proxy", "")
+    with StandInThreadhall(push=False) as standin:
+        monkeypatch.setenv("HTTP_PROXY", standin.url)
+        monkeypatch.setenv("http_proxy", standin.url)
+        module.save_threadhall_config(
+            {"enabled": True, "base_url": "http://threadhall.example", "token": standin.token}
+        )
+        module.sync_threadhall_once()
+        assert "POST /api/pibells/v1/sync" in standin.requests
+
+    with socket.socket() as closed:
+        closed.bind(("127.0.0.1", 0))
+        port = closed.getsockname()[1]
+    monkeypatch.setenv("HTTP_PROXY", f"http://127.0.0.1:{port}")
+    monkeypatch.setenv("http_proxy", f"http://127.0.0.1:{port}")
+    module.save_threadhall_config({"base_url": "http://offline.threadhall.example"})
+    with pytest.raises(module.ThreadhallError):
+        module.sync_threadhall_once()
+    http = module.threadhall_http.stats()
+    assert http["recent"][-1]["status"] is None
+    assert http["recent"][-1]["error"]
+    assert http["calls"]["POST /api/pibells/v1/sync"]["failures"] == 1
+
+
+def test_threadhall_client_falls_back_to_plain_bodies_after_a_stale_connection(module, monkeypatch):
+    import http.client
+
+    class FakeResponse:
+        def __init__(self, status):
+            self.status = status
+            self.reason = "Unsupported Media Type" if status == 415 else "OK"
+            self.will_close = True
+
+        def read(self):
+            return b"{}"
+
+        def getheader(self, name, default=None):
+            return default
+
+    class FakeConnection:
+        def __init__(self, status):
+            self.status = status
+
+        def request(self, method, target, body=None, headers=None):
+            if self.status is None:
+                raise http.client.RemoteDisconnected("closed")
+
+        def getresponse(self):
+            return FakeResponse(self.status)
+
+        def close(self):
+            pass
+
+    connections = [(FakeConnection(None), True), (FakeConnection(415), False), (FakeConnection(200), False)]
+    monkeypatch.setattr(module.threadhall_http, "acquire", lambda *args: connections.pop(0))
+    monkeypatch.setattr(module.threadhall_http, "gzip_min_bytes", 8)
+
+    status, _, _ = module.threadhall_http.send(
+        "POST", "http://threadhall.example/api/pibells/v1/sync", b"x" * 64, {}, 5
+    )
+
+    assert status == 200
+    assert connections == []
+    assert module.threadhall_http.stats()["plain_hosts"] == ["threadhall.example"]
+
+
+def test_threadhall_commands_run_by_priority_on_a_pool_with_one_ack(module, monkeypatch):
+    import threading
+
+    from scripts.threadhall_standin import StandInThreadhall
+
+    for filename in ("bell-test-tone.mp3", "bell-passing-classic.mp3", "emergency-lockdown.mp3"):
+        (module.AUDIO_DIR / filename).write_bytes(b"fake mp3")
+    started = []
+    routine = threading.Barrier(2, timeout=2)
+
+    def fake_trigger(sound_file, loop=False):
+        started.append(sound_file)
+        if not sound_file.startswith("emergency"):
+            routine.wait()
+
+    monkeypatch.setattr(module, "trigger_bell", fake_trigger)
+
+    with StandInThreadhall(push=False) as standin:
+        module.save_threadhall_config({"enabled": True, "base_url": standin.url, "token": standin.token})
+        standin.issue("test_bell", sound_key="test")
+        standin.issue("passing", sound_key="passing")
+        standin.issue("lockdown", sound_key="lockdown")
+        status = module.sync_threadhall_once()
+
+    commands = {command["type"]: command for command in status["commands"]}
+    acks = [request for request in standin.requests if request.endswith("/ack")]
+    assert started[0] == "emergency-lockdown.mp3"
+    assert set(started[1:]) == {"bell-test-tone.mp3", "bell-passing-classic.mp3"}
+    assert acks == ["POST /api/pibells/v1/commands/ack"]
+    assert [ack["status"] for ack in standin.acks] == ["acknowledged"] * 3
+    assert commands["lockdown"]["priority"] == "emergency"
+    assert commands["passing"]["priority"] == "routine"
+    assert commands["passing"]["queued_ms"] >= commands["lockdown"]["queued_ms"]
+    assert all(command["run_ms"] is not None for command in status["commands"])
+
+
+def test_threadhall_schedule_activations_run_in_issue_order(module, monkeypatch):
+    import time
+
+    module.save_all_schedules({"active": "Default", "schedules": {"Default": [], "Alpha": [], "Beta": []}})
+    save_all_schedules = module.save_all_schedules
+
+    def slow_alpha_save(data):
+        if data.get("active") == "Alpha":
+            time.sleep(0.2)
+        save_all_schedules(data)
+
+    monkeypatch.setattr(module, "save_all_schedules", slow_alpha_save)
+
+    commands = [
+        {"id": 1, "type": "activate_schedule", "payload": {"schedule_name": "Alpha"}},
+        {"id": 2, "type": "activate_schedule", "payload": {"schedule_name": "Beta"}},
+    ]
+    results = module.dispatch_threadhall_commands(commands, time.monotonic())
+
+    assert [result["command"]["id"] for result in results] == [1, 2]
+    assert [result["status"] for result in results] == ["acknowledged"] * 2
+    assert module.load_all_schedules()["active"] == "Beta"
+
+
 def test_default_audio_names_are_applied(module):
     (module.AUDIO_DIR / "emergency-lockdown.mp3").write_bytes(b"fake mp3")
     (module.AUDIO_DIR / "bell-lunch-light-chime.mp3").write_bytes(b"fake mp3")
@@ -326,3 +588,993 @@ def test_trigger_bell_starts_barix_and_local_outputs(module, monkeypatch):
 
     assert any("udp://192.168.1.10:3030?pkt_size=1200" in cmd for cmd in commands)
     assert any(cmd[0] in {"ffplay", "bash"} for cmd in commands)
+
+
+def test_config_cache_serves_memory_and_reloads_external_edits(module):
+    module.save_devices([module.Device(ip="192.168.1.10", name="Gym", port=3030)])
+    hits = module.config_cache.hits
+
+    first = module.load_devices()
+    first[0].name = "Mutated"
+    second = module.load_devices()
+
+    assert module.config_cache.hits == hits + 2
+    assert second[0].name == "Gym"
+
+    module.DEVICES_FILE.write_text('["192.168.1.20"]')
+    reloaded = module.load_devices()
+
+    assert [device.ip for device in reloaded] == ["192.168.1.20"]
+    assert module.config_cache.stats()["reloads"] == 1
+
+
+def test_schedule_index_finds_next_firing_and_rebuilds_on_change(module):
+    from datetime import datetime
+
+    (module.AUDIO_DIR / "bell.mp3").write_bytes(b"fake mp3")
+    module.save_all_schedules({
+        "active": "Default",
+        "schedules": {
+            "Default": [
+                {"id": "mon-8", "day": 0, "time": "08:00", "sound_file": "bell.mp3"},
+                {"id": "mon-9", "day": 0, "time": "09:00", "sound_file": "bell.mp3", "enabled": False},
+                {"id": "fri-15", "day": 4, "time": "15:00", "sound_file": "bell.mp3"},
+            ]
+        },
+    })
+
+    index = module.current_schedule_index()
+    assert module.current_schedule_index() is index
+
+    moment, entries = index.next_firing(datetime(2026, 10, 19, 8, 0, 30))
+    assert moment == datetime(2026, 10, 23, 15, 0)
+    assert [entry.id for entry in entries] == ["fri-15"]
+
+    moment, entries = index.next_firing(datetime(2026, 10, 24, 9, 0))
+    assert moment == datetime(2026, 10, 26, 8, 0)
+    assert [entry.id for entry in entries] == ["mon-8"]
+
+    module.activate_schedule("Default")
+    assert module.current_schedule_index() is not index
+    assert module.schedule_changed.is_set()
+
+
+def test_prepared_bell_gates_outputs_until_release(module, monkeypatch):
+    import io
+    from datetime import datetime
+
+    (module.AUDIO_DIR / "bell.mp3").write_bytes(b"fake mp3")
+    module.save_devices([module.Device(ip="192.168.1.10", name="Gym", port=3030)])
+    procs = []
+
+    class FakeProcess:
+        def __init__(self, cmd):
+            self.cmd = cmd
+            self.stdin = io.BytesIO()
+            self.stdin.close = lambda: None
+
+        def wait(self, timeout=None):
+            return 0
+
+        def kill(self):
+            pass
+
+    def fake_popen(cmd, stdout=None, stderr=None, stdin=None):
+        assert stdin == module.subprocess.PIPE
+        procs.append(FakeProcess(cmd))
+        return procs[-1]
+
+    monkeypatch.setattr(module.subprocess, "Popen", fake_popen)
+
+    bell = module.PreparedBell("bell.mp3", datetime.now()).arm()
+
+    assert len(procs) == 2
+    assert all(proc.stdin.getvalue() == b"" for proc in procs)
+    assert "pipe:0" in procs[0].cmd
+
+    timing = bell.release()
+    for thread in bell.feeders:
+        thread.join(timeout=1)
+
+    assert timing["outputs"] == 2
+    assert all(proc.stdin.getvalue() == b"fake mp3" for proc in procs)
+    assert set(timing["first_write_ms"]) == {"192.168.1.10:3030", "local"}
+    assert module.bell_timings[-1] is timing
+
+
+def test_fanout_stream_encodes_once_and_relays_to_every_device(module, monkeypatch):
+    import io
+    import socket
+
+    receivers = []
+    for _ in range(3):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        sock.settimeout(2)
+        receivers.append(sock)
+    devices = [module.Device(ip="127.0.0.1", port=sock.getsockname()[1]) for sock in receivers]
+    commands = []
+
+    class FakeProcess:
+        def __init__(self):
+            self.stdout = io.BytesIO(b"x" * 3000)
+
+        def wait(self, timeout=None):
+            return 0
+
+    def fake_popen(cmd, stdout=None, stderr=None):
+        commands.append(cmd)
+        return FakeProcess()
+
+    monkeypatch.setattr(module.subprocess, "Popen", fake_popen)
+
+    streams = module.start_streams("bell.mp3", devices)
+    streams[0][1].wait(timeout=2)
+
+    assert len(commands) == 1
+    assert commands[0][-1] == "pipe:1"
+    stats = streams[0][1].stats()
+    assert {value["packets"] for value in stats["devices"].values()} == {3}
+    assert {value["bytes"] for value in stats["devices"].values()} == {3000}
+    for sock in receivers:
+        sizes = [len(sock.recv(2048)) for _ in range(3)]
+        sock.close()
+        assert sizes == [1200, 1200, 600]
+
+
+def test_paced_streamer_sends_whole_mp3_frames_without_ffmpeg(module, monkeypatch):
+    import socket
+
+    frame = bytes([0xFF, 0xFB, 0x90, 0x00]) + b"\x00" * 413
+    assert module.parse_mp3_frames(b"ID3\x03\x00\x00\x00\x00\x00\x00" + frame * 3)[0][:2] == (10, 417)
+    (module.AUDIO_DIR / "bell.mp3").write_bytes(frame * 6)
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(2)
+    module.save_devices([module.Device(ip="127.0.0.1", port=receiver.getsockname()[1])])
+
+    def fail_popen(*args, **kwargs):
+        raise AssertionError("ffmpeg should not be spawned for 128k MP3")
+
+    monkeypatch.setattr(module.subprocess, "Popen", fail_popen)
+    streams = module.start_streams(str(module.AUDIO_DIR / "bell.mp3"), module.load_devices())
+    streams[0][1].wait(timeout=2)
+
+    sizes = [len(receiver.recv(2048)) for _ in range(3)]
+    receiver.close()
+    stats = streams[0][1].stats()
+    assert streams[0][0] == "paced"
+    assert sizes == [834, 834, 834]
+    assert list(stats["devices"].values()) == [{"packets": 3, "bytes": 2502}]
+    assert module.stream_history[-1]["kind"] == "paced"
+
+
+def test_grouped_devices_share_one_multicast_stream(module, authed_client, monkeypatch):
+    import socket
+    import struct
+
+    bad = authed_client.put("/api/devices/groups", json={"groups": [{"name": "Gym", "address": "10.0.0.1"}]})
+    unknown = authed_client.post("/api/devices", json={"ip": "192.168.1.10", "group": "Halls"})
+    groups = authed_client.put(
+        "/api/devices/groups", json={"groups": [{"name": "Halls", "address": "239.66.0.1", "port": 13030}]}
+    )
+    for index in range(3):
+        authed_client.post("/api/devices", json={"ip": f"192.168.1.{10 + index}", "group": "Halls"})
+    authed_client.post("/api/devices", json={"ip": "127.0.0.1", "port": 13031})
+
+    assert bad.status_code == 400
+    assert unknown.status_code == 400
+    assert groups.json()["groups"] == [{"name": "Halls", "address": "239.66.0.1", "port": 13030}]
+    assert '"group": "Halls"' in module.DEVICES_FILE.read_text()
+    targets = module.stream_targets(module.load_devices())
+    assert [(device.ip, device.port) for device in targets] == [("239.66.0.1", 13030), ("127.0.0.1", 13031)]
+
+    frame = bytes([0xFF, 0xFB, 0x90, 0x00]) + b"\x00" * 413
+    (module.AUDIO_DIR / "bell.mp3").write_bytes(frame * 3)
+    member = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    member.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    member.bind(("", 13030))
+    membership = struct.pack("4s4s", socket.inet_aton("239.66.0.1"), socket.inet_aton("127.0.0.1"))
+    member.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    member.settimeout(2)
+    monkeypatch.setattr(module, "STREAM_MULTICAST_IF", "127.0.0.1")
+    monkeypatch.setattr(module, "start_local", lambda *args, **kwargs: None)
+
+    job = module.trigger_bell("bell.mp3")
+    job.outputs[0][1].wait(timeout=2)
+    packet = member.recv(2048)
+    member.close()
+
+    stats = module.stream_history[-1]
+    assert len(packet) == 834
+    assert stats["targets"] == 2
+    assert stats["multicast"] == 1
+    assert module.device_stream_url(targets[0]).endswith("&ttl=1&localaddr=127.0.0.1")
+
+    monkeypatch.setattr(module, "STREAM_MULTICAST", False)
+    assert len(module.stream_targets(module.load_devices())) == 4
+
+    listed = authed_client.get("/api/devices").json()
+    assert [device.get("group") for device in listed] == ["Halls", "Halls", "Halls", None]
+    assert module.check_stream_multicast_interface("127.0.0.1")
+    for bad_interface in ("eth0", "192.0.2.77"):
+        assert not module.check_stream_multicast_interface(bad_interface)
+        assert module.STREAM_MULTICAST_IF == ""
+        assert bad_interface in authed_client.get("/api/diagnostics").json()["stream_multicast"]["error"]
+    assert module.device_stream_url(targets[0]).endswith("&ttl=1")
+
+
+def test_transcode_cache_feeds_playback_without_encoding(module, monkeypatch):
+    (module.AUDIO_DIR / "bell.wav").write_bytes(b"RIFF fake wav")
+    runs = []
+
+    def fake_run(cmd, **kwargs):
+        runs.append(cmd)
+        module.Path(cmd[-1]).write_bytes(b"encoded " + cmd[-2].encode())
+        return module.subprocess.CompletedProcess(cmd, 0)
+
+    monkeypatch.setattr(module.subprocess, "run", fake_run)
+
+    artifacts = module.build_transcode(module.audio_path("bell.wav"))
+    module.build_transcode(module.audio_path("bell.wav"))
+
+    assert len(runs) == 2
+    assert {cmd[-2] for cmd in runs} == {"mp3", "wav"}
+    assert "128k" in runs[0]
+    stream_source, local_source = module.playback_sources("bell.wav")
+    assert stream_source == artifacts["mp3"]
+    assert local_source == artifacts["wav"]
+    assert local_source.parent == module.AUDIO_CACHE_DIR
+    assert module.local_player_commands(str(local_source), pcm=True)[0] == ["aplay", "-q", str(local_source)]
+
+    module.audio_path("bell.wav").unlink()
+    module.prune_transcode_cache()
+    assert list(module.AUDIO_CACHE_DIR.iterdir()) == []
+
+
+def test_local_sink_reuses_one_player_for_pcm_playback(module, monkeypatch):
+    import io
+    import wave
+
+    wav_path = module.AUDIO_CACHE_DIR / "tone.wav"
+    wav_path.parent.mkdir()
+    with wave.open(str(wav_path), "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(44100)
+        wav.writeframes(b"\x01\x00" * 10000)
+    commands = []
+
+    class FakeProcess:
+        def __init__(self, cmd):
+            self.cmd = cmd
+            self.stdin = io.BytesIO()
+            self.stdin.close = lambda: None
+
+        def poll(self):
+            return None
+
+        def terminate(self):
+            pass
+
+    def fake_popen(cmd, stdout=None, stderr=None, stdin=None):
+        commands.append(FakeProcess(cmd))
+        return commands[-1]
+
+    monkeypatch.setattr(module.subprocess, "Popen", fake_popen)
+
+    first = module.play_local(wav_path)
+    first.wait(timeout=2)
+    second = module.play_local(wav_path)
+    second.wait(timeout=2)
+
+    assert len(commands) == 1
+    assert commands[0].cmd[:4] == ["aplay", "-q", "-t", "raw"]
+    assert commands[0].stdin.getvalue() == b"\x01\x00" * 20000
+    assert module.local_sink.stats()["plays"] == 2
+    module.local_sink.close()
+
+
+def test_local_sink_replays_the_chunk_lost_to_a_player_restart(module, monkeypatch):
+    import io
+
+    class BrokenStdin:
+        def write(self, chunk):
+            raise BrokenPipeError()
+
+        def flush(self):
+            pass
+
+        def close(self):
+            pass
+
+    class FakeProcess:
+        def __init__(self, stdin):
+            self.stdin = stdin
+            self.returncode = None
+
+        def poll(self):
+            return self.returncode
+
+        def terminate(self):
+            pass
+
+    players = [FakeProcess(BrokenStdin()), FakeProcess(io.BytesIO())]
+    players[1].stdin.close = lambda: None
+    started = []
+
+    def fake_popen(cmd, stdout=None, stderr=None, stdin=None):
+        started.append(players[len(started)])
+        return started[-1]
+
+    monkeypatch.setattr(module.subprocess, "Popen", fake_popen)
+
+    playback = module.local_sink.prepare(b"\x02\x00" * 5000)
+    players[0].returncode = 1
+    playback.start().wait(timeout=2)
+
+    assert len(started) == 2
+    assert players[1].stdin.getvalue() == b"\x02\x00" * 5000
+    assert module.local_sink.stats()["restarts"] == 1
+
+
+def test_local_sink_gives_up_on_a_player_that_keeps_exiting(module, monkeypatch):
+    class BrokenStdin:
+        def write(self, chunk):
+            raise BrokenPipeError()
+
+        def flush(self):
+            pass
+
+        def close(self):
+            pass
+
+    class ExitingProcess:
+        def __init__(self):
+            self.stdin = BrokenStdin()
+
+        def poll(self):
+            return 1
+
+        def terminate(self):
+            pass
+
+    started = []
+
+    def fake_popen(cmd, stdout=None, stderr=None, stdin=None):
+        started.append(ExitingProcess())
+        return started[-1]
+
+    monkeypatch.setattr(module.subprocess, "Popen", fake_popen)
+
+    playback = module.local_sink.prepare(b"\x02\x00" * 5000)
+    assert playback.start().done.wait(timeout=5)
+
+    stats = module.local_sink.stats()
+    assert len(started) == module.LOCAL_SINK_MAX_RESTARTS + 1
+    assert playback.restarts == module.LOCAL_SINK_MAX_RESTARTS + 1
+    assert stats["failures"] == 1
+    assert "kept exiting" in stats["last_error"]
+    module.local_sink.close()
+
+
+def test_playback_jobs_are_listed_capped_and_cancellable(module, authed_client, monkeypatch):
+    (module.AUDIO_DIR / "bell.mp3").write_bytes(b"fake mp3")
+    module.save_devices([module.Device(ip="192.168.1.10", name="Gym", port=3030)])
+    terminated = []
+
+    class FakeProcess:
+        def __init__(self, cmd):
+            self.cmd = cmd
+            self.returncode = None
+
+        def poll(self):
+            return self.returncode
+
+        def terminate(self):
+            terminated.append(self.cmd[0])
+            self.returncode = -15
+
+        def kill(self):
+            self.returncode = -9
+
+        def wait(self, timeout=None):
+            return self.returncode
+
+    monkeypatch.setattr(module.subprocess, "Popen", lambda cmd, **kwargs: FakeProcess(cmd))
+    monkeypatch.setattr(module.playback_manager, "max_encoders", 2)
+
+    first = authed_client.post("/api/test", json={"sound_file": "bell.mp3"}).json()["job"]
+    listing = authed_client.get("/api/playback").json()
+    assert [job["id"] for job in listing["jobs"]] == [first]
+    assert listing["encoders"] == 2
+
+    second = authed_client.post("/api/test", json={"sound_file": "bell.mp3"}).json()["job"]
+    assert module.playback_manager.evicted == 1
+    assert len(terminated) == 2
+    assert second in module.playback_manager.jobs
+
+    cancelled = authed_client.delete(f"/api/playback/{second}")
+    assert cancelled.json()["status"] == "cancelled"
+    assert len(terminated) == 4
+    assert authed_client.delete("/api/playback/missing").status_code == 404
+
+
+def test_manual_play_does_not_evict_a_scheduled_bell(module, monkeypatch):
+    class RunningProcess:
+        def poll(self):
+            return None
+
+        def terminate(self):
+            pass
+
+    monkeypatch.setattr(module.playback_manager, "max_encoders", 2)
+    scheduled = module.playback_manager.admit("bell.mp3", False, "schedule", 2)
+    scheduled.outputs = [("ffmpeg", RunningProcess()), ("ffplay", RunningProcess())]
+    scheduled.status = "running"
+
+    with pytest.raises(module.HTTPException) as rejected:
+        module.playback_manager.admit("bell.mp3", False, "manual", 2)
+    assert rejected.value.status_code == 429
+    assert scheduled.cancelled is None
+
+    module.playback_manager.admit("bell.mp3", False, "schedule", 2)
+    assert scheduled.status == "cancelled"
+    assert module.playback_manager.evicted == 1
+
+
+def test_stop_kills_loop_process_group_at_once(module, authed_client, monkeypatch):
+    import os
+
+    (module.AUDIO_DIR / "siren.mp3").write_bytes(b"fake mp3")
+    module.save_devices([module.Device(ip=f"192.168.1.{index}", port=3030) for index in range(10, 15)])
+    monkeypatch.setattr(module, "STREAM_MODE", "per-device")
+    monkeypatch.setattr(module, "stream_command", lambda source, device, loop=False: ["sleep", "30"])
+    monkeypatch.setattr(module, "local_player_commands", lambda source, loop=False, pcm=False: [["sleep", "30"]])
+
+    job = module.trigger_bell("siren.mp3", loop=True)
+    pids = [proc.pid for _, proc in job.outputs]
+
+    assert len(pids) == 6
+    assert len({os.getpgid(pid) for pid in pids}) == 1
+
+    report = authed_client.post("/api/stop").json()
+
+    assert report["outputs"] == 6
+    assert report["still_running"] == 0
+    assert report["stop_ms"] < 1000
+    assert all(proc.poll() is not None for _, proc in job.outputs)
+
+
+def test_loop_player_starts_its_own_group_when_the_leader_has_exited(module):
+    import os
+    import subprocess
+
+    leader = subprocess.Popen(["true"])
+    leader.wait()
+
+    proc = module.start_process(["sleep", "5"], "local playback", **module.process_group_kwargs(leader.pid))
+
+    assert proc is not None
+    assert os.getpgid(proc.pid) != os.getpgrp()
+    proc.kill()
+    proc.wait()
+
+
+def test_cancelled_prepared_bell_and_failed_start_release_their_jobs(module, monkeypatch):
+    import time
+    from datetime import datetime
+
+    (module.AUDIO_DIR / "bell.mp3").write_bytes(b"fake mp3")
+    module.save_devices([module.Device(ip="127.0.0.1", port=9)])
+    monkeypatch.setattr(module, "paced_stream_packets", lambda source: [(0.0, b"frame"), (0.05, b"")])
+    monkeypatch.setattr(module, "start_local", lambda *args, **kwargs: None)
+
+    bell = module.PreparedBell("bell.mp3", datetime.now()).arm()
+    job_id = bell.job.id
+    bell.cancel()
+    deadline = time.monotonic() + 2
+    while job_id in module.playback_manager.jobs and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert job_id not in module.playback_manager.jobs
+    assert module.playback_manager.history[-1]["status"] == "cancelled"
+
+    def broken_local(*args, **kwargs):
+        raise RuntimeError("no audio device")
+
+    monkeypatch.setattr(module, "play_local", broken_local)
+    with pytest.raises(RuntimeError):
+        module.trigger_bell("bell.mp3")
+
+    snapshot = module.playback_manager.snapshot()
+    assert snapshot["jobs"] == []
+    assert snapshot["encoders"] == 0
+    assert snapshot["recent"][-1]["status"] == "failed"
+
+
+def test_emergency_playback_preempts_and_suppresses_routine(module, authed_client, monkeypatch):
+    import json
+
+    (module.AUDIO_DIR / "bell.mp3").write_bytes(b"fake mp3")
+    (module.AUDIO_DIR / "emergency-lockdown.mp3").write_bytes(b"fake mp3")
+    module.save_devices([module.Device(ip="192.168.1.10", port=3030)])
+    monkeypatch.setattr(module, "STREAM_MODE", "per-device")
+    monkeypatch.setattr(module, "stream_command", lambda source, device, loop=False: ["sleep", "30"])
+    monkeypatch.setattr(module, "local_player_commands", lambda source, loop=False, pcm=False: [["sleep", "30"]])
+
+    routine = module.trigger_bell("bell.mp3", loop=True)
+    module.DEVICES_FILE.write_text(json.dumps([
+        {"ip": "192.168.1.10", "port": 3030},
+        {"ip": "192.168.1.11", "port": 3030},
+    ]))
+    started_before_stop = []
+    stop = module.playback_manager.stop
+
+    def recording_stop(jobs, status="cancelled"):
+        if status == "preempted":
+            started_before_stop.extend(
+                len(job.outputs) for job in module.playback_manager.jobs.values() if job.priority > routine.priority
+            )
+        return stop(jobs, status)
+
+    monkeypatch.setattr(module.playback_manager, "stop", recording_stop)
+    emergency = module.trigger_bell("emergency-lockdown.mp3", loop=True)
+
+    assert routine.status == "preempted"
+    assert all(proc.poll() is not None for _, proc in routine.outputs)
+    assert emergency.priority == module.PRIORITY_EMERGENCY
+    assert len(emergency.outputs) == 3
+    assert started_before_stop == [3]
+
+    blocked = authed_client.post("/api/test", json={"sound_file": "bell.mp3"})
+    assert blocked.status_code == 409
+
+    listing = authed_client.get("/api/playback").json()
+    assert listing["emergency"]["preempted"] == 1
+    assert listing["emergency"]["suppressed"] == 1
+    running = [job for job in listing["jobs"] if job["status"] == "running"]
+    assert [job["id"] for job in running] == [emergency.id]
+    assert running[0]["priority"] == "emergency"
+    assert running[0]["start_ms"] is not None
+
+    authed_client.post("/api/stop")
+    assert authed_client.post("/api/test", json={"sound_file": "bell.mp3"}).status_code == 200
+    authed_client.post("/api/stop")
+
+
+def test_prearmed_emergency_bell_preempts_at_release(module, monkeypatch):
+    import time
+    from datetime import datetime
+
+    class RunningProcess:
+        def __init__(self):
+            self.returncode = None
+
+        def poll(self):
+            return self.returncode
+
+        def terminate(self):
+            self.returncode = -15
+
+        def kill(self):
+            self.returncode = -9
+
+    (module.AUDIO_DIR / "emergency-lockdown.mp3").write_bytes(b"fake mp3")
+    monkeypatch.setattr(module, "start_local", lambda *args, **kwargs: None)
+    routine = module.playback_manager.admit("bell.mp3", True, "manual", 1)
+    routine.attach([("local", RunningProcess())])
+
+    bell = module.PreparedBell("emergency-lockdown.mp3", datetime.now()).arm()
+    assert routine.outputs[0][1].poll() is None
+
+    bell.release()
+    deadline = time.monotonic() + 2
+    while routine.outputs[0][1].poll() is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert routine.outputs[0][1].poll() is not None
+    assert routine.status == "preempted"
+
+
+def test_emergency_priority_follows_sound_keys_and_audio_names(module):
+    (module.AUDIO_DIR / "district-lockdown.mp3").write_bytes(b"fake mp3")
+    (module.AUDIO_DIR / "emergency-fire-drill.mp3").write_bytes(b"fake mp3")
+    (module.AUDIO_DIR / "bell.mp3").write_bytes(b"fake mp3")
+    module.save_audio_meta({"district-lockdown.mp3": "Emergency Lockdown (District)"})
+
+    assert module.sound_priority("district-lockdown.mp3") == module.PRIORITY_EMERGENCY
+    assert module.sound_priority("emergency-fire-drill.mp3") == module.PRIORITY_EMERGENCY
+    assert module.sound_priority("bell.mp3") == module.PRIORITY_ROUTINE
+    assert module.sound_priority("bell.mp3", "lockdown") == module.PRIORITY_EMERGENCY
+    command = {"id": 1, "type": "shelter", "payload": {"sound_key": "shelter"}}
+    assert module.threadhall_command_priority(command) == module.PRIORITY_EMERGENCY
+
+
+def test_device_health_monitor_probes_concurrently_and_serves_cached_status(module, authed_client, monkeypatch):
+    import asyncio
+    import json
+    import time
+
+    module.save_devices([module.Device(ip=f"192.168.1.{index}", port=3030) for index in range(10, 18)])
+    offline = {"192.168.1.11"}
+    probes = []
+
+    def fake_check(device, timeout=0.5):
+        probes.append(device.ip)
+        time.sleep(0.2)
+        return device.ip not in offline
+
+    monkeypatch.setattr(module, "check_device", fake_check)
+
+    started = time.monotonic()
+    statuses = authed_client.get("/api/devices/status").json()
+    assert time.monotonic() - started < 1.0
+    assert statuses["192.168.1.10:3030"] is True
+    assert statuses["192.168.1.11:3030"] is False
+    assert len(probes) == 8
+
+    assert module.dashboard()["online_device_count"] == 7
+    assert len(probes) == 8
+
+    version = module.device_monitor.version
+    offline.add("192.168.1.12")
+    module.device_monitor.refresh(module.load_devices())
+    assert module.device_monitor.wait_for_change(version, timeout=0) == version + 1
+
+    async def first_event():
+        events = module.devices_status_stream().body_iterator
+        try:
+            return await events.__anext__()
+        finally:
+            await events.aclose()
+
+    event = asyncio.run(first_event())
+    assert json.loads(event[len("data:"):])["192.168.1.12:3030"] is False
+
+    health = {row["key"]: row for row in authed_client.get("/api/devices/health").json()["devices"]}
+    assert health["192.168.1.11:3030"]["failures"] == 2
+    assert health["192.168.1.12:3030"]["last_seen"] is not None
+    assert health["192.168.1.10:3030"]["rtt_ms"] >= 200
+
+
+def serve_fake_barix(address, port=0):
+    import http.server
+    import threading
+
+    class BarixHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = b"<html><title>Gym Exstreamer</title>Barix</html>"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((address, port), BarixHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_scanner_seeds_from_neighbors_then_sweeps_and_identifies(module, monkeypatch, tmp_path):
+    seeded = serve_fake_barix("127.0.0.2")
+    swept = serve_fake_barix("127.0.0.5", seeded.server_address[1])
+    arp = tmp_path / "arp"
+    arp.write_text(
+        "IP address       HW type     Flags       HW address            Mask     Device\n"
+        "127.0.0.2        0x1         0x2         00:08:e1:00:00:02     *        eth0\n"
+        "127.0.0.4        0x1         0x0         00:00:00:00:00:00     *        eth0\n"
+        "192.168.9.9      0x1         0x2         00:08:e1:00:00:09     *        eth0\n"
+    )
+    monkeypatch.setattr(module, "NEIGHBOR_TABLE_FILE", arp)
+    monkeypatch.setattr(module, "BARIX_HTTP_PORT", seeded.server_address[1])
+    monkeypatch.setattr(module, "BARIX_TCP_PORT", 9)
+    monkeypatch.setattr(module, "get_local_ipv4_networks", lambda: [])
+    monkeypatch.setattr(module, "discover_barix_binary", lambda networks: [])
+
+    try:
+        events = list(module.discover_barix_devices_iter("127.0.0.0/29"))
+    finally:
+        seeded.shutdown()
+        swept.shutdown()
+
+    assert events[0]["total"] == 8
+    stages = {event["stage"]: event for event in events if "stage" in event}
+    assert stages["seed"]["seeds"] == 1
+    assert stages["sweep"]["responsive"] == 1
+    sweep = [event for event in events if event.get("step", "").startswith("Probing")]
+    assert [event["progress"] for event in sweep] == list(range(2, 7))
+    assert all("host_ms" in event for event in sweep)
+
+    final = events[-1]
+    assert final["complete"] is True
+    assert set(final["stages"]) == {"seed", "sweep", "identify"}
+    devices = {device["ip"]: device for device in final["devices"]}
+    assert set(devices) == {"127.0.0.2", "127.0.0.5"}
+    assert devices["127.0.0.2"]["mac"] == "00:08:E1:00:00:02"
+    assert devices["127.0.0.5"]["name"] == "Gym Exstreamer"
+    assert devices["127.0.0.5"]["model"] == "Exstreamer"
+
+
+def test_probe_hosts_merge_overlaps_and_interleave_subnets(module, monkeypatch):
+    import ipaddress
+    import itertools
+
+    networks = [
+        ipaddress.ip_network("10.0.1.0/24"),
+        ipaddress.ip_network("10.0.0.0/24"),
+        ipaddress.ip_network("10.0.0.128/25"),
+        ipaddress.ip_network("10.0.0.7/32"),
+    ]
+    hosts, skipped = module.iter_probe_hosts(networks)
+
+    assert skipped == []
+    assert hosts.intervals == [(167772161, 167772414), (167772417, 167772670)]
+    assert len(hosts) == 508
+    assert list(itertools.islice(hosts, 4)) == ["10.0.0.1", "10.0.1.1", "10.0.0.2", "10.0.1.2"]
+    assert sorted(hosts, key=ipaddress.IPv4Address) == [
+        str(host) for network in networks[:2][::-1] for host in network.hosts()
+    ]
+    assert "10.0.0.200" in hosts and "10.0.0.255" not in hosts
+
+    monkeypatch.setattr(module, "BARIX_SCAN_MAX_HOSTS", 1 << 24)
+    large, _ = module.iter_probe_hosts([ipaddress.ip_network("10.0.0.0/8")])
+    assert len(large) == (1 << 24) - 2
+    assert next(iter(large)) == "10.0.1.0"
+
+
+def test_quick_rescan_streams_known_devices_first_and_detects_moves(module, monkeypatch, tmp_path):
+    import time
+
+    server = serve_fake_barix("127.0.0.3")
+    arp = tmp_path / "arp"
+    arp.write_text(
+        "IP address       HW type     Flags       HW address            Mask     Device\n"
+        "127.0.0.3        0x1         0x2         00:08:e1:00:00:03     *        eth0\n"
+    )
+    module.write_json(module.BARIX_INVENTORY_FILE, {
+        "00:08:E1:00:00:03": {"key": "00:08:E1:00:00:03", "ip": "127.0.0.6", "mac": "00:08:E1:00:00:03",
+                              "first_seen": "2026-01-05T08:00:00", "previous_ips": []},
+    })
+    monkeypatch.setattr(module, "NEIGHBOR_TABLE_FILE", arp)
+    monkeypatch.setattr(module, "BARIX_HTTP_PORT", server.server_address[1])
+    monkeypatch.setattr(module, "BARIX_TCP_PORT", 9)
+    monkeypatch.setattr(module, "get_local_ipv4_networks", lambda: [])
+    monkeypatch.setattr(module, "discover_barix_binary", lambda networks: time.sleep(1.5) or [])
+
+    started = time.monotonic()
+    scan = module.discover_barix_devices_iter("127.0.0.0/29", quick=True)
+    try:
+        first = next(event for event in scan if "device" in event)
+        elapsed = time.monotonic() - started
+        concurrent = module.DiscoveryInventory(module.BARIX_INVENTORY_FILE)
+        concurrent.observe({"ip": "127.0.0.9", "mac": "00:08:E1:00:00:09"})
+        concurrent.entries["00:08:E1:00:00:09"]["last_seen"] = "2026-01-05T09:00:00"
+        concurrent.save()
+        events = list(scan)
+    finally:
+        server.shutdown()
+
+    assert first["device"]["ip"] == "127.0.0.3"
+    assert elapsed < 1.0
+    assert events[0]["stage"] == "known" and events[0]["verified"] == 1
+    assert events[-1]["moved"] == [{"mac": "00:08:E1:00:00:03", "from": "127.0.0.6", "to": "127.0.0.3"}]
+
+    inventory = module.load_discovery_inventory()
+    assert [entry["ip"] for entry in inventory] == ["127.0.0.3", "127.0.0.9"]
+    assert inventory[0]["previous_ips"] == ["127.0.0.6"]
+    assert inventory[0]["first_seen"] == "2026-01-05T08:00:00"
+    assert inventory[0]["response_ms"] >= 0
+
+
+def test_scan_sessions_are_shared_and_cancelled_without_listeners(module, authed_client, monkeypatch):
+    import threading
+    import time
+
+    runs = []
+    closed = threading.Event()
+
+    def fake_scan(ranges="", quick=False, cancel=None):
+        runs.append((ranges, quick))
+        try:
+            for index in range(40):
+                if cancel.is_set():
+                    return
+                yield {"progress": index, "total": 40}
+                time.sleep(0.01 if ranges.startswith("10.0.0.0") else 0.05)
+            yield {"progress": 40, "total": 40, "complete": True, "devices": []}
+        finally:
+            closed.set()
+
+    monkeypatch.setattr(module, "discover_barix_devices_iter", fake_scan)
+    monkeypatch.setattr(module, "BARIX_SCAN_PROCESS", False)
+    monkeypatch.setattr(module.scan_sessions, "idle_seconds", 0.05)
+    monkeypatch.setattr(module, "BARIX_SCAN_EVENT_RATE", 0)
+
+    first = module.scan_sessions.attach("10.0.0.0/24", False)
+    time.sleep(0.1)
+    second = module.scan_sessions.attach("10.0.0.0/24,", False)
+    assert second is first
+    assert len(runs) == 1
+    replay, _ = second.events_since(0)
+    assert replay[0] == {"progress": 0, "total": 40}
+    module.scan_sessions.detach(first)
+    while not first.done:
+        time.sleep(0.01)
+    module.scan_sessions.detach(second)
+    assert first.events[-1]["complete"] is True
+    assert not first.cancel.is_set()
+
+    closed.clear()
+    idle = module.scan_sessions.attach("192.168.50.0/24", False)
+    module.scan_sessions.detach(idle)
+    assert closed.wait(1.0)
+    assert idle.cancel.is_set()
+    assert len(idle.events) < 40
+    assert module.scan_sessions.stats()["cancelled"] == 1
+
+    body = authed_client.get("/api/devices/scan_stream?ranges=10.0.0.0/24").text
+    assert body.count("data:") == 41
+    assert module.scan_sessions.stats()["active"] == []
+
+
+def test_scan_progress_is_batched_but_devices_are_sent_at_once(module, authed_client, monkeypatch):
+    import json
+    import time
+
+    def fake_scan(ranges="", quick=False, cancel=None):
+        for index in range(1, 2001):
+            yield {"progress": index, "total": 2002, "step": f"Probing 10.0.{index // 256}.{index % 256}", "host_ms": 1.0}
+            if index == 1000:
+                yield {"progress": index, "total": 2002, "step": "Probing 10.0.3.232", "device": {"ip": "10.0.3.232"}}
+            if index % 500 == 0:
+                time.sleep(0.12)
+        yield {"progress": 2002, "total": 2002, "complete": True, "devices": [{"ip": "10.0.3.232"}]}
+
+    monkeypatch.setattr(module, "discover_barix_devices_iter", fake_scan)
+    monkeypatch.setattr(module, "BARIX_SCAN_PROCESS", False)
+    monkeypatch.setattr(module, "BARIX_SCAN_EVENT_RATE", 10)
+
+    body = authed_client.get("/api/devices/scan_stream?ranges=10.0.0.0/21").text
+    events = [json.loads(line[5:]) for line in body.splitlines() if line.startswith("data:")]
+
+    assert len(events) < 12
+    assert [event["device"]["ip"] for event in events if "device" in event] == ["10.0.3.232"]
+    assert events[-1]["complete"] is True
+    progress = [event["progress"] for event in events]
+    assert progress == sorted(progress)
+    batched = [event for event in events if "batch" in event]
+    assert batched and all("host_ms" not in event and event["host_ms_max"] == 1.0 for event in batched)
+
+
+def test_scan_progress_batcher_flushes_pending_events_on_a_deadline(module):
+    import threading
+    import time
+
+    emitted = []
+    stopped = threading.Event()
+    batcher = module.ScanEventBatcher(10, emitted.extend)
+    threading.Thread(target=batcher.flush_on_deadline, args=(stopped,), daemon=True).start()
+    batcher.add({"progress": 1, "total": 3, "step": "Probing 10.0.0.1"})
+    batcher.add({"progress": 2, "total": 3, "step": "Probing 10.0.0.2"})
+    time.sleep(0.3)
+    stopped.set()
+
+    assert [event["progress"] for event in emitted] == [1, 2]
+
+
+def isolated_scan(ranges="", quick=False, cancel=None, scan_networks=None):
+    import os
+
+    yield {"pid": os.getpid(), "nice": os.nice(0), "networks": scan_networks}
+    yield {"progress": 1, "total": 1, "complete": True, "devices": []}
+
+
+def test_scan_sessions_run_discovery_in_a_lower_priority_process(module, monkeypatch):
+    import os
+
+    monkeypatch.setattr(module, "discover_barix_devices_iter", isolated_scan)
+    monkeypatch.setattr(module, "get_local_ipv4_networks", lambda: [])
+    monkeypatch.setattr(module, "BARIX_SCAN_NICE", 5)
+
+    session = module.ScanSession(("10.9.0.0/24", False), "10.9.0.0/24", False)
+    session.run(lambda _: None)
+
+    worker = session.events[0]
+    assert worker["pid"] == session.pid != os.getpid()
+    assert worker["nice"] >= min(19, os.nice(0) + 5)
+    assert worker["networks"] == ["10.9.0.0/24"]
+    assert session.events[-1]["complete"] is True
+
+    again = module.ScanSession(("10.9.1.0/24", False), "10.9.1.0/24", False)
+    again.run(lambda _: None)
+    stats = module.scan_sessions.stats()["worker"]
+    assert again.events[0]["pid"] == worker["pid"]
+    assert again.events[0]["networks"] == ["10.9.1.0/24"]
+    assert stats["starts"] == 1 and stats["jobs"] == 2
+    assert stats["startup_ms"] is not None
+    module.discovery_worker.stop()
+
+
+def test_threadhall_outbox_queues_offline_acks_and_drains_in_bulk(module, monkeypatch):
+    from scripts.threadhall_standin import StandInThreadhall
+
+    (module.AUDIO_DIR / "bell-test-tone.mp3").write_bytes(b"fake mp3")
+    monkeypatch.setattr(module, "trigger_bell", lambda sound_file, loop=False: None)
+    monkeypatch.setattr(module.threadhall_outbox, "max_entries", 6)
+
+    with StandInThreadhall(push=False) as standin:
+        config = module.save_threadhall_config({"enabled": True, "base_url": standin.url, "token": standin.token})
+        standin.available = False
+        commands = [standin.issue("test_bell", sound_key="test") for _ in range(3)]
+        assert module.handle_threadhall_commands(config, standin.take(), "push") == 3
+        module.threadhall_sync_failed(module.ThreadhallError("Threadhall unreachable", 503))
+        for index in range(4):
+            module.threadhall_outbox.queue_status({"index": index})
+        offline = module.threadhall_outbox.stats()
+        lines = module.THREADHALL_OUTBOX_FILE.read_text().splitlines()
+
+        standin.available = True
+        requests_before = len(standin.requests)
+        module.sync_threadhall_once()
+
+    assert offline["pending_acks"] == 3
+    assert offline["pending_status"] == 2
+    assert offline["dropped"] == 3
+    assert len(lines) == 5 and all(": " not in line for line in lines)
+    uploads = [request for request in standin.requests[requests_before:] if request.endswith("/outbox")]
+    assert uploads == ["POST /api/pibells/v1/outbox"]
+    assert [ack["id"] for ack in standin.acks] == [str(command["id"]) for command in commands]
+    assert [event["status"] for event in standin.status_events][-1] == {"index": 3}
+    assert not module.THREADHALL_OUTBOX_FILE.exists()
+    assert module.threadhall_outbox.stats()["uploads"] == 1
+    assert module.load_threadhall_config()["last_error"] == ""
+    delays = [module.threadhall_backoff(attempt, 20, 300) for attempt in range(1, 8)]
+    assert 10 <= delays[0] <= 20 and 150 <= delays[-1] <= 300
+
+
+def test_threadhall_outbox_acks_from_disk_stop_redelivered_commands_rerunning(module, monkeypatch):
+    import json
+
+    from scripts.threadhall_standin import StandInThreadhall
+
+    (module.AUDIO_DIR / "bell-test-tone.mp3").write_bytes(b"fake mp3")
+    triggered = []
+    monkeypatch.setattr(module, "trigger_bell", lambda sound_file, loop=False: triggered.append(sound_file))
+
+    with StandInThreadhall(push=False) as standin:
+        module.save_threadhall_config({"enabled": True, "base_url": standin.url, "token": standin.token})
+        command = standin.issue("test_bell", sound_key="test")
+        ack = {"id": command["id"], "status": "acknowledged", "summary": "Test bell started", "run_ms": 1.0}
+        module.THREADHALL_OUTBOX_FILE.write_text(
+            json.dumps({"kind": "ack", "at": "2026-10-18T08:00:00", "ack": ack}) + "\n"
+        )
+        outbox = module.ThreadhallOutbox(
+            module.THREADHALL_OUTBOX_FILE, module.THREADHALL_OUTBOX_MAX_ENTRIES, module.THREADHALL_OUTBOX_BATCH
+        )
+        monkeypatch.setattr(module, "threadhall_outbox", outbox)
+        module.sync_threadhall_once()
+
+    assert triggered == []
+    assert [item["id"] for item in standin.acks] == [str(command["id"])] * 2
+    assert not module.THREADHALL_OUTBOX_FILE.exists()
+
+
+def test_threadhall_outbox_keeps_every_ack_and_survives_write_errors(module, monkeypatch):
+    monkeypatch.setattr(module.threadhall_outbox, "max_entries", 3)
+
+    module.threadhall_outbox.queue_status({"index": 0})
+    module.threadhall_outbox.queue_acks([{"id": index, "status": "acknowledged"} for index in range(4)])
+    module.threadhall_outbox.queue_status({"index": 1})
+    stats = module.threadhall_outbox.stats()
+
+    assert stats["pending_acks"] == 4
+    assert stats["pending_status"] == 0
+    assert stats["dropped"] == 2
+
+    monkeypatch.setattr(module.threadhall_outbox, "path", module.THREADHALL_OUTBOX_FILE.parent)
+    module.threadhall_outbox.queue_acks([{"id": 4, "status": "acknowledged"}])
+
+    assert module.threadhall_outbox.stats()["pending_acks"] == 5
+    assert "Outbox write failed" in module.threadhall_outbox.stats()["last_error"]